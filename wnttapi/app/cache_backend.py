@@ -0,0 +1,113 @@
+import logging
+import os
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+"""
+A Django cache backend that puts a per-process LRU in front of the shared FileBasedCache.
+
+Most of what we cache, e.g. the stations, the syzygy data and the surge payload, is read on every request and
+rarely changes, so unpickling it from the file every time is wasted work. The first get in each worker reads
+the file as usual, and keeps the value in memory along with a version stamp of the file: its inode, mtime and
+size. Later gets only open and stat the file, and return the in-memory value if the stamp still matches. Any set,
+delete or clear, by this worker or another, replaces or removes the file, so it's seen on the next get.
+
+Values returned from the local tier are shared by all callers in the process, so they must not be modified.
+"""
+
+
+class TieredFileCache(FileBasedCache):
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get("OPTIONS", {})
+        self._local_max_entries = int(options.get("LOCAL_MAX_ENTRIES", 100))
+        self._local = OrderedDict()  # {filename: (stamp, expiry, value)}
+        self._local_lock = threading.Lock()
+
+    def get(self, key, default=None, version=None):
+        fname = self._key_to_file(key, version)
+        try:
+            with open(fname, "rb") as f:
+                stamp = _stamp(os.fstat(f.fileno()))
+                value = self._get_local(fname, stamp)
+                if value is not None:
+                    metrics.incr("cache.local_hit")
+                    return value
+
+                expiry = pickle.load(f)
+                if expiry is not None and expiry < time.time():
+                    f.close()  # On Windows a file has to be closed before deleting
+                    self._delete(fname)
+                else:
+                    value = pickle.loads(zlib.decompress(f.read()))
+                    self._set_local(fname, stamp, expiry, value)
+                    metrics.incr("cache.shared_hit")
+                    return value
+        except FileNotFoundError:
+            pass
+        self._forget_local(fname)
+        metrics.incr("cache.miss")
+        return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Don't keep the value locally here. Another worker could replace the file before we stat it, and
+        # we'd pair our value with their stamp. The next get reads it back once.
+        super().set(key, value, timeout=timeout, version=version)
+        self._forget_local(self._key_to_file(key, version))
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = super().touch(key, timeout=timeout, version=version)
+        self._forget_local(self._key_to_file(key, version))
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = super().delete(key, version=version)
+        self._forget_local(self._key_to_file(key, version))
+        return deleted
+
+    def clear(self):
+        super().clear()
+        with self._local_lock:
+            self._local.clear()
+
+    def _get_local(self, fname: str, stamp: tuple):
+        """Return the local value if it's from the same version of the file and not expired, else None."""
+        with self._local_lock:
+            entry = self._local.get(fname)
+            if entry is None:
+                return None
+            local_stamp, expiry, value = entry
+            if local_stamp != stamp or (expiry is not None and expiry < time.time()):
+                del self._local[fname]
+                return None
+            self._local.move_to_end(fname)
+            return value
+
+    def _set_local(self, fname: str, stamp: tuple, expiry: float, value):
+        # None can't be told apart from a miss, so there's no point keeping it.
+        if value is None:
+            return
+        with self._local_lock:
+            self._local[fname] = (stamp, expiry, value)
+            self._local.move_to_end(fname)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+
+    def _forget_local(self, fname: str):
+        with self._local_lock:
+            self._local.pop(fname, None)
+
+
+def _stamp(stat_result) -> tuple:
+    # The file is replaced, not rewritten, on every set, so a new version has a new inode.
+    return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
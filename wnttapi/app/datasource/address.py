@@ -1,26 +1,149 @@
 import json
 import logging
 import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import unquote_plus
 
-import requests
+from django.db import DatabaseError
 
-from app import util
+from app import metrics, util
+from app import tzutil as tz
+
+from ..models import Geocode
+from . import httpclient
 
 logger = logging.getLogger(__name__)
 _request_timeout_seconds = 20
 
 """
     API interface for retrieving the lat/lon of an url-encoded physical address in the reserve area.
+
+    Users search for the same few towns and addresses over and over, so lookups are cached by their
+    normalized search string: in a per-process LRU, and behind that in the geocode table, which all workers
+    share and which outlives restarts. A search that isn't found is cached too, for a shorter time, in case
+    the geocoder learns of it. Failed lookups aren't cached.
+
+    Counters, see metrics:
+        geocode.local_hit, geocode.db_hit, geocode.miss
 """
 base_url = "https://geocode.maps.co/search"
 
+_found_ttl = timedelta(days=90)
+_not_found_ttl = timedelta(days=1)
+_max_local_entries = 1000
+
+_local = OrderedDict()  # {query: (location, expires epoch seconds)}
+_local_lock = threading.Lock()
+
 
-@util.request_logger
 def get_location(search: str) -> dict:
     """
-    Call the geocode service with an address to look up, and get the lat/lon of that address, or error.
+    Get the lat/lon of an address from the cache, or else from the geocode service.
     All addresses are assumed to be in U.S.  They should include state.
 
+    Args:
+        search: encoded search string with an address in it
+
+    Returns:
+        dict with { 'lat': '<latitude>', 'lng', '<longitude>' }, or empty dict if address was not found
+    """
+    query = normalize(search)
+    # Too long to be a real address, and to key the table.
+    if len(query) > Geocode._meta.get_field("query").max_length:
+        metrics.incr("geocode.miss")
+        return pull_location(search)
+
+    now = tz.now(tz.utc)
+    location = get_local(query, now)
+    if location is not None:
+        metrics.incr("geocode.local_hit")
+        return location
+
+    location, expires = read_db(query, now)
+    if location is not None:
+        metrics.incr("geocode.db_hit")
+        put_local(query, location, expires)
+        return location
+
+    metrics.incr("geocode.miss")
+    location = pull_location(search)
+    expires = now + (_found_ttl if len(location) > 0 else _not_found_ttl)
+    write_db(query, location, now)
+    put_local(query, location, expires)
+    return location
+
+
+def normalize(search: str) -> str:
+    """Return the cache key for a search: decoded, case-folded, with spaces and commas made uniform."""
+    query = unquote_plus(search).casefold()
+    query = re.sub(r"\s*,\s*", ", ", query)
+    query = re.sub(r"\s+", " ", query)
+    return query.strip(" ,.")
+
+
+def get_local(query: str, now) -> dict:
+    with _local_lock:
+        entry = _local.get(query)
+        if entry is None:
+            return None
+        location, expires = entry
+        if expires <= tz.to_epoch(now):
+            del _local[query]
+            return None
+        _local.move_to_end(query)
+        return location
+
+
+def put_local(query: str, location: dict, expires):
+    with _local_lock:
+        _local[query] = (location, tz.to_epoch(expires))
+        _local.move_to_end(query)
+        while len(_local) > _max_local_entries:
+            _local.popitem(last=False)
+
+
+def read_db(query: str, now) -> tuple[dict, datetime]:
+    """Return the cached location for a query and when it expires, or (None, None) if it isn't cached or
+    has expired."""
+    try:
+        row = Geocode.objects.filter(query=query).first()
+    except DatabaseError as exc:
+        logger.warning(f"Can't read geocode cache: {exc}")
+        return None, None
+    if row is None:
+        return None, None
+    if row.lat is None:
+        location, expires = {}, row.when + _not_found_ttl
+    else:
+        location, expires = {"lat": row.lat, "lng": row.lng}, row.when + _found_ttl
+    if expires <= now:
+        return None, None
+    return location, expires
+
+
+def write_db(query: str, location: dict, now):
+    # The lookup succeeded, so don't fail it if e.g. the database is locked by a cron job.
+    try:
+        Geocode.objects.update_or_create(
+            query=query,
+            defaults={
+                "lat": location.get("lat"),
+                "lng": location.get("lng"),
+                "when": now,
+            },
+        )
+    except DatabaseError as exc:
+        logger.warning(f"Can't write geocode cache: {exc}")
+
+
+@util.request_logger
+def pull_location(search: str) -> dict:
+    """
+    Call the geocode service with an address to look up, and get the lat/lon of that address, or error.
+
     Args:
         search: encoded search string with an address in it
 
@@ -30,7 +153,7 @@ def get_location(search: str) -> dict:
 
     params = {"api_key": os.environ.get("GEOCODE_KEY"), "q": search}
 
-    response = requests.get(base_url, params=params, timeout=_request_timeout_seconds)
+    response = httpclient.get(base_url, params=params, timeout=_request_timeout_seconds)
     response.raise_for_status()
 
     jtext = json.loads(response.text)
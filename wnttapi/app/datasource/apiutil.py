@@ -1,7 +1,10 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
-from app.station import Station
+import sentry_sdk
+from django.db import connections
 
 logger = logging.getLogger(__name__)
 
@@ -9,25 +12,99 @@ logger = logging.getLogger(__name__)
 
 
 class APICall:
-    def __init__(self, name: str, func: callable, station: Station, *args):
+    """A single data source call to be run in parallel with others.
+
+    Args:
+        name (str): name of the call, for logging and for looking up the result.
+        func (callable): the function to call.
+        args: positional arguments for func.
+        timeout (float): seconds to wait for the result, measured from the start of run_parallel.
+            None means wait as long as it takes.
+        required (bool): if True, an error or timeout is raised to the caller of run_parallel. If False,
+            it is logged and data is set to the default, so the caller can go on with partial results.
+        default: the data to use when an optional call fails or times out.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: callable,
+        *args,
+        timeout: float = None,
+        required: bool = True,
+        default=None,
+    ):
         self.name = name
         self.func = func
-        self.station = station
         self.args = args
+        self.timeout = timeout
+        self.required = required
+        self.default = default
         self.data = None
+        self.failed = False
 
-    def setData(self, data: dict):
+    def setData(self, data):
         self.data = data
 
 
-def run_parallel(calls: list):
-    # Call a list of APICall objects in parallel
-    with ThreadPoolExecutor(max_workers=3) as executor:
-        # Use a dict comprehension to map active futures to calls
+def run_parallel(calls: list, max_workers: int = None) -> dict:
+    """Call a list of APICall objects in parallel, and set the data of each.  The total time taken is
+    that of the slowest call, bounded by the largest timeout.
+
+    Args:
+        calls (list): APICall objects
+        max_workers (int): most calls to run at once. Default is all of them. Note that timeouts are
+            measured from the start, so a call that has to wait for a worker has less time to run.
+
+    Raises:
+        TimeoutError: if a required call did not finish within its timeout.
+        Exception: whatever a required call raised.
+
+    Returns:
+        dict: {call.name: data} for all calls
+    """
+    start = time.monotonic()
+    executor = ThreadPoolExecutor(
+        max_workers=max_workers or len(calls), thread_name_prefix="apicall"
+    )
+    try:
         future_to_call = {
-            executor.submit(call.func, call.station, *call.args): call for call in calls
+            executor.submit(_run_call, call.func, *call.args): call for call in calls
         }
-        for future in as_completed(future_to_call):
-            call = future_to_call[future]
+        for future, call in future_to_call.items():
+            remaining = (
+                None
+                if call.timeout is None
+                else max(0, call.timeout - (time.monotonic() - start))
+            )
             logger.debug(f"waiting on {call.name}...")
-            call.setData(future.result())
+            try:
+                call.setData(future.result(timeout=remaining))
+            except Exception as e:
+                if isinstance(e, FutureTimeoutError):
+                    e = TimeoutError(f"{call.name} took longer than {call.timeout}s")
+                if call.required:
+                    raise e from None
+                logger.error(
+                    f"{type(e)} in optional call {call.name}, using default: {e}",
+                    stack_info=False,
+                )
+                sentry_sdk.capture_exception(e)
+                call.failed = True
+                call.setData(call.default)
+    finally:
+        # Don't wait for stragglers. A thread that missed its deadline finishes in the background,
+        # and its result is discarded.
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.debug(f"{len(calls)} parallel calls took {time.monotonic() - start:.3f}s")
+    return {call.name: call.data for call in calls}
+
+
+def _run_call(func: callable, *args):
+    # Worker threads get their own database connection from Django, which is not closed for us
+    # since we're outside the request cycle. Close it here so they don't leak.
+    try:
+        return func(*args)
+    finally:
+        connections.close_all()
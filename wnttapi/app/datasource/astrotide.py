@@ -1,16 +1,15 @@
 import json
 import logging
 import os
-from datetime import datetime
-
-import requests
 
+from app import timestamps
 from app import tzutil as tz
 from app import util
 from app.hilo import Hilo, PredictedHighOrLow
 from app.timeline import Timeline
 
 from ..models import AstroTide15, AstroTideHilo
+from . import harmonic, httpclient
 
 logger = logging.getLogger(__name__)
 _request_timeout_seconds = 20
@@ -56,7 +55,8 @@ def get_15m_astro_tides(
         noaa_station_id: NOAA station id, e.g. "8419317"
         timeline (Timeline): the timeline
         navd88_func: function to convert NAVD88 tide levels to desired reference, typicaly MLLW
-        useDb: use database instead of calling API; can be overridden with FORCE_API_ASTRO env setting
+        useDb: use database instead of calling API; can be overridden with FORCE_API_ASTRO env setting,
+            or with LOCAL_ASTRO to predict them from the station's harmonic constituents, if it has them.
 
     Returns:
         - dict of 15-min interval predictions for the past portion of the timeline. {dt: level}.
@@ -65,27 +65,35 @@ def get_15m_astro_tides(
     if force_api:
         logger.warning("Forced to use API for tide predictions!")
 
+    if useDb and not force_api and use_harmonics(noaa_station_id):
+        return harmonic.get_15m_tides(noaa_station_id, timeline, navd88_func)
+
     if useDb and not force_api:
         reg_preds_dict = {}  # {dt: value}
 
         start_dt = timeline.get_min(False)
         end_dt = timeline.get_max(False)
 
-        # query must pass UTC datetimes as strings in ISO format: "2024-01-01T05:30:00+00:00"
-        start_param = start_dt.astimezone(tz.utc).isoformat()
-        end_param = end_dt.astimezone(tz.utc).isoformat()
+        # times are stored as UTC epoch seconds
+        start_param = tz.to_epoch(start_dt)
+        end_param = tz.to_epoch(end_dt)
 
-        queryset = AstroTide15.objects.filter(
-            noaa_id=noaa_station_id, time__range=(start_param, end_param)
-        ).order_by("time")
-        logger.debug(
-            f"Found {queryset.count()} rows in db for {noaa_station_id} from {start_dt} to {end_dt}"
+        # Stream plain tuples rather than model instances, since there may be thousands of rows.
+        rows = (
+            AstroTide15.objects.filter(
+                noaa_id=noaa_station_id, time__range=(start_param, end_param)
+            )
+            .order_by("time")
+            .values_list("time", "nav_level")
         )
-        for rec in queryset:
-            in_utc = datetime.fromisoformat(rec.time)
-            dt_in_local = in_utc.astimezone(timeline.time_zone)
+        time_zone = timeline.time_zone
+        for epoch, nav_level in rows:
+            dt_in_local = tz.from_epoch(epoch, time_zone)
             if timeline.contains(dt_in_local):
-                reg_preds_dict[dt_in_local] = navd88_func(rec.nav_level)
+                reg_preds_dict[dt_in_local] = navd88_func(nav_level)
+        logger.debug(
+            f"Found {len(reg_preds_dict)} rows in db for {noaa_station_id} from {start_dt} to {end_dt}"
+        )
         return reg_preds_dict
 
     else:
@@ -109,7 +117,8 @@ def get_hilo_astro_tides(
         noaa_station_id: the 7-char station id, e.g. 8419317
         timeline: defines the data we want in time
         navd88_func: func to translate navd88 feet into mllw feet
-        useDb: use database instead of calling API; can be overridden with FORCE_API_ASTRO env setting
+        useDb: use database instead of calling API; can be overridden with FORCE_API_ASTRO env setting,
+            or with LOCAL_ASTRO to predict them from the station's harmonic constituents, if it has them.
 
     Returns:
         dict of 15-min interval predictions for highs and lows only. The PredictedHighOrLow object includes
@@ -120,28 +129,33 @@ def get_hilo_astro_tides(
     if force_api:
         logger.warning("Forced to use API for tide predictions!")
 
+    if useDb and not force_api and use_harmonics(noaa_station_id):
+        return harmonic.get_hilo_tides(noaa_station_id, timeline, navd88_func)
+
     if useDb and not force_api:
         data = {}
         start_dt = timeline.get_min(True)
         end_dt = timeline.get_max(True)
 
-        # query must pass UTC datetimes as strings in ISO format: "2024-01-01T05:30:00+00:00"
-        start_param = start_dt.astimezone(tz.utc).isoformat()
-        end_param = end_dt.astimezone(tz.utc).isoformat()
+        # times are stored as UTC epoch seconds
+        start_param = tz.to_epoch(start_dt)
+        end_param = tz.to_epoch(end_dt)
 
-        queryset = AstroTideHilo.objects.filter(
-            noaa_id=noaa_station_id, time__range=(start_param, end_param)
-        ).order_by("time")
-        for rec in queryset:
-            in_utc = datetime.fromisoformat(rec.time)
-            dt_in_local = in_utc.astimezone(timeline.time_zone)
+        rows = (
+            AstroTideHilo.objects.filter(
+                noaa_id=noaa_station_id, time__range=(start_param, end_param)
+            )
+            .order_by("time")
+            .values_list("time", "real_time", "nav_level", "hilo")
+        )
+        time_zone = timeline.time_zone
+        for epoch, real_epoch, nav_level, hilo in rows:
+            dt_in_local = tz.from_epoch(epoch, time_zone)
             if timeline.contains(dt_in_local):
                 data[dt_in_local] = PredictedHighOrLow(
-                    navd88_func(rec.nav_level),
-                    Hilo.HIGH if rec.hilo == "H" else Hilo.LOW,
-                    datetime.fromisoformat(rec.real_time).astimezone(
-                        timeline.time_zone
-                    ),
+                    navd88_func(nav_level),
+                    Hilo.HIGH if hilo == "H" else Hilo.LOW,
+                    tz.from_epoch(real_epoch, time_zone),
                 )
         return data
 
@@ -150,6 +164,15 @@ def get_hilo_astro_tides(
         return hilo_json_to_dict(future_preds_json, timeline, navd88_func)
 
 
+def use_harmonics(noaa_station_id: str) -> bool:
+    """Whether to predict tides locally instead of reading NOAA's stored predictions. Off unless LOCAL_ASTRO
+    is set, until the station's predictions have been checked with tools/astro_validate.py.
+    """
+    return os.environ.get("LOCAL_ASTRO", "0") == "1" and harmonic.has_harmonics(
+        noaa_station_id
+    )
+
+
 def pred15_json_to_dict(
     pred_json: list, timeline: Timeline, navd88_func: callable
 ) -> dict:
@@ -161,9 +184,10 @@ def pred15_json_to_dict(
     reg_preds_dict = {}  # {dt: value}
     if len(pred_json) == 0:
         return reg_preds_dict
+    parse_time = timestamps.local_parser(timestamps.NOAA, timeline.time_zone)
     for pred in pred_json:
         dts = pred["t"]
-        dt = datetime.strptime(dts, "%Y-%m-%d %H:%M").replace(tzinfo=timeline.time_zone)
+        dt = parse_time(dts)
         if timeline.contains(dt):
             val = pred["v"]
             reg_preds_dict[dt] = navd88_func(float(val))
@@ -190,10 +214,11 @@ def hilo_json_to_dict(
     future_hilo_dict = {}
     if len(hilo_json) == 0:
         return future_hilo_dict
+    parse_time = timestamps.local_parser(timestamps.NOAA, timeline.time_zone)
     for pred in hilo_json:
         dts = pred["t"]
 
-        dt = datetime.strptime(dts, "%Y-%m-%d %H:%M").replace(tzinfo=timeline.time_zone)
+        dt = parse_time(dts)
 
         if timeline.contains(dt):
             val = pred["v"]
@@ -247,7 +272,7 @@ def pull_data(noaa_station_id: str, interval: str, timeline: Timeline) -> list:
         "end_date": str(timeline.end_date),
     }
 
-    response = requests.get(
+    response = httpclient.get(
         base_url, params=base_params | params, timeout=_request_timeout_seconds
     )
     response.raise_for_status()
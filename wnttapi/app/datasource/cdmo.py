@@ -6,6 +6,7 @@ from enum import Enum
 
 from rest_framework.exceptions import APIException
 
+from app import timestamps
 from app import tzutil as tz
 from app import util
 from app.datasource.winds import Wind
@@ -15,7 +16,7 @@ from app.timeline import GraphTimeline, Timeline
 
 from ..models import Water, get_station
 from ..models import Wind as WindDb
-from .soap import SoapClient
+from . import soap
 from .tides import Tide
 
 
@@ -38,6 +39,11 @@ Access CDMO web services to retrieve observed tide, wind, and temperature data.
 
 logger = logging.getLogger(__name__)
 _max_wind_speed = 120  # max sane wind speed in mph
+_hilo_search_seconds = 60 * 60  # search this far around a predicted high or low
+_xml_chunk_size = 16 * 1024  # how much of the xml to feed the parser at a time
+_utc_stamp = "utcStamp"
+_water_fields = (_utc_stamp,) + tuple(p.value for p in WATER_PARAMS)
+_wind_fields = (_utc_stamp,) + tuple(p.value for p in WIND_PARAMS)
 
 
 def get_water_data(
@@ -72,24 +78,29 @@ def get_water_data(
         start_dt = timeline.get_min(use_padding)
         end_dt = timeline.get_max(use_padding)
 
-        # query must pass UTC datetimes as strings in ISO format: "2024-01-01T05:30:00+00:00"
-        start_param = start_dt.astimezone(tz.utc).isoformat()
-        end_param = end_dt.astimezone(tz.utc).isoformat()
+        # times are stored as UTC epoch seconds
+        start_param = tz.to_epoch(start_dt)
+        end_param = tz.to_epoch(end_dt)
 
-        queryset = Water.objects.filter(
-            station=get_station(station.id), time__range=(start_param, end_param)
-        ).order_by("time")
-        logger.debug(
-            f"Found {queryset.count()} rows in db for {station.id} from {start_dt} to {end_dt}"
+        # Stream plain tuples rather than model instances, since there may be thousands of rows.
+        rows = (
+            Water.objects.filter(
+                station=get_station(station.id), time__range=(start_param, end_param)
+            )
+            .order_by("time")
+            .values_list("time", "temp_f", "clevel_nf")
         )
-        for rec in queryset:
-            in_utc = datetime.fromisoformat(rec.time)
-            dt_in_local = in_utc.astimezone(timeline.time_zone)
-            tides[dt_in_local] = Tide(
-                temp_f=rec.temp_f,
-                corrected_nav_feet=rec.clevel_nf,
-                mllw_offset=station.mllw_conversion,
+        time_zone = timeline.time_zone
+        mllw_conversion = station.mllw_conversion
+        for epoch, temp_f, clevel_nf in rows:
+            tides[tz.from_epoch(epoch, time_zone)] = Tide(
+                temp_f=temp_f,
+                corrected_nav_feet=clevel_nf,
+                mllw_offset=mllw_conversion,
             )
+        logger.debug(
+            f"Found {len(tides)} rows in db for {station.id} from {start_dt} to {end_dt}"
+        )
 
     else:
         logger.debug(
@@ -134,25 +145,27 @@ def get_wind_data(
         start_dt = timeline.get_min(use_padding)
         end_dt = timeline.get_max(use_padding)
 
-        # query must pass datetimes as strings in ISO format: "2024-01-01T05:30:00+00:00"
-        start_param = start_dt.astimezone(tz.utc).isoformat()
-        end_param = end_dt.astimezone(tz.utc).isoformat()
+        # times are stored as UTC epoch seconds
+        start_param = tz.to_epoch(start_dt)
+        end_param = tz.to_epoch(end_dt)
 
-        queryset = WindDb.objects.filter(
-            station=get_station(station.id), time__range=(start_param, end_param)
-        ).order_by("time")
-        logger.debug(
-            f"Found {queryset.count()} rows in db for {station.id} from {start_dt} to {end_dt}"
+        rows = (
+            WindDb.objects.filter(
+                station=get_station(station.id), time__range=(start_param, end_param)
+            )
+            .order_by("time")
+            .values_list("time", "speed", "gust", "dir_deg")
         )
-        for rec in queryset:
-            in_utc = datetime.fromisoformat(rec.time)
-            dt_in_local = in_utc.astimezone(timeline.time_zone)
-
-            winds[dt_in_local] = Wind(
-                speed_mph=rec.speed,
-                gust_mph=rec.gust,
-                direction_deg=rec.dir_deg,
+        time_zone = timeline.time_zone
+        for epoch, speed, gust, dir_deg in rows:
+            winds[tz.from_epoch(epoch, time_zone)] = Wind(
+                speed_mph=speed,
+                gust_mph=gust,
+                direction_deg=dir_deg,
             )
+        logger.debug(
+            f"Found {len(winds)} rows in db for {station.id} from {start_dt} to {end_dt}"
+        )
 
     else:
         logger.debug(
@@ -234,7 +247,7 @@ def get_cdmo_wind(timeline: Timeline, station: Station, savePath=None) -> dict:
 
 def get_cdmo_xml(timeline: Timeline, station: Station, params: list) -> str:
     """
-    Retrieve CDMO data as requested. Returns the xml returned from CDMO as a string.
+    Retrieve CDMO data as requested. Returns the xml returned from CDMO as bytes.
 
     Parameters:
     - timeline: list of datetime representing what will be displayed on the graph
@@ -242,7 +255,7 @@ def get_cdmo_xml(timeline: Timeline, station: Station, params: list) -> str:
     - params: list of requested CDMO parameters
 
     Returns:
-    - XML as string
+    - XML as bytes, since the client is created with retxml
     """
     # Because CDMO returns units of entire days using LST, we may need to adjust the dates we request.
     # When getting Level data, we add padding before and after to help determine highs/lows when they are near the boundaries.
@@ -259,10 +272,10 @@ def get_cdmo_xml(timeline: Timeline, station: Station, params: list) -> str:
     try:
         logger.debug(f"Calling CDMO for {params} {req_start_date} to {req_end_date}")
         param_str = ",".join(p.value for p in params)
-        xml = SoapClient.get_client().service.exportAllParamsDateRangeXMLNew(
-            data_station_id, req_start_date, req_end_date, param_str
-        )
-        return xml
+        with soap.cdmo_client() as client:
+            return client.service.exportAllParamsDateRangeXMLNew(
+                data_station_id, req_start_date, req_end_date, param_str
+            )
 
     except Exception as e:
         logger.error(
@@ -272,14 +285,14 @@ def get_cdmo_xml(timeline: Timeline, station: Station, params: list) -> str:
         raise APIException()
 
 
-def parse_cdmo_tides_xml(timeline: Timeline, station: Station, xml: str) -> dict:
+def parse_cdmo_tides_xml(timeline: Timeline, station: Station, xml) -> dict:
     """
     Parse the data returned from CDMO for the requested timeline.
 
     Parameters:
     - timeline: list of datetime representing what will be displayed on the graph
     - station: the swmp station object
-    - xml: tide data xml from cdmo
+    - xml: tide data xml from cdmo, as bytes or str
 
     Returns:
     - dict of {dt: Tide}
@@ -293,21 +306,16 @@ def parse_cdmo_tides_xml(timeline: Timeline, station: Station, xml: str) -> dict
     # We need to pull data for the padded timeline, for hi/lo functionality, not just
     # display times. No sense looking for future, these are observations. If asking for
     # tide level, we need a padded timeline to identify highs and lows that are near the edges of the timeline.
-    past_timeline = timeline.get_all_past(padded=isinstance(timeline, GraphTimeline))
+    past_timeline = timeline.get_past_index(padded=isinstance(timeline, GraphTimeline))
 
-    root = ElTree.fromstring(xml)  # ElementTree.Element
-    text_error_check(root)
+    parse_utc_stamp = timestamps.utc_parser(timestamps.CDMO, timeline.time_zone)
     records = ignored = none_or_bad = 0
-    for reading in root.findall(".//data"):  # use XPATH to dig out our data points
+    for reading in iter_cdmo_readings(xml, _water_fields):
         records += 1
         # we use utcStamp, not the DateTimeStamp because the latter is in LST, not sensitive to DST.
         try:
-            date_str = reading.find("./utcStamp").text
-            dt_in_local = (
-                datetime.strptime(date_str, "%m/%d/%Y %H:%M")
-                .replace(tzinfo=tz.utc)
-                .astimezone(timeline.time_zone)
-            )
+            date_str = reading.get(_utc_stamp)
+            dt_in_local = parse_utc_stamp(date_str)
         except ValueError:
             none_or_bad += 1
             logger.error("Skipping bad datetime '%s'", date_str)
@@ -351,13 +359,13 @@ def parse_cdmo_tides_xml(timeline: Timeline, station: Station, xml: str) -> dict
     return tides
 
 
-def parse_cdmo_wind_xml(timeline: Timeline, xml: str) -> dict:
+def parse_cdmo_wind_xml(timeline: Timeline, xml) -> dict:
     """
     Parse the wind data returned from CDMO for the requested timeline.
 
     Parameters:
     - timeline: list of datetime representing what will be displayed on the graph
-    - xml: wind data xml from cdmo
+    - xml: wind data xml from cdmo, as bytes or str
 
     Returns:
     - dict of {datetime: Wind}, which may be empty.
@@ -368,21 +376,16 @@ def parse_cdmo_wind_xml(timeline: Timeline, xml: str) -> dict:
     if xml is None or len(xml) == 0:
         return winds
 
-    past_timeline = timeline.get_all_past(False)
+    past_timeline = timeline.get_past_index(False)
 
-    root = ElTree.fromstring(xml)  # ElementTree.Element
-    text_error_check(root)
+    parse_utc_stamp = timestamps.utc_parser(timestamps.CDMO, timeline.time_zone)
     records = ignored = none_or_bad = 0
-    for reading in root.findall(".//data"):  # use XPATH to dig out our data points
+    for reading in iter_cdmo_readings(xml, _wind_fields):
         records += 1
         # we use utcStamp, not the DateTimeStamp because the latter is in LST, not sensitive to DST.
         try:
-            date_str = reading.find("./utcStamp").text
-            dt_in_local = (
-                datetime.strptime(date_str, "%m/%d/%Y %H:%M")
-                .replace(tzinfo=tz.utc)
-                .astimezone(timeline.time_zone)
-            )
+            date_str = reading.get(_utc_stamp)
+            dt_in_local = parse_utc_stamp(date_str)
         except ValueError:
             none_or_bad += 1
             logger.error("Skipping bad datetime '%s'", date_str)
@@ -421,11 +424,56 @@ def parse_cdmo_wind_xml(timeline: Timeline, xml: str) -> dict:
     return winds
 
 
-def text_error_check(rootElement):
-    """If a node is not supposed to have text, return that text, else None
+def iter_cdmo_readings(xml, fields: tuple):
+    """Scan the xml from CDMO and yield each of its data nodes in turn, as a dict of {field: text} for the
+    requested fields that are present. Each data node is freed once it has been yielded, so memory use doesn't
+    grow with the size of the payload, e.g. for a multi-week refresh.
+
+    Args:
+        xml (bytes | str): the xml returned from CDMO
+        fields (tuple): names of the data node children to return, e.g. "utcStamp", "Level"
+
+    Raises:
+        APIException: if CDMO returned an error message rather than data.
+    """
+    parser = ElTree.XMLPullParser(events=("start", "end"))
+    open_elements = []
+    reading = None
+    first_data = True
+
+    def scan():
+        nonlocal reading, first_data
+        for event, element in parser.read_events():
+            if event == "start":
+                open_elements.append(element)
+                if element.tag == "data":
+                    reading = {}
+                continue
+
+            open_elements.pop()
+            if element.tag == "data":
+                if first_data:
+                    text_error_check(element)
+                    first_data = False
+                yield reading
+                reading = None
+                # Drop the node and its children from the tree, since we're done with them.
+                element.clear()
+                open_elements[-1].remove(element)
+            elif reading is not None and element.tag in fields:
+                reading[element.tag] = element.text
+
+    for offset in range(0, len(xml), _xml_chunk_size):
+        parser.feed(xml[offset : offset + _xml_chunk_size])
+        yield from scan()
+    parser.close()
+    yield from scan()
+
+
+def text_error_check(data_node):
+    """If the first data node, which is not supposed to have text, has some, raise an exception with it.
     This is how CDMO returns an error e.g. Invalid IP address.
     """
-    data_node = rootElement.find(".//data")
     try:
         message = data_node.text.strip()
         if len(message) > 0:
@@ -497,7 +545,10 @@ def find_all_hilos(timeline: GraphTimeline, tides: dict, astro_pred_dict: dict)
 
     hilomap = {}  # {dt: HighLowEvent}
 
-    past_padded_timeline = timeline.get_all_past(padded=True)
+    past_padded_timeline = timeline.get_past_index(padded=True)
+    if len(past_padded_timeline) > 0:
+        past_first = past_padded_timeline.first()
+        past_last = past_padded_timeline.last()
 
     # Use the sparse predicted highs/lows to drive the logic. Since actual highs/lows will occur fairly close
     # to the predicted, this way we can simplify the identification of observed highs and lows, which may contain
@@ -505,18 +556,13 @@ def find_all_hilos(timeline: GraphTimeline, tides: dict, astro_pred_dict: dict)
     # a range of times surrounding the predicted value.
     # TODO: Handle edge case where observed high or low is missing and we falsely report a nearby value instead.
     for dt, pred in astro_pred_dict.items():
-        if (
-            len(past_padded_timeline) == 0
-            or dt < past_padded_timeline[0]
-            or dt > past_padded_timeline[-1]
-        ):
+        if len(past_padded_timeline) == 0 or dt < past_first or dt > past_last:
             hilomap[dt] = pred
             continue
         # Find the time with the highest or lowest observed value within 1 hour of the predicted time.
-        search_start = dt - timedelta(minutes=60)
-        search_end = dt + timedelta(minutes=60)
-        candidate_times = list(
-            filter(lambda t: search_start <= t <= search_end, past_padded_timeline)
+        pred_epoch = dt.timestamp()
+        candidate_times = past_padded_timeline.between(
+            pred_epoch - _hilo_search_seconds, pred_epoch + _hilo_search_seconds
         )
         observed = {t: tides.get(t, None) for t in candidate_times}
         # remove the times which have no tide data
@@ -633,10 +679,9 @@ def clean_tide_data(in_dict: dict, station: Station) -> dict:
     return cleaned
 
 
-def handle_float(element, fieldName: str, required: bool, local_dt: datetime):
+def handle_float(reading: dict, fieldName: str, required: bool, local_dt: datetime):
     try:
-        data_str = None
-        data_str = element.find(f"./{fieldName}").text
+        data_str = reading.get(fieldName)
         float_val = float(data_str)
         if float_val is None and required:
             raise ValueError()
@@ -648,11 +693,10 @@ def handle_float(element, fieldName: str, required: bool, local_dt: datetime):
         return None
 
 
-def handle_windspeed(element, fieldName: str, local_dt: datetime):
+def handle_windspeed(reading: dict, fieldName: str, local_dt: datetime):
     """Convert wind speed string in meters per sec to miles per hour. Returns None if missing or bad data."""
     try:
-        wspd_str = "?"
-        wspd_str = element.find(f"./{fieldName}").text
+        wspd_str = reading.get(fieldName)
         if wspd_str is None or len(wspd_str.strip()) == 0:
             raise ValueError()
         meters_per_sec = float(wspd_str)
@@ -665,11 +709,10 @@ def handle_windspeed(element, fieldName: str, local_dt: datetime):
         return None
 
 
-def handle_wind_degrees(element, fieldName: str, local_dt: datetime):
+def handle_wind_degrees(reading: dict, fieldName: str, local_dt: datetime):
     """Convert wind direction string to degrees. Returns None if missing or bad data."""
     try:
-        deg_str = "?"
-        deg_str = element.find(f"./{fieldName}").text
+        deg_str = reading.get(fieldName)
         if deg_str is None or len(deg_str.strip()) == 0:
             raise ValueError()
         degrees = int(deg_str)
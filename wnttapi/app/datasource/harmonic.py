@@ -0,0 +1,456 @@
+import functools
+import json
+import logging
+import math
+import os
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from app import tzutil as tz
+from app import util
+from app.hilo import Hilo, PredictedHighOrLow
+from app.timeline import Timeline
+
+logger = logging.getLogger(__name__)
+_default_file_dir = "/data/stations"
+
+"""
+    Astronomical tide predictions computed locally from a station's harmonic constituents, the way NOAA
+    computes them, rather than fetched from the tides & currents API.
+
+    The constituents for a station are in harcon-<noaa id>.json next to stations.json, as written by
+    tools/harcon_pull.py from NOAA's metadata API: the amplitude (feet) and Greenwich phase (degrees) of each
+    of NOAA's 37 constituents, and the height of mean sea level above NAVD88. The level at time t is
+
+        msl + sum(f * amplitude * cos(speed * (t - t0) + (V0 + u) - phase))
+
+    where t0 is the start of the year, V0 is each constituent's equilibrium argument at t0, and f and u are
+    its node factor and nodal correction at the middle of the year, all per Schureman's Manual of Harmonic
+    Analysis and Prediction of Tides, as NOAA does. The sum is done with numpy for all times at once.
+
+    Levels are in NAVD88 feet. See tools/astro_validate.py for comparing them with NOAA's stored predictions.
+"""
+
+_step_seconds = 15 * 60
+# Highs and lows are found to the minute, which is how NOAA reports their times, after searching for them on
+# a grid this coarse. The tide can't turn twice within it.
+_hilo_step_seconds = 60
+_hilo_search_seconds = 6 * 60
+_j2000_epoch = 946728000  # 2000-01-01 12:00 UTC
+_seconds_per_century = 36525 * 86400
+_moon_inclination = math.radians(5.145)
+
+# The equilibrium argument of each constituent is a sum of these astronomical arguments, in degrees:
+# T+h-s: mean lunar time, s: mean longitude of the moon, h: of the sun, p: of the lunar perigee,
+# p1: of the solar perigee, and a constant 90.
+_arguments = ("T+h-s", "s", "h", "p", "p1", "90")
+# Rate of change of each of _arguments, in degrees per hour.
+_argument_speeds = np.array(
+    [15 + (36000.76983 - 481267.88123421) / 876600, 481267.88123421 / 876600,
+     36000.76983 / 876600, 4069.0137287 / 876600, 1.71946 / 876600, 0.0]
+)  # fmt: skip
+
+
+def _unity(n: dict) -> tuple:
+    return 1.0, 0.0
+
+
+def _mm(n: dict) -> tuple:
+    return (2 / 3 - math.sin(n["I"]) ** 2) / 0.5021, 0.0
+
+
+def _mf(n: dict) -> tuple:
+    return math.sin(n["I"]) ** 2 / 0.1578, -2 * n["xi"]
+
+
+def _o1(n: dict) -> tuple:
+    f = math.sin(n["I"]) * math.cos(n["I"] / 2) ** 2 / 0.3800
+    return f, 2 * n["xi"] - n["nu"]
+
+
+def _j1(n: dict) -> tuple:
+    return math.sin(2 * n["I"]) / 0.7214, -n["nu"]
+
+
+def _oo1(n: dict) -> tuple:
+    f = math.sin(n["I"]) * math.sin(n["I"] / 2) ** 2 / 0.01640
+    return f, -2 * n["xi"] - n["nu"]
+
+
+def _m1(n: dict) -> tuple:
+    incl, P = n["I"], n["P"]
+    f_o1 = _o1(n)[0]
+    inv_qa = math.sqrt(
+        0.25
+        + 1.5 * math.cos(incl) * math.cos(2 * P) / math.cos(incl / 2) ** 2
+        + 2.25 * math.cos(incl) ** 2 / math.cos(incl / 2) ** 4
+    )
+    q = math.atan2(
+        (5 * math.cos(incl) - 1) * math.sin(P), (7 * math.cos(incl) + 1) * math.cos(P)
+    )
+    return f_o1 * inv_qa, n["xi"] - n["nu"] + q
+
+
+def _k1(n: dict) -> tuple:
+    incl, nu = n["I"], n["nu"]
+    f = math.sqrt(
+        0.8965 * math.sin(2 * incl) ** 2
+        + 0.6001 * math.sin(2 * incl) * math.cos(nu)
+        + 0.1006
+    )
+    return f, -n["nu1"]
+
+
+def _m2(n: dict) -> tuple:
+    return math.cos(n["I"] / 2) ** 4 / 0.9154, 2 * n["xi"] - 2 * n["nu"]
+
+
+def _2sm2(n: dict) -> tuple:
+    f, u = _m2(n)
+    return f, -u
+
+
+def _l2(n: dict) -> tuple:
+    f_m2, u_m2 = _m2(n)
+    tan2 = math.tan(n["I"] / 2) ** 2
+    P2 = 2 * n["P"]
+    inv_ra = math.sqrt(1 - 12 * tan2 * math.cos(P2) + 36 * tan2**2)
+    r = math.atan2(math.sin(P2), 1 / (6 * tan2) - math.cos(P2))
+    return f_m2 * inv_ra, u_m2 - r
+
+
+def _k2(n: dict) -> tuple:
+    incl, nu = n["I"], n["nu"]
+    f = math.sqrt(
+        19.0444 * math.sin(incl) ** 4
+        + 2.7702 * math.sin(incl) ** 2 * math.cos(2 * nu)
+        + 0.0981
+    )
+    return f, -n["2nu2"]
+
+
+def _m3(n: dict) -> tuple:
+    f, u = _m2(n)
+    return f**1.5, 1.5 * u
+
+
+# {name: (multiple of each of _arguments, node factor function)}, by NOAA's names.
+_constituents = {
+    "SA": ((0, 0, 1, 0, 0, 0), _unity),
+    "SSA": ((0, 0, 2, 0, 0, 0), _unity),
+    "MM": ((0, 1, 0, -1, 0, 0), _mm),
+    "MSF": ((0, 2, -2, 0, 0, 0), _unity),
+    "MF": ((0, 2, 0, 0, 0, 0), _mf),
+    "2Q1": ((1, -3, 0, 2, 0, 1), _o1),
+    "Q1": ((1, -2, 0, 1, 0, 1), _o1),
+    "RHO": ((1, -2, 2, -1, 0, 1), _o1),
+    "O1": ((1, -1, 0, 0, 0, 1), _o1),
+    "M1": ((1, 0, 0, 1, 0, -1), _m1),
+    "P1": ((1, 1, -2, 0, 0, 1), _unity),
+    "S1": ((1, 1, -1, 0, 0, 0), _unity),
+    "K1": ((1, 1, 0, 0, 0, -1), _k1),
+    "J1": ((1, 2, 0, -1, 0, -1), _j1),
+    "OO1": ((1, 3, 0, 0, 0, -1), _oo1),
+    "2N2": ((2, -2, 0, 2, 0, 0), _m2),
+    "MU2": ((2, -2, 2, 0, 0, 0), _m2),
+    "N2": ((2, -1, 0, 1, 0, 0), _m2),
+    "NU2": ((2, -1, 2, -1, 0, 0), _m2),
+    "M2": ((2, 0, 0, 0, 0, 0), _m2),
+    "LAM2": ((2, 1, -2, 1, 0, 2), _m2),
+    "L2": ((2, 1, 0, -1, 0, 2), _l2),
+    "T2": ((2, 2, -3, 0, 1, 0), _unity),
+    "S2": ((2, 2, -2, 0, 0, 0), _unity),
+    "R2": ((2, 2, -1, 0, -1, 2), _unity),
+    "K2": ((2, 2, 0, 0, 0, 0), _k2),
+    "2SM2": ((2, 4, -4, 0, 0, 0), _2sm2),
+    "M3": ((3, 0, 0, 0, 0, 0), _m3),
+}
+# Shallow water constituents: {name: ((base name, multiple), ...)}. Their arguments and nodal corrections
+# are the sums, and their node factors the products, of their members'.
+_compounds = {
+    "2MK3": (("M2", 2), ("K1", -1)),
+    "MK3": (("M2", 1), ("K1", 1)),
+    "MN4": (("M2", 1), ("N2", 1)),
+    "M4": (("M2", 2),),
+    "MS4": (("M2", 1), ("S2", 1)),
+    "S4": (("S2", 2),),
+    "M6": (("M2", 3),),
+    "S6": (("S2", 3),),
+    "M8": (("M2", 4),),
+}
+
+
+class Harmonics(NamedTuple):
+    """The harmonic constituents of a station. Don't modify."""
+
+    noaa_id: str
+    msl: float  # mean sea level, NAVD88 feet
+    names: tuple
+    amplitudes: np.ndarray  # feet
+    phases: np.ndarray  # Greenwich phase lag, degrees
+
+
+def get_15m_tides(
+    noaa_station_id: str,
+    timeline: Timeline,
+    navd88_func: callable,
+    data_dir: str = _default_file_dir,
+) -> dict:
+    """Same as astrotide.get_15m_astro_tides, but predicted from the station's constituents."""
+    harmonics = load_harmonics(noaa_station_id, data_dir)
+    start = tz.to_epoch(timeline.get_min(False))
+    end = tz.to_epoch(timeline.get_max(False))
+    # Start on a quarter hour, as NOAA's predictions do.
+    epochs = np.arange(start - start % _step_seconds, end + 1, _step_seconds)
+    levels = predict(harmonics, epochs)
+    time_zone = timeline.time_zone
+    preds = {}
+    for epoch, level in zip(epochs.tolist(), np.round(levels, 3).tolist()):
+        dt = tz.from_epoch(epoch, time_zone)
+        if timeline.contains(dt):
+            preds[dt] = navd88_func(level)
+    return preds
+
+
+def get_hilo_tides(
+    noaa_station_id: str,
+    timeline: Timeline,
+    navd88_func: callable,
+    data_dir: str = _default_file_dir,
+) -> dict:
+    """Same as astrotide.get_hilo_astro_tides, but predicted from the station's constituents."""
+    harmonics = load_harmonics(noaa_station_id, data_dir)
+    start = tz.to_epoch(timeline.get_min(True))
+    end = tz.to_epoch(timeline.get_max(True))
+    time_zone = timeline.time_zone
+    data = {}
+    for epoch, level, hilo in predict_hilos(harmonics, start, end):
+        real_dt = tz.from_epoch(epoch, time_zone)
+        dt = util.round_to_quarter(real_dt)
+        if timeline.contains(dt):
+            data[dt] = PredictedHighOrLow(navd88_func(level), hilo, real_dt)
+    return data
+
+
+def predict(
+    harmonics: Harmonics, epochs: np.ndarray, node_year: int = None
+) -> np.ndarray:
+    """Predict the tide level at each time.
+
+    Args:
+        harmonics (Harmonics): the station's constituents
+        epochs (np.ndarray): times, in epoch seconds
+        node_year (int, optional): use this year's node factors for all the times, rather than each time's own.
+
+    Returns:
+        np.ndarray: the levels, in NAVD88 feet
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    levels = np.empty(len(epochs))
+    if node_year is None:
+        years = get_years(epochs)
+    else:
+        years = np.full(len(epochs), node_year)
+    for year in np.unique(years).tolist():
+        in_year = years == year
+        t0, speeds, v0u, f = get_year_terms(year, harmonics.names)
+        hours = (epochs[in_year] - t0) / 3600
+        # One row per time, one column per constituent.
+        angles = np.radians(np.outer(hours, speeds) + (v0u - harmonics.phases))
+        levels[in_year] = harmonics.msl + np.cos(angles) @ (f * harmonics.amplitudes)
+    return levels
+
+
+def predict_hilos(harmonics: Harmonics, start: int, end: int) -> list:
+    """Find the highs and lows between two times.
+
+    Args:
+        harmonics (Harmonics): the station's constituents
+        start, end (int): the time range, in epoch seconds
+
+    Returns:
+        list: (epoch seconds, NAVD88 feet rounded like NOAA's, Hilo) for each, in time order
+    """
+    # The level jumps a little at the new year, when the node factors change, and that mustn't look like
+    # the tide turning. So search each year with its own node factors throughout.
+    hilos = []
+    for year in range(int(get_years([start])[0]), int(get_years([end])[0]) + 1):
+        year_start = get_year_terms(year, harmonics.names)[0]
+        next_start = get_year_terms(year + 1, harmonics.names)[0]
+        hilos += predict_year_hilos(
+            harmonics, year, max(start, year_start), min(end, next_start - 1)
+        )
+    return hilos
+
+
+def predict_year_hilos(harmonics: Harmonics, year: int, start: int, end: int) -> list:
+    """Same as predict_hilos, for a time range within a year."""
+    # Find where the level turns on a coarse grid, with a step either side of the range, then find the
+    # minute it turns at within a step either side of that.
+    step = _hilo_search_seconds
+    epochs = np.arange(start - start % step - step, end + 2 * step, step)
+    rising = np.diff(predict(harmonics, epochs, year)) > 0
+    turns = np.flatnonzero(rising[:-1] != rising[1:]) + 1
+    if len(turns) == 0:
+        return []
+    offsets = np.arange(-step, step + 1, _hilo_step_seconds)
+    fine_epochs = epochs[turns][:, np.newaxis] + offsets
+    fine_levels = predict(harmonics, fine_epochs.ravel(), year).reshape(
+        fine_epochs.shape
+    )
+    is_high = rising[turns - 1]
+    best = np.where(
+        is_high, np.argmax(fine_levels, axis=1), np.argmin(fine_levels, axis=1)
+    )
+    hilos = []
+    for row, col in enumerate(best.tolist()):
+        epoch = int(fine_epochs[row, col])
+        if start <= epoch <= end:
+            hilo = Hilo.HIGH if is_high[row] else Hilo.LOW
+            hilos.append((epoch, round(float(fine_levels[row, col]), 3), hilo))
+    return hilos
+
+
+def get_years(epochs: np.ndarray) -> np.ndarray:
+    """Return the UTC year of each time."""
+    epochs = np.asarray(epochs, dtype=np.int64)
+    return epochs.astype("datetime64[s]").astype("datetime64[Y]").astype(int) + 1970
+
+
+@functools.lru_cache(maxsize=32)
+def get_year_terms(year: int, names: tuple) -> tuple:
+    """Return the terms of the prediction for a year that don't depend on the station's amplitudes and phases.
+
+    Args:
+        year (int): the UTC year
+        names (tuple): names of the constituents, in the order of the station's amplitudes and phases
+
+    Returns:
+        tuple: (t0, the start of the year in epoch seconds, and for each constituent, in arrays: speed in
+            degrees per hour, V0 + u in degrees, f)
+    """
+    t0 = tz.to_epoch(datetime(year, 1, 1, tzinfo=tz.utc))
+    mid = (t0 + tz.to_epoch(datetime(year + 1, 1, 1, tzinfo=tz.utc))) // 2
+    v0_args = get_astro_arguments(t0)
+    nodal = get_nodal_terms(mid)
+    speeds, v0u, f = [], [], []
+    for name in names:
+        coefs, node_f, node_u = get_constituent(name, nodal)
+        speeds.append(np.dot(coefs, _argument_speeds))
+        v0u.append((np.dot(coefs, v0_args) + node_u) % 360)
+        f.append(node_f)
+    return t0, np.array(speeds), np.array(v0u), np.array(f)
+
+
+def get_constituent(name: str, nodal: dict) -> tuple:
+    """Return the multiples of the astronomical arguments, f, and u in degrees, for a constituent."""
+    if name in _constituents:
+        coefs, node_func = _constituents[name]
+        f, u = node_func(nodal)
+        return np.array(coefs, dtype=float), f, math.degrees(u)
+    if name in _compounds:
+        coefs, f, u = np.zeros(len(_arguments)), 1.0, 0.0
+        for member, multiple in _compounds[name]:
+            member_coefs, member_f, member_u = get_constituent(member, nodal)
+            coefs += multiple * member_coefs
+            f *= member_f ** abs(multiple)
+            u += multiple * member_u
+        return coefs, f, u
+    raise util.InternalError(f"Unknown constituent: {name}")
+
+
+def get_astro_arguments(epoch: int) -> np.ndarray:
+    """Return the values of _arguments at a time, in degrees."""
+    args = get_orbit_elements(epoch)
+    # Schureman's T is the hour angle of the mean sun at Greenwich, which is 180 degrees at midnight.
+    mean_solar_time = 180 + 15 * (epoch % 86400) / 3600
+    return np.array(
+        [
+            mean_solar_time + args["h"] - args["s"],
+            args["s"],
+            args["h"],
+            args["p"],
+            args["p1"],
+            90.0,
+        ]
+    )
+
+
+def get_orbit_elements(epoch: int) -> dict:
+    """Return the mean longitudes, in degrees, and the obliquity of the ecliptic, at a time. Per Meeus,
+    Astronomical Algorithms, which is close enough to Schureman's for prediction."""
+    t = (epoch - _j2000_epoch) / _seconds_per_century
+    return {
+        "s": 218.3164477 + 481267.88123421 * t,
+        "h": 280.46646 + 36000.76983 * t,
+        "p": 83.3532465 + 4069.0137287 * t,
+        "N": 125.04452 - 1934.136261 * t,  # the moon's ascending node
+        "p1": 282.93735 + 1.71946 * t,
+        "omega": 23.4392911 - 0.0130042 * t,
+    }
+
+
+def get_nodal_terms(epoch: int) -> dict:
+    """Return the terms that the node factors and nodal corrections are functions of, in radians: I, the
+    inclination of the moon's orbit to the equator, nu, xi, nu1 (Schureman's nu'), 2nu2 (his 2nu'') and P.
+    """
+    args = get_orbit_elements(epoch)
+    # Keep N/2 within +-90 degrees, so the arctangents below don't wrap.
+    N = math.radians((args["N"] + 180) % 360 - 180)
+    omega = math.radians(args["omega"])
+    i = _moon_inclination
+    incl = math.acos(
+        math.cos(i) * math.cos(omega) - math.sin(i) * math.sin(omega) * math.cos(N)
+    )
+    e1 = math.atan(
+        math.cos((omega - i) / 2) / math.cos((omega + i) / 2) * math.tan(N / 2)
+    )
+    e2 = math.atan(
+        math.sin((omega - i) / 2) / math.sin((omega + i) / 2) * math.tan(N / 2)
+    )
+    nu = e1 - e2
+    xi = N - e1 - e2
+    nu1 = math.atan2(
+        math.sin(2 * incl) * math.sin(nu), math.sin(2 * incl) * math.cos(nu) + 0.3347
+    )
+    nu2_2 = math.atan2(
+        math.sin(incl) ** 2 * math.sin(2 * nu),
+        math.sin(incl) ** 2 * math.cos(2 * nu) + 0.0727,
+    )
+    P = math.radians(args["p"]) - xi
+    return {"I": incl, "nu": nu, "xi": xi, "nu1": nu1, "2nu2": nu2_2, "P": P}
+
+
+def get_file_path(noaa_station_id: str, data_dir: str = _default_file_dir) -> str:
+    return os.path.join(data_dir, f"harcon-{noaa_station_id}.json")
+
+
+def has_harmonics(noaa_station_id: str, data_dir: str = _default_file_dir) -> bool:
+    return os.path.exists(get_file_path(noaa_station_id, data_dir))
+
+
+def load_harmonics(
+    noaa_station_id: str, data_dir: str = _default_file_dir
+) -> Harmonics:
+    """Get a station's constituents, reading its file if it's not read yet or has changed."""
+    filepath = get_file_path(noaa_station_id, data_dir)
+    return read_harmonics(filepath, os.stat(filepath).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=16)
+def read_harmonics(filepath: str, mtime_ns: int) -> Harmonics:
+    with open(filepath) as f:
+        data = json.load(f)
+    constituents = [c for c in data["constituents"] if c["amplitude"] != 0]
+    for c in constituents:
+        if c["name"] not in _constituents and c["name"] not in _compounds:
+            raise util.InternalError(f"Unknown constituent {c['name']} in {filepath}")
+    return Harmonics(
+        data["noaaStationId"],
+        float(data["mslNavd88"]),
+        tuple(c["name"] for c in constituents),
+        np.array([float(c["amplitude"]) for c in constituents]),
+        np.array([float(c["phase"]) for c in constituents]),
+    )
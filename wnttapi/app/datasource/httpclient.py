@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+"""
+One HTTP client for the REST data sources: NOAA tides & currents, Open-Meteo and the geocoder.
+
+Each host gets its own requests.Session, so its connections are kept alive and reused from one call to the
+next, rather than a new TCP and TLS handshake for every call. A GET that times out, can't connect, or gets a
+5xx is retried a few times, with a jittered exponential backoff, so a brief outage or a busy server doesn't
+fail the graph. Once retries run out, errors are raised just as requests.get raises them, so callers still
+use raise_for_status, and util.request_logger and the views handle errors as before.
+
+Counters, per host, see metrics:
+    http.<host>.requests: calls made, not counting retries
+    http.<host>.retries: retries made
+    http.<host>.errors: calls that raised or returned a status >= 400 after retries
+    http.<host>.ms: total milliseconds spent in calls, including retries. Divide by requests for the mean.
+"""
+
+_max_retries = 2
+_backoff_seconds = 0.5  # the second retry waits about 1 sec, plus jitter
+_backoff_jitter_seconds = 0.5
+_retry_statuses = (500, 502, 503, 504)
+_max_connections_per_host = 10
+
+_sessions = {}  # {host: requests.Session}
+_sessions_pid = None
+_sessions_lock = threading.Lock()
+
+
+def get(url: str, params: dict = None, timeout: float = None) -> requests.Response:
+    """Send a GET request like requests.get, with the host's session and retry policy.
+
+    Args:
+        url (str): the url
+        params (dict): query parameters, if any
+        timeout (float): seconds to wait to connect, and to wait for each read, on each try
+
+    Returns:
+        requests.Response: the response, which may have an error status. Raises requests.RequestException
+            if there's no response after retries.
+    """
+    host = urlsplit(url).hostname
+    start = time.perf_counter()
+    metrics.incr(f"http.{host}.requests")
+    try:
+        response = get_session(host).get(url, params=params, timeout=timeout)
+    except requests.RequestException:
+        metrics.incr(f"http.{host}.errors")
+        raise
+    finally:
+        metrics.incr(f"http.{host}.ms", round((time.perf_counter() - start) * 1000))
+    retries = response.raw.retries
+    if retries is not None and len(retries.history) > 0:
+        metrics.incr(f"http.{host}.retries", len(retries.history))
+    if response.status_code >= 400:
+        metrics.incr(f"http.{host}.errors")
+    return response
+
+
+def get_session(host: str) -> requests.Session:
+    """Get the session for a host in this process, creating it if necessary."""
+    global _sessions, _sessions_pid
+    pid = os.getpid()
+    with _sessions_lock:
+        # A forked process must not share the parent's connections.
+        if _sessions_pid != pid:
+            _sessions = {}
+            _sessions_pid = pid
+        if host not in _sessions:
+            _sessions[host] = build_session()
+        return _sessions[host]
+
+
+def build_session() -> requests.Session:
+    retry = Retry(
+        total=_max_retries,
+        backoff_factor=_backoff_seconds,
+        backoff_jitter=_backoff_jitter_seconds,
+        status_forcelist=_retry_statuses,
+        allowed_methods=["GET"],
+        # Return the last response, so raise_for_status raises it as usual.
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        max_retries=retry,
+        pool_connections=1,
+        pool_maxsize=_max_connections_per_host,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,57 +1,220 @@
+import io
 import logging
 import os
+import queue
+import tempfile
+import threading
+from contextlib import contextmanager
 
+import requests
+from suds.cache import ObjectCache
 from suds.client import Client
-from suds.transport.https import HttpAuthenticated, HttpTransport
+from suds.transport import Reply, TransportError
+from suds.transport.http import HttpTransport
+
+from app import metrics
 
 logger = logging.getLogger(__name__)
 CDMO_WSDL = "https://cdmo.baruch.sc.edu/webservices2/requests.cfc?wsdl"
 TIMEOUT_SEC = 300
 
+"""
+A pool of suds clients for the CDMO web services.
+
+Building a suds Client means fetching and parsing the CDMO WSDL, which takes seconds. The parsed WSDL is
+pickled to a cache directory on the data volume, so a new process, such as each cdmo_refresh run, just loads
+it from there, and it's kept in memory once loaded, so each client after the first is built in well under a
+millisecond. If the cached WSDL is missing, unreadable or older than _wsdl_cache_days, it's fetched again.
+
+A suds Client is not safe to use from more than one thread at a time, so each call borrows one from the pool
+with cdmo_client(). Each client has its own requests.Session, so its connection to CDMO is kept alive from
+one call to the next.
+
+Counters, see metrics:
+    soap.client_created, soap.client_reused: clients built for the pool, and borrowed from it
+    soap.requests, soap.connections: HTTP requests to CDMO, and new connections they needed
+"""
+
+_wsdl_cache_dir = os.environ.get("CDMO_WSDL_CACHE", "/data/cache/wsdl")
+_wsdl_cache_days = 7
+_max_idle_clients = 4
+
+_wsdl_cache = None
+_build_lock = threading.Lock()
+_idle_clients = queue.LifoQueue(maxsize=_max_idle_clients)
+
+
+class WsdlCache(ObjectCache):
+    """The suds cache of pickled WSDL objects, which also keeps the ones it has loaded in memory. Clients
+    built with the same cache share the WSDL object, as suds clones do."""
+
+    def __init__(self, location: str, **duration):
+        ObjectCache.__init__(self, location, **duration)
+        self.loaded = {}
+
+    def get(self, id):
+        if id not in self.loaded:
+            obj = ObjectCache.get(self, id)
+            if obj is None:
+                return None
+            self.loaded[id] = obj
+        return self.loaded[id]
+
+    def put(self, id, object):
+        self.loaded[id] = object
+        return ObjectCache.put(self, id, object)
+
+    def __getstate__(self):
+        # The cache is pickled along with the WSDL's options. Leave out the WSDL itself.
+        return {k: v for k, v in self.__dict__.items() if k != "loaded"}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.loaded = {}
+
+
+class SessionTransport(HttpTransport):
+    """A suds transport that sends http(s) requests with a requests.Session, which keeps connections alive
+    and sends the CDMO credentials, if any, with every request. Other urls, e.g. file://, are opened the way
+    suds always does."""
 
-class CustomTransport(HttpAuthenticated):
-    def __init__(self, username, password):
+    def __init__(self, username: str = None, password: str = None):
+        HttpTransport.__init__(self)
         self.username = username
         self.password = password
-        HttpAuthenticated.__init__(self, username=username, password=password)
+        self.session = requests.Session()
+        if username and password:
+            self.session.auth = (username, password)
 
     def open(self, request):
-        request.headers["authorization"] = f"Basic {self._basic_auth()}"
-        return HttpTransport.open(self, request)
+        if not is_http(request.url):
+            return HttpTransport.open(self, request)
+        response = self.request("GET", request.url, request.headers)
+        if response.status_code >= 400:
+            raise TransportError(
+                response.reason, response.status_code, io.BytesIO(response.content)
+            )
+        return io.BytesIO(response.content)
+
+    def send(self, request):
+        if not is_http(request.url):
+            return HttpTransport.send(self, request)
+        response = self.request(
+            "POST", request.url, request.headers, request.message, request.timeout
+        )
+        if response.status_code in (202, 204):
+            return None
+        # A SOAP fault comes with a 500, and suds reads it from the error.
+        if response.status_code >= 400:
+            raise TransportError(
+                response.reason, response.status_code, io.BytesIO(response.content)
+            )
+        return Reply(200, response.headers, response.content)
 
-    def _basic_auth(self):
-        import base64
+    def request(
+        self, method: str, url: str, headers: dict, data=None, timeout=None
+    ) -> requests.Response:
+        connections = self.count_connections(url)
+        response = self.session.request(
+            method,
+            url,
+            headers=headers,
+            data=data,
+            timeout=timeout or self.options.timeout,
+        )
+        metrics.incr("soap.requests")
+        metrics.incr("soap.connections", self.count_connections(url) - connections)
+        return response
 
-        credentials = f"{self.username}:{self.password}"
-        return base64.b64encode(credentials.encode("utf-8")).decode("utf-8")
+    def count_connections(self, url: str) -> int:
+        """Return the number of connections this transport has opened so far, for urls like this one."""
+        pools = self.session.get_adapter(url).poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
 
+    def __getstate__(self):
+        # The transport is pickled in the cached WSDL, but replaced when it's loaded, so leave out the
+        # credentials and session.
+        return {"options": self.options}
 
-class SoapClient:
-    """Singleton class to hold the suds Client object, since creating it is expensive and seems to cause CDMO to reject the user/password if done on every request. This is a workaround until that issue is resolved."""
+    def __setstate__(self, state):
+        self.__init__()
+        self.options = state["options"]
 
-    _client = None
 
-    @classmethod
-    def get_client(cls):
-        if cls._client is None:
-            user_name = os.environ.get("CDMO_USER", None)
-            password = os.environ.get("CDMO_PASSWORD", None)
-            transport = (
-                CustomTransport(user_name, password) if user_name and password else None
-            )
-            if transport is not None:
-                logger.debug(f"Creating Client with username {user_name}")
-                cls._client = Client(
-                    CDMO_WSDL,
-                    retxml=True,
-                    transport=transport,
-                )
-            else:
-                logger.debug("Creating Client with no transport")
-                cls._client = Client(
-                    CDMO_WSDL,
-                    retxml=True,
-                )
-            # This is the only way to override the default 90 sec.  Doesn't work in constructor.
-            cls._client.set_options(timeout=TIMEOUT_SEC)
-        return cls._client
+def is_http(url: str) -> bool:
+    return url.startswith(("http://", "https://"))
+
+
+@contextmanager
+def cdmo_client():
+    """Borrow a suds client for the CDMO web services from the pool, and put it back when done.
+
+    Example:
+        with soap.cdmo_client() as client:
+            xml = client.service.exportAllParamsDateRangeXMLNew(...)
+    """
+    try:
+        client = _idle_clients.get_nowait()
+        metrics.incr("soap.client_reused")
+    except queue.Empty:
+        client = new_client()
+        metrics.incr("soap.client_created")
+    try:
+        yield client
+    finally:
+        try:
+            _idle_clients.put_nowait(client)
+        except queue.Full:
+            pass
+
+
+def new_client() -> Client:
+    global _wsdl_cache
+    # One at a time, so the WSDL is only fetched once.
+    with _build_lock:
+        if _wsdl_cache is None:
+            _wsdl_cache = make_wsdl_cache(_wsdl_cache_dir)
+        return build_client(
+            CDMO_WSDL,
+            os.environ.get("CDMO_USER", None),
+            os.environ.get("CDMO_PASSWORD", None),
+            _wsdl_cache,
+        )
+
+
+def make_wsdl_cache(cache_dir: str) -> WsdlCache:
+    """Make the WSDL cache in a directory. If it can't be created, the WSDL is only cached in memory."""
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Not saving the WSDL in {cache_dir}: {e}")
+        cache_dir = tempfile.mkdtemp()
+    return WsdlCache(cache_dir, days=_wsdl_cache_days)
+
+
+def build_client(
+    wsdl_url: str, user_name: str, password: str, cache: WsdlCache
+) -> Client:
+    """Build a suds client, with its parsed WSDL from a cache if it's there.
+
+    Args:
+        wsdl_url (str): url of the WSDL
+        user_name (str): user name for basic authentication, or None for none
+        password (str): password for basic authentication
+        cache (WsdlCache): cache of parsed WSDL
+
+    Returns:
+        Client: the client, which returns replies as xml bytes
+    """
+    logger.debug(f"Creating Client with username {user_name}")
+    client = Client(
+        wsdl_url,
+        retxml=True,
+        transport=SessionTransport(user_name, password),
+        cache=cache,
+        # Cache the parsed WSDL rather than the xml documents.
+        cachingpolicy=1,
+    )
+    # This is the only way to override the default 90 sec.  Doesn't work in constructor.
+    client.set_options(timeout=TIMEOUT_SEC)
+    return client
@@ -1,13 +1,18 @@
 import csv
+import json
 import logging
+import mmap
 import os
 import os.path
 import re
+import struct
+import threading
 from datetime import datetime, timedelta
 
 import sentry_sdk
 from django.core.cache import cache
 
+from app import timestamps
 from app import tzutil as tz
 from app.timeline import Timeline
 
@@ -16,6 +21,22 @@ _default_surge_file_dir = "/data/surge/data"
 _max_surge = 20
 _min_surge = -20
 _no_value = "9999.000"
+_hour_seconds = 60 * 60
+_file_pattern = re.compile(r"(\d+)-(\d+)-(\d\d).csv$")  # e.g. 8419317-20260213-06.csv
+
+# A snapshot is a binary copy of the surge values in a csv file, written by tools/surge_snapshot.py when the file
+# is downloaded. The header is followed by a little-endian float32 surge value (surge + bias, rounded to 2
+# places) for each hour from the start, then a byte for each hour that is 1 if its value is valid, else 0.
+_snapshot_suffix = ".surge"
+_snapshot_magic = b"WSRG"
+_snapshot_version = 1
+# magic, version, start epoch, step seconds, count
+_snapshot_header = struct.Struct("<4sB3xqii")
+
+# The manifest lists the latest file for each station, written by tools/surge_snapshot.py.
+_manifest_name = "latest.json"
+_manifests = {}  # {manifest path: (mtime_ns, manifest)} loaded by this process
+_manifests_lock = threading.Lock()
 
 logger = logging.getLogger(__name__)
 
@@ -47,23 +68,40 @@ def get_future_surge_data(
     """
     future_surge_dict = {}
     # Don't bother looking for data more than 6 days in the future.
-    if timeline.end_dt >= timeline.now and timeline.start_dt < timeline.now + timedelta(
-        days=6
+    if (
+        timeline.end_dt >= timeline.now
+        and timeline.start_dt < timeline.now + timedelta(days=6)
     ):
         future_surge_dict = get_or_load_projected_surge_file(
             noaa_station_id, timeline, surge_file_dir
         )
-        # If there's any recorded tides in the timeline, we don't want any data for those times.
-        if last_recorded_dt is not None and len(future_surge_dict) > 0:
-            future_surge_dict["surges"] = {
-                dt: val
-                for dt, val in future_surge_dict["surges"].items()
-                if dt > last_recorded_dt
-            }
+        future_surge_dict = exclude_recorded_times(future_surge_dict, last_recorded_dt)
 
     return future_surge_dict
 
 
+def exclude_recorded_times(future_surge_dict: dict, last_recorded_dt: datetime) -> dict:
+    """If there's any recorded tides in the timeline, we don't want any surge data for those times. Returns
+    a new dict rather than altering the one passed in, which may be shared with the cache.
+
+    Args:
+        future_surge_dict (dict): as returned by get_future_surge_data
+        last_recorded_dt (datetime): time of latest recorded tide, or None
+
+    Returns:
+        dict: same as future_surge_dict, with only surges later than last_recorded_dt
+    """
+    if last_recorded_dt is None or len(future_surge_dict) == 0:
+        return future_surge_dict
+    return future_surge_dict | {
+        "surges": {
+            dt: val
+            for dt, val in future_surge_dict["surges"].items()
+            if dt > last_recorded_dt
+        }
+    }
+
+
 def get_recorded_storm_surge(astro_dict: dict, obs_tides: dict) -> dict:
     """Calculate the past storm surge, which is the difference between the observed tide and the
     predicted tide.
@@ -96,8 +134,9 @@ def get_or_load_projected_surge_file(
     We do not load any data whose tide time is more than 2 hours older than the current time, as that data
     cannot possibly be displayed in the application, and it would serve no purpose to cache it.
 
-    If the latest data for the station is already in cache, we return that. Otherwise, we look for the latest
-    file for that station in the surge file directory, parse it and cache the data.
+    If the latest file for the station has a snapshot, written when it was downloaded, we read just the values
+    the timeline needs from that. Otherwise, if the latest data for the station is already in cache, we return
+    that, or else we parse the file and cache the data.
 
     Args:
         noaa_station_id: the NOAA station id, so we know which file to read
@@ -110,6 +149,19 @@ def get_or_load_projected_surge_file(
         "file_creation_dt": file download datetime,
         "surges": { <dt>: <surge> }
     """
+    filepath, filedate, cycle, file_creation_dt = get_latest_file_info(
+        noaa_station_id, surge_file_dir
+    )
+    if filedate is not None:
+        surges_dict = read_snapshot(snapshot_path(filepath), timeline)
+        if surges_dict is not None:
+            return {
+                "filedate": filedate,
+                "cycle": cycle,
+                "file_creation_dt": file_creation_dt,
+                "surges": surges_dict,
+            }
+
     logger.debug(f"looking in surge cache for station {noaa_station_id}...")
 
     # pull the existing cache value, if any
@@ -121,10 +173,6 @@ def get_or_load_projected_surge_file(
     else:
         logger.debug("nothing in cache")
 
-    filepath, filedate, cycle, file_creation_dt = get_latest_file_info(
-        noaa_station_id, surge_file_dir
-    )
-
     # First handle the case of a missing file.
     if filedate is None:
         sentry_sdk.capture_message(f"missing surge file for {noaa_station_id}")
@@ -179,6 +227,10 @@ def get_latest_file_info(noaa_station_id: str, dir_path: str = _default_surge_fi
     and take the first one.  The file name format is <noaa_station_id>-<filedate>-<cycle>.csv,
     e.g  8419317-20260213-06.csv.  There are 4 6-hour cycles per day (00, 06, 12, 18).
 
+    The latest files are normally found in the manifest written by tools/surge_snapshot.py when the files
+    are downloaded, so there's no need to list the directory. If there's no manifest, or it doesn't have
+    the station, or its file is gone, we look through the directory instead.
+
     Args:
         noaa_station_id: the NOAA station id whose predictions we want
         dir_path (optional): Path of directory to search.  Overrideable for testing.
@@ -189,24 +241,15 @@ def get_latest_file_info(noaa_station_id: str, dir_path: str = _default_surge_fi
         int: the cycle -- 0, 6, 12, or 18, or None if not found
         datetime: datetime in UTC of when the file was created (downloaded), or None if not found
     """
-    pattern = r"(\d+)-(\d+)-(\d\d).csv$"  # e.g. 8419317-20260213-06.csv
-    filepath, filedate, cycle = None, None, None
+    entry = get_manifest(dir_path).get(noaa_station_id)
+    if entry is None or not os.path.exists(os.path.join(dir_path, entry["file"])):
+        entry = scan_latest_files(dir_path).get(noaa_station_id)
 
-    # Sort DirEntry objects by name in reverse (Z-A) order
-    for e in sorted(os.scandir(dir_path), key=lambda e: e.name, reverse=True):
-        matches = re.findall(
-            pattern, e.name
-        )  # returns list of tuples, not None if no match
-        if len(matches) == 1 and matches[0][0] == noaa_station_id:
-            filedate, cycle = (
-                matches[0][1],
-                int(matches[0][2]),
-            )
-            filepath = os.path.join(dir_path, e.name)
-            file_creation_dt = datetime.fromtimestamp(
-                os.path.getctime(filepath), tz=tz.utc
-            )
-            break
+    filepath, filedate, cycle, file_creation_dt = None, None, None, None
+    if entry is not None:
+        filepath = os.path.join(dir_path, entry["file"])
+        filedate, cycle = entry["filedate"], entry["cycle"]
+        file_creation_dt = datetime.fromtimestamp(entry["created"], tz=tz.utc)
 
     logger.debug(
         f"surge file for station {noaa_station_id}: {filepath}, filedate {filedate}, cycle {cycle}"
@@ -214,6 +257,74 @@ def get_latest_file_info(noaa_station_id: str, dir_path: str = _default_surge_fi
     return filepath, filedate, cycle, file_creation_dt
 
 
+def scan_latest_files(dir_path: str = _default_surge_file_dir) -> dict:
+    """List the surge file directory and find the latest file for each station.
+
+    Args:
+        dir_path (optional): Path of directory to search.
+
+    Returns:
+        dict: {noaa_station_id: {"file": file name, "filedate": str, "cycle": int, "created": epoch seconds}}
+    """
+    latest = {}
+    # Sort DirEntry objects by name in reverse (Z-A) order, so the first file for a station is the latest.
+    for e in sorted(os.scandir(dir_path), key=lambda e: e.name, reverse=True):
+        match = _file_pattern.search(e.name)
+        if match is not None and match.group(1) not in latest:
+            latest[match.group(1)] = {
+                "file": e.name,
+                "filedate": match.group(2),
+                "cycle": int(match.group(3)),
+                "created": e.stat().st_ctime,
+            }
+    return latest
+
+
+def write_manifest(dir_path: str = _default_surge_file_dir) -> dict:
+    """Write the manifest of the latest surge file for each station, replacing any earlier one in a single
+    step. Run whenever files are added or removed.
+
+    Args:
+        dir_path (optional): Path of the surge file directory.
+
+    Returns:
+        dict: the manifest, as returned by scan_latest_files.
+    """
+    latest = scan_latest_files(dir_path)
+    path = os.path.join(dir_path, _manifest_name)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as manifest_file:
+        json.dump(latest, manifest_file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+    return latest
+
+
+def get_manifest(dir_path: str = _default_surge_file_dir) -> dict:
+    """Get the manifest of latest surge files for this process, loading it first if it's new or changed.
+    Returns an empty dict if there's no manifest. Don't modify it, it's shared.
+    """
+    path = os.path.join(dir_path, _manifest_name)
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    loaded = _manifests.get(path)
+    if loaded is not None and loaded[0] == mtime_ns:
+        return loaded[1]
+    with _manifests_lock:
+        loaded = _manifests.get(path)
+        if loaded is None or loaded[0] != mtime_ns:
+            try:
+                with open(path) as manifest_file:
+                    loaded = (mtime_ns, json.load(manifest_file))
+            except (OSError, ValueError) as e:
+                logger.error(f"Ignoring surge manifest {path}: {e}")
+                return {}
+            _manifests[path] = loaded
+            logger.debug(f"Loaded surge manifest {path}")
+    return loaded[1]
+
+
 def parse_surge_file(timeline: Timeline, filepath: str) -> dict:
     """
     Parse the surge file and return a dict of surge values for all times in the timeline.
@@ -228,6 +339,7 @@ def parse_surge_file(timeline: Timeline, filepath: str) -> dict:
         ...
         """
         cutoff = timeline.now - timedelta(hours=2)
+        parse_time = timestamps.utc_parser(timestamps.SURGE, timeline.time_zone)
         with open(filepath) as surge_file:
             error_cnt = 0
             reader = csv.reader(surge_file, skipinitialspace=True)
@@ -239,10 +351,7 @@ def parse_surge_file(timeline: Timeline, filepath: str) -> dict:
                 if int(date_str) % 100 != 0:
                     continue
                 # All file datetimes are UTC. Convert to requested tz.
-                in_utc = datetime.strptime(date_str, "%Y%m%d%H%M").replace(
-                    tzinfo=tz.utc
-                )
-                local_dt = in_utc.astimezone(timeline.time_zone)
+                local_dt = parse_time(date_str)
                 if local_dt < cutoff:
                     continue
                 try:
@@ -254,7 +363,7 @@ def parse_surge_file(timeline: Timeline, filepath: str) -> dict:
                     else:
                         error_cnt += 1
                         logger.error(
-                            f"Out of range surge value [{surge}] for target {in_utc}"
+                            f"Out of range surge value [{surge}] for target {local_dt}"
                         )
                 except ValueError:
                     error_cnt += 1
@@ -264,8 +373,128 @@ def parse_surge_file(timeline: Timeline, filepath: str) -> dict:
                     f"Found {error_cnt} data errors in surge file!"
                 )
     except FileNotFoundError:
-        msg = f"Prediction file could not be opened: {surge_file}"
+        msg = f"Prediction file could not be opened: {filepath}"
         logger.error(msg)
         sentry_sdk.capture_message(msg)
 
     return surges_dict
+
+
+def snapshot_path(filepath: str) -> str:
+    """The path of the snapshot for a surge csv file, e.g. 8419317-20260213-06.surge"""
+    return os.path.splitext(filepath)[0] + _snapshot_suffix
+
+
+def write_snapshot(filepath: str) -> str:
+    """Write a snapshot of a surge csv file, next to it. The snapshot replaces any earlier one in a single step,
+    so readers never see a partial file.
+
+    Args:
+        filepath (str): the surge csv file
+
+    Returns:
+        str: the path of the snapshot
+
+    Raises:
+        ValueError: if the file has no valid surge values. No snapshot is written, so readers fall back to the
+        csv file, and report it.
+    """
+    values = {}  # {epoch: surge, or None if invalid}
+    parse_time = timestamps.utc_parser(timestamps.SURGE, tz.utc)
+    with open(filepath) as surge_file:
+        reader = csv.reader(surge_file, skipinitialspace=True)
+        next(reader)  # skip header row
+        for row in reader:
+            date_str, surge_str, bias_str = row[0], row[3], row[4]
+            # Only the times that are multiples of 100 have actual surge data.
+            if int(date_str) % 100 != 0:
+                continue
+            epoch = tz.to_epoch(parse_time(date_str))
+            try:
+                surge = float(surge_str) + (
+                    float(bias_str) if bias_str != _no_value else 0
+                )
+                if _min_surge <= surge <= _max_surge:
+                    values[epoch] = round(surge, 2)
+                else:
+                    values[epoch] = None
+                    logger.error(f"Out of range surge value [{surge}] for {date_str}")
+            except ValueError:
+                values[epoch] = None
+                logger.error("Invalid surge value: '%s'", surge_str)
+
+    if not any(value is not None for value in values.values()):
+        raise ValueError(f"No valid surge data found in file {filepath}")
+    start = min(values)
+    count = (max(values) - start) // _hour_seconds + 1
+    surges = [values.get(start + i * _hour_seconds) for i in range(count)]
+
+    path = snapshot_path(filepath)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as snapshot:
+        snapshot.write(
+            _snapshot_header.pack(
+                _snapshot_magic, _snapshot_version, start, _hour_seconds, count
+            )
+        )
+        snapshot.write(struct.pack(f"<{count}f", *(s or 0.0 for s in surges)))
+        snapshot.write(bytes(0 if s is None else 1 for s in surges))
+    os.replace(temp_path, path)
+    logger.debug(f"Wrote {count} hourly surge values to {path}")
+    return path
+
+
+def read_snapshot(path: str, timeline: Timeline) -> dict:
+    """Read the surge values for the timeline from a snapshot. Only the values for the hours from 2 hours
+    before now, or an hour before the timeline start if that's later, to an hour after the timeline end are
+    read, and only their datetimes are built.
+
+    Args:
+        path (str): the snapshot
+        timeline (Timeline): the timeline
+
+    Returns:
+        dict: { <dt>: <surge> }, which may be empty, or None if there is no snapshot or it can't be read.
+    """
+    try:
+        with open(path, "rb") as snapshot_file:
+            with mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                magic, version, start, step, count = _snapshot_header.unpack_from(data)
+                if magic != _snapshot_magic or version != _snapshot_version:
+                    logger.error(f"Ignoring surge snapshot {path} in unknown format")
+                    return None
+                # A value and a flag for each hour.
+                if (
+                    step <= 0
+                    or count < 0
+                    or len(data) < _snapshot_header.size + 5 * count
+                ):
+                    logger.error(f"Ignoring truncated surge snapshot {path}")
+                    return None
+                flags_offset = _snapshot_header.size + 4 * count
+                first_epoch = max(
+                    tz.to_epoch(timeline.now) - 2 * _hour_seconds,
+                    tz.to_epoch(timeline.start_dt) - _hour_seconds,
+                )
+                last_epoch = tz.to_epoch(timeline.end_dt) + _hour_seconds
+                lo = max(0, -(-(first_epoch - start) // step))
+                hi = min(count, (last_epoch - start) // step + 1)
+                if hi <= lo:
+                    return {}
+
+                values = struct.unpack_from(
+                    f"<{hi - lo}f", data, _snapshot_header.size + 4 * lo
+                )
+                flags = data[flags_offset + lo : flags_offset + hi]
+    except FileNotFoundError:
+        return None
+    except (ValueError, struct.error) as e:
+        # mmap can't map an empty file, and a short one can't be unpacked.
+        logger.error(f"Ignoring unreadable surge snapshot {path}: {e}")
+        return None
+
+    return {
+        tz.from_epoch(start + (lo + i) * step, timeline.time_zone): round(value, 2)
+        for i, (value, valid) in enumerate(zip(values, flags))
+        if valid
+    }
@@ -2,7 +2,7 @@ import csv
 import logging
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
-from app import util
+from app import timestamps, util
 import sentry_sdk
 from app.timeline import GraphTimeline
 from django.core.cache import cache
@@ -157,8 +157,9 @@ def get_or_load_datetime_data(type: str, data_dir: str = _default_file_dir) -> l
     try:
         with open(filepath, newline="") as csvfile:
             reader = csv.reader(csvfile)
+            parse_time = timestamps.local_parser(timestamps.NOAA, utc)
             for row in reader:
-                dt_utc = datetime.strptime(row[0], "%Y-%m-%d %H:%M").replace(tzinfo=utc)
+                dt_utc = parse_time(row[0])
                 data.append(dt_utc)
 
         logger.debug(f"Loaded {len(data)} {type} entries from {filepath}")
@@ -183,8 +184,9 @@ def get_or_load_phase_data(data_dir: str = _default_file_dir) -> dict:
     try:
         with open(filepath, newline="") as csvfile:
             reader = csv.reader(csvfile)
+            parse_time = timestamps.local_parser(timestamps.NOAA, utc)
             for row in reader:
-                dt_utc = datetime.strptime(row[0], "%Y-%m-%d %H:%M").replace(tzinfo=utc)
+                dt_utc = parse_time(row[0])
                 type = row[1]
                 if type not in [NEW_MOON, FIRST_QUARTER, FULL_MOON, LAST_QUARTER]:
                     raise util.InternalError(
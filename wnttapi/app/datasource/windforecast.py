@@ -1,37 +1,62 @@
 import json
 import logging
+import threading
 from datetime import datetime, time, timedelta
 
-import requests
 import sentry_sdk
+from django.core.cache import cache
 
+from app import metrics, timestamps
+from app import tzutil as tz
 from app import util as util
 from app.station import Station
 from app.timeline import GraphTimeline
 
+from . import httpclient
+
 logger = logging.getLogger(__name__)
 
 # Max number of future days, including current day, to retrieve wind forecasts. Open-Meteo supports 16 days.
 _max_forecast_days = 14
 _request_timeout_seconds = 5
+# Open-Meteo updates its forecast models about hourly, so a forecast is current for that long.
+_fresh_seconds = 60 * 60
+# After that, it's still used while a new one is fetched in the background, for up to this long.
+_max_stale_seconds = 6 * 60 * 60
+# How long another worker waits before fetching a stale forecast that one is already fetching.
+_refresh_lock_seconds = 60
 
 """
   Access Wind forecasts from open-meteo.com.
+
+  The 15-minute forecast for all _max_forecast_days is fetched once per station and kept in the shared cache,
+  and both the 15-minute and hourly graphs are made from it, the hourly by taking the points on the hour.
+  A forecast older than _fresh_seconds is still returned, while a background thread fetches a new one, so
+  a graph request only waits on Open-Meteo if there's no forecast or it's older than _max_stale_seconds.
+  If a fetch fails, the old forecast is used until it's too old.
+
+  Counters, see metrics:
+    wind_forecast.hit, wind_forecast.stale, wind_forecast.miss: forecasts current, stale or not in the cache
+    wind_forecast.fetched: forecasts fetched from Open-Meteo
 """
 base_url = "https://api.open-meteo.com/v1/forecast"
 
+_refreshing = set()  # ids of stations this process is fetching in the background
+_refreshing_lock = threading.Lock()
+
 
 def get_wind_forecast(
     station: Station, timeline: GraphTimeline, hilo_mode: bool
 ) -> dict:
     """
-    Fetch wind speed and direction forecast for the desired timeline. We only support forecasts for a period of 7
-    days starting with the current date, so if timeline does not overlap with that time window, no data is retrieved.
+    Fetch wind speed and direction forecast for the desired timeline. We only support forecasts for a period of
+    _max_forecast_days days starting with the current date, so if timeline does not overlap with that time window,
+    no data is retrieved.
 
     Args:
         station (Station): the SWMP station
         timeline (Timeline): the timeline
-        hilo_mode: if true, pull 15-min data instead of hourly, so graph will have something to display for every high or low.
+        hilo_mode: if true, use 15-min data instead of hourly, so graph will have something to display for every high or low.
 
     Returns:
         - dict of hourly or 15-min forecasts for the relevant portion of the timeline. {datetime: {"mph": float, "dir": str}}.
@@ -45,12 +70,94 @@ def get_wind_forecast(
     if len(overlap) == 0:
         return {}
 
-    days = (overlap[-1].date() - timeline.now.date()).days + 1
-    forecast_json = pull_data(station, days, hilo_mode)
+    forecast_json = get_forecast(station)
+    if len(forecast_json) == 0:
+        return {}
+    if not hilo_mode:
+        forecast_json = to_hourly(forecast_json)
+    return pred_json_to_dict(forecast_json, timeline, overlap)
+
+
+def get_forecast(station: Station) -> dict:
+    """Get the 15-minute forecast for a station from the cache, fetching it if it's not there or is too old,
+    and in the background if it's stale.
+
+    Args:
+        station (Station): the SWMP station
+
+    Returns:
+        dict: Open-Meteo minutely_15 json, with "time", "wind_speed_10m" and "wind_direction_10m" lists, or
+            empty if there's no forecast.
+    """
+    entry = cache.get(build_key(station))
+    if entry is not None:
+        age = tz.to_epoch(tz.now(tz.utc)) - entry["fetched"]
+        if age < _fresh_seconds:
+            metrics.incr("wind_forecast.hit")
+            return entry["forecast"]
+        if age < _max_stale_seconds:
+            metrics.incr("wind_forecast.stale")
+            refresh_in_background(station)
+            return entry["forecast"]
+    metrics.incr("wind_forecast.miss")
+    return refresh(station)
+
+
+def build_key(station: Station) -> str:
+    return f"wind_forecast:{station.id}"
+
 
-    if len(forecast_json) > 0:
-        return pred_json_to_dict(forecast_json, timeline, overlap)
-    return {}
+def refresh(station: Station) -> dict:
+    """Fetch the forecast for a station and cache it. If the fetch fails, the cache is left alone.
+
+    Returns:
+        dict: the forecast, or empty if the fetch failed.
+    """
+    fetched = tz.to_epoch(tz.now(tz.utc))
+    forecast = pull_data(station)
+    if len(forecast) > 0:
+        cache.set(
+            build_key(station),
+            {"fetched": fetched, "forecast": forecast},
+            timeout=_max_stale_seconds,
+        )
+        metrics.incr("wind_forecast.fetched")
+    return forecast
+
+
+def refresh_in_background(station: Station) -> threading.Thread:
+    """Start a thread to refresh the forecast for a station, unless one is already at it.
+
+    Returns:
+        threading.Thread: the thread, or None if none was started.
+    """
+    with _refreshing_lock:
+        if station.id in _refreshing:
+            return None
+        # Other workers see this and leave it to us.
+        if not cache.add(
+            f"{build_key(station)}:refreshing", True, _refresh_lock_seconds
+        ):
+            return None
+        _refreshing.add(station.id)
+
+    def run():
+        try:
+            refresh(station)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(station.id)
+            cache.delete(f"{build_key(station)}:refreshing")
+
+    thread = threading.Thread(target=run, name=f"wind-{station.id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def to_hourly(pred_json: dict) -> dict:
+    """Return only the points of a 15-minute forecast that are on the hour, as in Open-Meteo's hourly json."""
+    keep = [ii for ii, t in enumerate(pred_json["time"]) if t.endswith(":00")]
+    return {key: [values[ii] for ii in keep] for key, values in pred_json.items()}
 
 
 def get_forecast_window(timeline: GraphTimeline) -> list:
@@ -74,40 +181,42 @@ def get_forecast_window(timeline: GraphTimeline) -> list:
 
 
 @util.request_logger
-def pull_data(station: Station, forecast_days: int, hilo_mode: bool) -> dict:
-    granularity = "hourly" if not hilo_mode else "minutely_15"
+def pull_data(station: Station) -> dict:
+    """Fetch the 15-minute forecast for the next _max_forecast_days days, starting today.
 
+    Returns:
+        dict: Open-Meteo minutely_15 json, with times local to the station, or empty if the request fails.
+    """
     params = {
         "latitude": station.weather_station_latitude,
         "longitude": station.weather_station_longitude,
         "timezone": station.time_zone.key,
-        granularity: "wind_speed_10m,wind_direction_10m",
-        "forecast_days": forecast_days,
+        "minutely_15": "wind_speed_10m,wind_direction_10m",
+        "forecast_days": _max_forecast_days,
     }
 
-    response = requests.get(
+    response = httpclient.get(
         base_url,
         params=params,
         timeout=_request_timeout_seconds,
     )
     response.raise_for_status()
     json_dict = json.loads(response.text)
-    return json_dict[granularity]
+    return json_dict["minutely_15"]
 
 
 def pred_json_to_dict(pred_json: dict, timeline: GraphTimeline, overlap: list):
     if overlap[0].tzinfo != timeline.time_zone:
         raise util.InternalError
     result = {}
+    parse_time = timestamps.local_parser(timestamps.OPEN_METEO, timeline.time_zone)
     try:
         for t, s, d in zip(
             pred_json["time"],
             pred_json["wind_speed_10m"],
             pred_json["wind_direction_10m"],
         ):
-            dt = datetime.strptime(t, "%Y-%m-%dT%H:%M").replace(
-                tzinfo=timeline.time_zone
-            )  # '2026-01-13T17:30'
+            dt = parse_time(t)  # '2026-01-13T17:30'
 
             if dt >= timeline.now:
                 if dt > overlap[-1]:
@@ -7,6 +7,7 @@ from app.datasource import astrotide as astro
 from app.datasource import cdmo, syzygy
 from app.datasource import surge as sg
 from app.datasource import windforecast as wind
+from app.datasource.apiutil import APICall, run_parallel
 from app.hilo import PredictedHighOrLow
 from app.timeline import GraphTimeline, HiloTimeline
 
@@ -14,6 +15,12 @@ from . import station as stn
 
 logger = logging.getLogger(__name__)
 
+# Deadlines for gathering graph data, in seconds from the start. Observed data, astronomical tides and
+# surge come from the database or local files. The wind forecast is a call to Open-Meteo, which is
+# non-essential, so we don't wait any longer than its own request timeout.
+_db_deadline_seconds = 30
+_forecast_deadline_seconds = 6
+
 
 def get_graph_data(
     start_date: date,
@@ -34,6 +41,21 @@ def get_graph_data(
     Returns:
         dict: All data required for graph, convertible to json
     """
+    return build_graph(start_date, end_date, hilo_mode, station, special)[0]
+
+
+def build_graph(
+    start_date: date,
+    end_date: date,
+    hilo_mode: bool,
+    station: stn.Station,
+    special: bool,
+) -> tuple[dict, bool]:
+    """Same as get_graph_data, but also returns whether all the data sources answered.
+
+    Returns:
+        tuple[dict, bool]: All data required for graph, and False if any optional source was left out.
+    """
 
     validate_dates(start_date, end_date)
 
@@ -46,23 +68,12 @@ def get_graph_data(
     syzygy_list = syzygy.get_syzygy_data(timeline)
     # Phase 1: Retrieve all data from external sources. All these dicts are dense -- they
     # only have keys for actual data, not None, and are keyed by the datetime from the timeline.
-
-    # Start with the observed tide data and wind data, which may be useful in gathering other data.
-    obs_tides = cdmo.get_water_data(station, timeline)
-    obs_winds = cdmo.get_wind_data(station, timeline)
-
-    # Get 15-minute interval astronomical tide predictions for the entire timeline.
-    astro_preds15_dict = astro.get_15m_astro_tides(
-        station.noaa_station_id, timeline, station.navd88_feet_to_mllw_feet, True
-    )
-
-    # Get wind forecasts.
-    forecast_wind_dict = wind.get_wind_forecast(station, timeline, hilo_mode)
-
-    # Get astronomical tide predictions
-    astro_all_hilo_dict = astro.get_hilo_astro_tides(
-        station.noaa_station_id, timeline, station.navd88_feet_to_mllw_feet, True
-    )
+    data, complete = gather_source_data(timeline, station, hilo_mode)
+    obs_tides = data["obs_tides"]
+    obs_winds = data["obs_winds"]
+    astro_preds15_dict = data["astro_preds15"]
+    forecast_wind_dict = data["forecast_winds"]
+    astro_all_hilo_dict = data["astro_hilos"]
 
     # Determine all highs and lows, whether observed or predicted.
     hilo_event_dict = cdmo.find_all_hilos(timeline, obs_tides, astro_all_hilo_dict)
@@ -73,41 +84,24 @@ def get_graph_data(
 
     past_surge_dict = sg.get_recorded_storm_surge(astro_preds15_dict, obs_tides)
 
-    future_surge_dict = sg.get_future_surge_data(
-        timeline,
-        station.noaa_station_id,
-        max(obs_tides) if len(obs_tides) > 0 else None,
+    future_surge_dict = sg.exclude_recorded_times(
+        data["future_surge"], max(obs_tides) if len(obs_tides) > 0 else None
     )
 
     # Phase 2. Now we have all the data we need, in dense dictionaries. Build the lists required
     # by the graph plots, which must be the same length as the timeline so the front end can graph them.
-    # They are sparse rather than dense -- they have None for any missing data.
-
-    hist_tides_plot, hist_tides_label_plot = gp.build_observed_tide_plot(
-        timeline, obs_tides, hilo_event_dict
-    )
-
-    wind_speed_plot, wind_gust_plot, wind_dir_plot = gp.build_wind_plots(
-        timeline, obs_winds, hilo_event_dict
-    )
-
-    astro_tides_plot, astro_label_plot = gp.build_astro_plot(
-        timeline, astro_preds15_dict, hilo_event_dict
-    )
-
-    past_surge_plot = gp.build_past_surge_plot(
-        timeline, past_surge_dict, hilo_event_dict
-    )
-
-    forecast_wind_speed_plot, forecast_wind_dir_plot = gp.build_wind_forecast_plots(
-        timeline, forecast_wind_dict, hilo_event_dict
-    )
-
-    future_surge_plot, future_storm_tide_plot = gp.build_future_surge_plots(
+    # They are sparse rather than dense -- they have None for any missing data. They're all built in one
+    # pass over the timeline.
+    plots = gp.build_plots(
         timeline,
-        future_surge_dict.get("surges", None),
-        astro_preds15_dict,
-        astro_all_hilo_dict,
+        hilo_event_dict,
+        obs_tides=obs_tides,
+        winds=obs_winds,
+        reg_preds_dict=astro_preds15_dict,
+        past_surge_dict=past_surge_dict,
+        forecast_dict=forecast_wind_dict,
+        future_surges_dict=future_surge_dict.get("surges", None),
+        astro_hilo_dict=astro_all_hilo_dict,
     )
 
     # If we've prepared any predicted high or low tides times, which have actual times rather than the nearest
@@ -127,32 +121,17 @@ def get_graph_data(
     else:
         final_timeline = timeline.requested_times
 
-    # Phase 3. Build the final data structure to return.
-    plots = {
-        "hist-tides": hist_tides_plot,
-        "astro-tides": astro_tides_plot,
-        "wind-speeds": wind_speed_plot,
-        "wind-gusts": wind_gust_plot,
-        "past-surge": past_surge_plot,
-        "forecast-wind-speeds": forecast_wind_speed_plot,
-        "future-tide": future_storm_tide_plot,
-        "future-surge": future_surge_plot,
-        "hist-tides-labels": hist_tides_label_plot,
-        "wind-dir": wind_dir_plot,
-        "astro-tides-labels": astro_label_plot,
-        "forecast-wind-dir": forecast_wind_dir_plot,
-    }
+    # Phase 3. Build the final data structure to return. Plots with no data are left out.
+    columns = {k: v for k, v in plots.items() if v is not None}
 
     # Dimensions are the names of each column, in order.
-    dimensions = ["dt"] + [k for k in plots if plots[k] is not None]
+    dimensions = ["dt"] + list(columns)
 
     # Each blob entry represents a "column" of data, with the first value being the datetime and
     # the rest being all the data for that time, in the same order as the dimensions.
-    blob = []
-    for ndx, dt in enumerate(final_timeline):
-        blob.append([dt] + [plots[k][ndx] for k in plots if plots[k] is not None])
+    blob = [list(row) for row in zip(final_timeline, *columns.values())]
 
-    return {
+    graph_data = {
         "dimensions": dimensions,
         "blob": blob,
         # The rest is auxiliary data. Note we have to convert datetimes that are used as dict keys, or else the
@@ -163,6 +142,93 @@ def get_graph_data(
             station, start_date.year
         ),
     }
+    return graph_data, complete
+
+
+def gather_source_data(
+    timeline: GraphTimeline, station: stn.Station, hilo_mode: bool
+) -> tuple[dict, bool]:
+    """Pull the data for the graph from all sources at once, so the total time is set by the slowest source
+    rather than the sum of all of them. The astronomical tide predictions are required to build the graph,
+    so any failure there is raised. The rest are optional: if one fails or misses its deadline, the graph
+    is built without it.
+
+    Args:
+        timeline (GraphTimeline): the timeline
+        station (Station): Station for which to get data
+        hilo_mode (bool): If true, data will include only high and low tide data points.
+
+    Returns:
+        tuple[dict, bool]:
+        - {"obs_tides", "obs_winds", "astro_preds15", "forecast_winds", "astro_hilos", "future_surge"}.
+          Surge data is not yet restricted to times after the last observed tide.
+        - False if any optional source failed or missed its deadline, else True.
+    """
+    noaa_id = station.noaa_station_id
+    navd88_func = station.navd88_feet_to_mllw_feet
+    calls = [
+        # Start with the observed tide data and wind data.
+        APICall(
+            "obs_tides",
+            cdmo.get_water_data,
+            station,
+            timeline,
+            timeout=_db_deadline_seconds,
+            required=False,
+            default={},
+        ),
+        APICall(
+            "obs_winds",
+            cdmo.get_wind_data,
+            station,
+            timeline,
+            timeout=_db_deadline_seconds,
+            required=False,
+            default={},
+        ),
+        # 15-minute interval astronomical tide predictions for the entire timeline.
+        APICall(
+            "astro_preds15",
+            astro.get_15m_astro_tides,
+            noaa_id,
+            timeline,
+            navd88_func,
+            True,
+            timeout=_db_deadline_seconds,
+        ),
+        APICall(
+            "forecast_winds",
+            wind.get_wind_forecast,
+            station,
+            timeline,
+            hilo_mode,
+            timeout=_forecast_deadline_seconds,
+            required=False,
+            default={},
+        ),
+        # High/low astronomical tide predictions.
+        APICall(
+            "astro_hilos",
+            astro.get_hilo_astro_tides,
+            noaa_id,
+            timeline,
+            navd88_func,
+            True,
+            timeout=_db_deadline_seconds,
+        ),
+        APICall(
+            "future_surge",
+            sg.get_future_surge_data,
+            timeline,
+            noaa_id,
+            None,
+            timeout=_db_deadline_seconds,
+            required=False,
+            default={},
+        ),
+    ]
+    data = run_parallel(calls)
+    return data, not any(call.failed for call in calls)
 
 
 def build_subtitle(start_date, end_date) -> str:
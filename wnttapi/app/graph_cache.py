@@ -0,0 +1,139 @@
+import logging
+from datetime import date, timedelta
+
+from django.core.cache import cache
+
+from app import graph, metrics
+from app.datasource import surge as sg
+from app.models import Refresh, get_station
+
+from . import station as stn
+from . import tzutil as tz
+
+logger = logging.getLogger(__name__)
+
+"""
+A response cache in front of graph.get_graph_data, shared by all workers.
+
+A graph of a date range that is entirely in the past is built only from data that doesn't change once
+cdmo_refresh has stored it, so it is cached until a refresh touches its range. The refresh job runs in its
+own container and can't reach this cache, so it records each refresh in the Refresh table, and we check
+for any newer than the cache entry on every hit. The graph also has the station's settings from
+stations.json in it, so their modification time is part of the key, as is the version of how graphs are
+built. The annual highs and other data files aren't tracked, so these graphs are kept for a day at most.
+
+Any other graph depends on the current time, since the past/future split of the timeline moves every 15
+minutes, and so does the arrival of new observed data. Those are cached only until the next quarter hour,
+which is well within the hourly cadence of the wind forecasts. The surge file date and cycle are part of
+their cache key, so a new surge file is picked up right away.
+"""
+
+# Change this when a change to how graphs are built changes the data of graphs already cached.
+version = 1
+_quarter_hour_seconds = 15 * 60
+_past_timeout_seconds = 24 * 60 * 60
+# How far beyond the requested range a graph may look for observed data. See Timeline._padding_points.
+_padding = timedelta(hours=2)
+
+
+def get_graph_data(
+    start_date: date,
+    end_date: date,
+    hilo_mode: bool,
+    station: stn.Station,
+    special: bool,
+) -> dict:
+    """Return the cached graph data for these parameters, or build and cache it.
+
+    Args:
+        Same as graph.get_graph_data
+
+    Returns:
+        dict: All data required for graph, convertible to json
+    """
+    return build_graph(start_date, end_date, hilo_mode, station, special)[0]
+
+
+def build_graph(
+    start_date: date,
+    end_date: date,
+    hilo_mode: bool,
+    station: stn.Station,
+    special: bool,
+) -> tuple[dict, bool]:
+    """Same as get_graph_data, but also returns whether all the data sources answered, as graph.build_graph
+    does. A graph from the cache is always complete.
+
+    Returns:
+        tuple[dict, bool]: All data required for graph, and False if any optional source was left out.
+    """
+    now = tz.now(tz.utc)
+    range_start, range_end, all_past = get_data_range(
+        start_date, end_date, station, now
+    )
+
+    key = build_key(start_date, end_date, hilo_mode, station, all_past)
+    entry = cache.get(key)
+    if entry is not None:
+        if not all_past or not is_refreshed(station, range_start, range_end, entry):
+            metrics.incr("graph_cache.hit")
+            return entry["data"], True
+        logger.debug(f"{key} was refreshed since {entry['cached_at']}")
+        metrics.incr("graph_cache.stale")
+    metrics.incr("graph_cache.miss")
+
+    data, complete = graph.build_graph(
+        start_date, end_date, hilo_mode, station, special
+    )
+    # Don't keep a graph that's missing data from a source that failed.
+    if complete:
+        timeout = _past_timeout_seconds if all_past else seconds_to_next_quarter(now)
+        cache.set(key, {"cached_at": now, "data": data}, timeout=timeout)
+    return data, complete
+
+
+def get_data_range(
+    start_date: date, end_date: date, station: stn.Station, now
+) -> tuple:
+    """Get the time range a graph may draw observed data from, and whether the graph is entirely in the past.
+
+    Returns:
+        tuple: (range_start, range_end, all_past)
+    """
+    range_start = tz.datetime_first(start_date, station.time_zone) - _padding
+    range_end = tz.datetime_first(end_date + timedelta(days=1), station.time_zone)
+    return range_start, range_end + _padding, range_end <= now
+
+
+def build_key(
+    start_date: date,
+    end_date: date,
+    hilo_mode: bool,
+    station: stn.Station,
+    all_past: bool,
+) -> str:
+    key = (
+        f"graph:{version}:{station.id}:{start_date}:{end_date}:{int(hilo_mode)}"
+        f":{stn.get_registry().mtime_ns}"
+    )
+    if all_past:
+        return key
+    try:
+        _, filedate, cycle, _ = sg.get_latest_file_info(station.noaa_station_id)
+    except OSError:
+        filedate = cycle = None
+    return f"{key}:{filedate}:{cycle}"
+
+
+def is_refreshed(station: stn.Station, range_start, range_end, entry: dict) -> bool:
+    """Returns whether any data for the time range was refreshed since the entry was cached."""
+    return Refresh.objects.filter(
+        station=get_station(station.id),
+        when__gte=entry["cached_at"],
+        start__lte=range_end,
+        end__gte=range_start,
+    ).exists()
+
+
+def seconds_to_next_quarter(now) -> int:
+    return _quarter_hour_seconds - int(now.timestamp()) % _quarter_hour_seconds
@@ -0,0 +1,165 @@
+import logging
+from datetime import datetime
+
+from . import tzutil as tz
+
+logger = logging.getLogger(__name__)
+
+"""
+Alternate encodings of the graph data from graph.get_graph_data, which the app asks for with the "graphFormat"
+request parameter. Without it, the graph data is sent as it always has been, which is what older versions of
+the app expect.
+
+ROWS is that original format: "blob" is a list of rows, each a datetime followed by a value for each of the
+other dimensions, most of them None.
+
+COMPACT replaces "blob" with "times" and "columns", and leaves the rest of the graph data alone. Every time
+in a graph is a 15-minute slot from the start of its first day, except the predicted highs and lows that were
+moved to their real times, so the times are sent as:
+    "times": {
+        "start": first slot, an ISO datetime
+        "step": seconds per slot
+        "count": number of rows
+        "slots": slot of each row. Left out when the rows are every slot, i.e. not in hilo mode.
+        "corrected": [[row, ISO datetime], ...] rows whose time is not on its slot
+    }
+and "columns" has an entry for each dimension after "dt", in order. Values are only sent for the part of a
+column that has any, and a column with few values among its rows is sent as a list of the rows that have them:
+    {"type": "int" | "float", "first": row of values[0], "values": [value or None, ...]}
+    {"type": "int" | "float", "rows": [row, ...], "values": [value, ...]}
+Anything that isn't a number, i.e. the label columns, has each distinct value sent once in "labels" and the
+values sent as indexes into it:
+    {"type": "label", "labels": [label, ...], "rows": [row, ...], "values": [index, ...]}
+"""
+
+ROWS = "rows"
+COMPACT = "compact"
+_step_seconds = 15 * 60
+
+
+def encode(graph_data: dict, graph_format: str, start_dt: datetime) -> dict:
+    """Return the graph data in a format.
+
+    Args:
+        graph_data (dict): graph data from graph.get_graph_data, in the ROWS format
+        graph_format (str): ROWS or COMPACT
+        start_dt (datetime): start of the graph timeline, i.e. 00:00 of the first day
+
+    Raises:
+        ValueError: If the format is not known
+
+    Returns:
+        dict: graph data, convertible to json
+    """
+    if graph_format == ROWS:
+        return graph_data
+    if graph_format == COMPACT:
+        return compact(graph_data, start_dt)
+    raise ValueError(f"Unknown graph format {graph_format}")
+
+
+def compact(graph_data: dict, start_dt: datetime) -> dict:
+    """Return a copy of the graph data in the COMPACT format.
+
+    Args:
+        graph_data (dict): graph data from graph.get_graph_data
+        start_dt (datetime): start of the graph timeline, i.e. 00:00 of the first day
+
+    Returns:
+        dict: graph data, convertible to json
+    """
+    blob = graph_data["blob"]
+    start_epoch = tz.to_epoch(start_dt)
+    slots = []
+    corrected = []
+    for row, dt in enumerate(rec[0] for rec in blob):
+        seconds = dt.timestamp() - start_epoch
+        # A corrected time is within half a slot of the slot it replaced.
+        slot = round(seconds / _step_seconds)
+        if seconds != slot * _step_seconds:
+            corrected.append([row, dt])
+        slots.append(slot)
+
+    times = {
+        "start": start_dt,
+        "step": _step_seconds,
+        "count": len(blob),
+        "corrected": corrected,
+    }
+    if slots != list(range(len(blob))):
+        times["slots"] = slots
+
+    data = {k: v for k, v in graph_data.items() if k != "blob"}
+    data["format"] = COMPACT
+    data["times"] = times
+    data["columns"] = [
+        encode_column([rec[ndx] for rec in blob])
+        for ndx in range(1, len(graph_data["dimensions"]))
+    ]
+    return data
+
+
+def encode_column(values: list) -> dict:
+    """Encode the values of one column, one per row, most likely with many None."""
+    rows = [row for row, value in enumerate(values) if value is not None]
+    if len(rows) > 0 and all(
+        isinstance(values[row], (int, float)) and not isinstance(values[row], bool)
+        for row in rows
+    ):
+        col_type = (
+            "int" if all(isinstance(values[row], int) for row in rows) else "float"
+        )
+        first = rows[0]
+        span = rows[-1] - first + 1
+        # Each row listed costs about as much as a None, so go sparse below half full.
+        if len(rows) * 2 >= span:
+            return {
+                "type": col_type,
+                "first": first,
+                "values": values[first : first + span],
+            }
+        return {"type": col_type, "rows": rows, "values": [values[r] for r in rows]}
+
+    labels = {}
+    for row in rows:
+        labels.setdefault(values[row], len(labels))
+    return {
+        "type": "label",
+        "labels": list(labels),
+        "rows": rows,
+        "values": [labels[values[row]] for row in rows],
+    }
+
+
+def expand(data: dict) -> list:
+    """Rebuild the ROWS blob from COMPACT graph data, after it has been through json, as a client would.
+    Times are returned as epoch seconds.
+
+    Args:
+        data (dict): COMPACT graph data, as parsed from json
+
+    Returns:
+        list: the blob rows, with epoch seconds in place of each datetime
+    """
+    times = data["times"]
+    count = times["count"]
+    start_epoch = tz.to_epoch(datetime.fromisoformat(times["start"]))
+    slots = times.get("slots", range(count))
+    epochs = [start_epoch + slot * times["step"] for slot in slots]
+    for row, dt in times["corrected"]:
+        epochs[row] = tz.to_epoch(datetime.fromisoformat(dt))
+
+    columns = []
+    for col in data["columns"]:
+        values = [None] * count
+        if "first" in col:
+            first = col["first"]
+            values[first : first + len(col["values"])] = col["values"]
+        elif col["type"] == "label":
+            for row, ndx in zip(col["rows"], col["values"]):
+                values[row] = col["labels"][ndx]
+        else:
+            for row, value in zip(col["rows"], col["values"]):
+                values[row] = value
+        columns.append(values)
+    return [list(row) for row in zip(epochs, *columns)]
@@ -8,265 +8,192 @@ from app.timeline import GraphTimeline, HiloTimeline
 logger = logging.getLogger(__name__)
 
 
-def build_observed_tide_plot(
-    timeline: GraphTimeline, obs_tides: dict, hilo_event_dict: dict
-) -> tuple[list, list]:
-    """Build lists for observed tide and high or low tide labels that match the timeline length. If there's
-    no observed tide data for the timeline, returns None for both lists.
-
-    Args:
-        timeline (GraphTimeline): the timeline
-        obs_tides: dense dict of observed tide readings {datetime: Tide}
-        hilo_event_dict (dict): {dt: HighOrLow} all observed or predicted High/Low events for entire timeline,
-            used to assign high/low labels to the tide plot.
-
-    Returns:
-        tuple[list, list].
-        - hist_tides_plot: tide heights in MLLW feet, or None if no data;
-        - hist_tides_labels: corresponding "(HIGH)" or "(LOW)" labels, when applicable, else None
-    """
-
-    if timeline.is_all_future():
-        return None, None
-
-    def getObservedHiloLabel(dt: datetime):
-        if dt in hilo_event_dict and isinstance(hilo_event_dict[dt], ObservedHighOrLow):
-            hiOrLow = hilo_event_dict[dt]
-            return "(HIGH)" if hiOrLow.hilo == Hilo.HIGH else "(LOW)"
-        return None
-
-    def callback(dt: datetime):
-        tide = None
-        label = getObservedHiloLabel(dt)
-        # If this is a Hilo graph, we don't show tides that are not a high or low observed tide.
-        if isinstance(timeline, HiloTimeline):
-            if label is not None:
-                return obs_tides[dt].corrected_mllw_feet, label
-        elif dt in obs_tides:
-            tide = obs_tides[dt].corrected_mllw_feet
-        return tide, label
-
-    tides, labels = timeline.build_plots(callback)
-    if all(x is None for x in tides):
-        return None, None
-    return tides, labels
-
-
-def build_wind_plots(
-    timeline: GraphTimeline, winds: dict, hilo_event_dict: dict
-) -> tuple[list, list, list]:
-    """Build lists for wind data which correspond to the timeline.  Returns None for all lists if there
-    is no wind data.
-
-    Args:
-        timeline (GraphTimeline): timeline
-        winds (dict): wind data
-        hilo_event_dict (dict): {dt: HighOrLow} all observed or predicted High/Low events for entire timeline
-            used to restrict returned data to only those times if we have a HiloTimeline.
-
-    Returns: tuple[list, list, list].  All 3 lists have None in the same indexes -- no partial data is allowed.
-        - Wind speed plot
-        - Wind gust plot
-        - Corresponding wind direction (0 - 360) to drive marker angle
-    """
-    if len(winds) == 0:
-        # There are no wind predictions, return None for all lists.
-        return None, None, None
-
-    # If not in hilo mode, for readability, thin out the data points, as it gets pretty dense and hard to read.
-    minutes = [0, 15, 30, 45]  # show all
-    if not isinstance(timeline, HiloTimeline):
-        days = (timeline.end_dt.date() - timeline.start_dt.date()).days
-        if days == 2:
-            minutes = [0, 30]  # show 2 per hour
-        elif days > 2:
-            minutes = [0]  # only show 1 point per hour
-
-    def callback(dt: datetime):
-        if (
-            (not isinstance(timeline, HiloTimeline) or dt in hilo_event_dict)
-            and dt.minute in minutes
-            and dt in winds
-        ):
-            rec = winds[dt]
-            return (rec.speed_mph, rec.gust_mph, rec.direction_deg)
-        return None, None, None
-
-    wind_speed_plot, wind_gust_plot, wind_dir_plot = timeline.build_plots(callback)
-
-    if all(x is None for x in wind_speed_plot):
-        return None, None, None
-
-    return wind_speed_plot, wind_gust_plot, wind_dir_plot
-
-
-def build_astro_plot(
+# The columns of graph data, in the order they are sent to the front end.
+PLOT_NAMES = (
+    "hist-tides",
+    "astro-tides",
+    "wind-speeds",
+    "wind-gusts",
+    "past-surge",
+    "forecast-wind-speeds",
+    "future-tide",
+    "future-surge",
+    "hist-tides-labels",
+    "wind-dir",
+    "astro-tides-labels",
+    "forecast-wind-dir",
+)
+_high_label = "(HIGH)"
+_low_label = "(LOW)"
+_surge_lookback = timedelta(minutes=45)
+_surge_step = timedelta(minutes=15)
+
+
+def build_plots(
     timeline: GraphTimeline,
-    reg_preds_dict: dict,
     hilo_event_dict: dict,
-) -> tuple[list, list]:
-    """
-    Builds lists for the astronomical tide data. We essentially merge the regular 15-min predictions and the
-    hilo-only data, preferring the hilo value if present, which is more accurate.
+    obs_tides: dict = None,
+    winds: dict = None,
+    reg_preds_dict: dict = None,
+    past_surge_dict: dict = None,
+    forecast_dict: dict = None,
+    future_surges_dict: dict = None,
+    astro_hilo_dict: dict = None,
+) -> dict:
+    """Build all the plots for the graph in a single pass over the timeline. Each source is looked up once
+    per time, and the values go straight into preallocated lists.
+
+    In a HiloTimeline, only the times of highs and lows get values. Observed tides and past surge are left
+    out of a timeline that is all in the future. Astronomical tides prefer the high or low prediction to
+    the 15-minute one, since it is more accurate. Future surge is hourly, so each time uses the surge up to
+    45 minutes earlier, and the future storm tide adds it to the astronomical prediction.
 
     Args:
-        timeline (GraphTimeline): the time line
-        reg_preds_dict (dict): {dt: value} 15-min predictions over entire timeline
+        timeline (GraphTimeline): the timeline. For a HiloTimeline, register_hilo_times must have been called.
         hilo_event_dict (dict): {dt: HighOrLow} all observed or predicted High/Low events for entire timeline
+        obs_tides (dict): dense dict of observed tide readings {datetime: Tide}
+        winds (dict): observed wind data {datetime: Wind}
+        reg_preds_dict (dict): {dt: value} 15-min astronomical predictions over entire timeline
+        past_surge_dict (dict): {dt: value} recorded storm surge values
+        forecast_dict (dict): wind forecast data {dt: {"mph", "dir"}}
+        future_surges_dict (dict): hourly surge predictions, in feet {dt: surge_value}
+        astro_hilo_dict (dict): {dt: PredictedHighOrLow} high/low astronomical predictions
 
     Returns:
-        (list of predicted tide values/None, list of high/low labels/None) to match the timeline.
+        dict: {name: list or None} for every name in PLOT_NAMES, in that order. A plot is None if it has
+        no data, or if its source wasn't given.
     """
-
-    def callback(dt: datetime):
-        if dt in hilo_event_dict:
-            event = hilo_event_dict[dt]
+    times = timeline.get_plot_times()
+    size = len(times)
+    is_hilo = isinstance(timeline, HiloTimeline)
+    all_future = timeline.is_all_future()
+    do_observed = obs_tides is not None and not all_future
+    do_winds = winds is not None and len(winds) > 0
+    do_astro = reg_preds_dict is not None
+    do_past_surge = past_surge_dict is not None and not all_future
+    do_forecast = forecast_dict is not None and len(forecast_dict) > 0
+    do_future = future_surges_dict is not None and len(future_surges_dict) > 0
+    reg_preds_dict = reg_preds_dict or {}
+    astro_hilo_dict = astro_hilo_dict or {}
+    wind_minutes = _wind_minutes(timeline)
+
+    plots = {name: [None] * size for name in PLOT_NAMES}
+    hist_tides = plots["hist-tides"]
+    hist_labels = plots["hist-tides-labels"]
+    astro_tides = plots["astro-tides"]
+    astro_labels = plots["astro-tides-labels"]
+    wind_speeds = plots["wind-speeds"]
+    wind_gusts = plots["wind-gusts"]
+    wind_dirs = plots["wind-dir"]
+    past_surges = plots["past-surge"]
+    forecast_speeds = plots["forecast-wind-speeds"]
+    forecast_dirs = plots["forecast-wind-dir"]
+    future_surges = plots["future-surge"]
+    future_tides = plots["future-tide"]
+
+    for ndx, dt in enumerate(times):
+        event = hilo_event_dict.get(dt)
+        # In a HiloTimeline, only the times of highs and lows get data. The start and end times don't.
+        skip = is_hilo and event is None
+
+        if do_observed:
+            label = None
+            if event is not None and isinstance(event, ObservedHighOrLow):
+                label = _high_label if event.hilo == Hilo.HIGH else _low_label
+                hist_labels[ndx] = label
+            if is_hilo:
+                if label is not None:
+                    hist_tides[ndx] = obs_tides[dt].corrected_mllw_feet
+            elif dt in obs_tides:
+                hist_tides[ndx] = obs_tides[dt].corrected_mllw_feet
+
+        if do_past_surge and not skip:
+            past_surges[ndx] = past_surge_dict.get(dt, None)
+
+        if do_astro:
             # If it's a PredictedHighOrLow, we use it no matter if we're in past or future.   If it's in the past,
             # that means there wasn't a deterministic observed high/low, so this is better than nothing.
-            if isinstance(event, PredictedHighOrLow):
-                return event.value, ("(HIGH)" if event.hilo == Hilo.HIGH else "(LOW)",)
-
-        if isinstance(timeline, HiloTimeline) and dt not in hilo_event_dict:
-            # For HiloTimeline, we don't show tides that are not a high or low tide.
-            return None, None
-
-        return reg_preds_dict.get(dt, None), None
-
-    tides, labels = timeline.build_plots(callback)
-    if all(x is None for x in tides):
-        return None, None
-    return tides, labels
-
-
-def build_past_surge_plot(
-    timeline: GraphTimeline, past_surge_dict: dict, hilo_event_dict: dict
-):
-    """
-    Build a list for recorded storm surge that corresponds to the timeline, with None for missing data.
-
-    Args:
-        timeline (GraphTimeline): the time line
-        past_surge_dict (dict): {dt: value} recorded storm surge values
-        hilo_event_dict (dict): {dt: HighOrLow} all observed or predicted High/Low events for entire timeline,
-            used to restrict returned data to only those times if we have a HiloTimeline.
-
-    Returns:
-        list of recorded storm surge values to match the timeline.  Returns None if all values are None.
-    """
-    if timeline.is_all_future():
-        return None
-
-    isHilo = isinstance(timeline, HiloTimeline)
-
-    def callback(dt):
-        if isHilo and dt not in hilo_event_dict:
-            return None
-        return past_surge_dict.get(dt, None)
-
-    plot = timeline.build_plots(callback)
-    return None if all(x is None for x in plot) else plot
-
-
-def build_future_surge_plots(
-    timeline: GraphTimeline,
-    future_surges_dict: dict,
-    reg_preds_dict: dict,
-    astro_hilo_dict: dict,
-) -> tuple[list, list]:
-    """
-    Build lists for predicted storm surge and predicted storm tide that correspond to the
-    timeline, with None for missing data. For each timeline datetime, we'll use the astronomical
-    tide prediction and add that to the surge value to produce predicted storm tide. Note
-    that the surge data is hourly and the timeline is 15-min, so for each timeline time, we
-    look for a surge value at that time, or up to 45 minutes earlier.
-
-    Args:
-        timeline: list of datetimes
-        future_surges_dict: hourly surge predictions, in feet {dt: surge_value}
-        reg_preds_dict: 15-minute astronomical tide predictions for the timeline {dt: value}
-
-    Returns: tuple[list, list].  Both lists have None in the same indexes -- no partial data.
-        - future_surge_plot: predicted surge values in feet, or None if no data
-        - future_storm_tide_plot: predicted storm tide values in MLLW feet, or None if no data
-    """
-    if future_surges_dict is None or len(future_surges_dict) == 0:
-        return None, None
-
-    # If a dt doesn't have a surge value, we will use one up to 45 minutes older, since surge values
-    # are on the hour.
-    def find_nearby_surge(dt):
-        surge = None
-        min_dt = dt - timedelta(minutes=45)
-        while surge is None and dt >= min_dt:
-            surge = future_surges_dict.get(dt, None)
-            dt -= timedelta(minutes=15)
-        return surge
+            if event is not None and isinstance(event, PredictedHighOrLow):
+                astro_tides[ndx] = event.value
+                # The label is a 1-tuple, which the front end has always been sent.
+                astro_labels[ndx] = (
+                    _high_label if event.hilo == Hilo.HIGH else _low_label,
+                )
+            elif not skip:
+                astro_tides[ndx] = reg_preds_dict.get(dt, None)
+
+        if do_winds and not skip and dt.minute in wind_minutes and dt in winds:
+            rec = winds[dt]
+            wind_speeds[ndx] = rec.speed_mph
+            wind_gusts[ndx] = rec.gust_mph
+            wind_dirs[ndx] = rec.direction_deg
 
-    def get_surge_and_hilo_prediction(dt):
-        surge_val = find_nearby_surge(dt)
-        if surge_val is None:
-            return None, None
-        hilo_pred = (
-            astro_hilo_dict.get(dt).value
-            if dt in astro_hilo_dict
-            else reg_preds_dict.get(dt, None)
-        )
-        if surge_val is not None and hilo_pred is None:
-            msg = f"Missing future prediction for {dt}"
-            logger.error(msg)
-            raise util.InternalError(msg)
-        return surge_val, hilo_pred
+        if do_forecast and not skip and dt in forecast_dict:
+            forecast = forecast_dict[dt]
+            forecast_speeds[ndx] = forecast.get("mph")
+            forecast_dirs[ndx] = forecast.get("dir")
 
-    def callback(dt):
-        if timeline.is_past(dt) or (
-            isinstance(timeline, HiloTimeline) and dt not in astro_hilo_dict
+        if (
+            do_future
+            and not timeline.is_past(dt)
+            and (not is_hilo or dt in astro_hilo_dict)
         ):
-            return None, None
-        surge_val, hilo_pred = get_surge_and_hilo_prediction(dt)
-        if surge_val is not None and hilo_pred is not None:
-            return round(surge_val, 2), round(surge_val + hilo_pred, 2)
-        return None, None
-
-    future_surge_plot, future_storm_tide_plot = timeline.build_plots(callback)
-
-    if all(x is None for x in future_surge_plot):
-        return None, None
-
-    return future_surge_plot, future_storm_tide_plot
-
-
-def build_wind_forecast_plots(
-    timeline: GraphTimeline, forecast_dict: dict, hilo_event_dict: dict
-) -> tuple[list, list]:
-    """
-    Build lists for forecast wind speed and direction (0-360) which correspond to the timeline.
-
-    Args:
-        timeline (GraphTimeline): the timeline
-        forecast_dict (dict): forecast data.
-        hilo_event_dict (dict): {dt: HighOrLow} all observed or predicted High/Low events for entire timeline,
-            used to restrict returned data to only those times if we have a HiloTimeline.
-
-    Returns: tuple[list, list]. Both lists have None in the same indexes -- no partial data.
-        - wind speed (mph)
-        - wind direction (0-360)
-    """
-    if len(forecast_dict) == 0:
-        return None, None
-
-    def callback(dt):
-        if isinstance(timeline, HiloTimeline) and dt not in hilo_event_dict:
-            return None, None
-        if dt in forecast_dict:
-            return (
-                forecast_dict[dt].get("mph"),
-                forecast_dict[dt].get("dir"),
+            surge_val, hilo_pred = _surge_and_hilo_prediction(
+                dt, future_surges_dict, reg_preds_dict, astro_hilo_dict
             )
-        return None, None
+            if surge_val is not None and hilo_pred is not None:
+                future_surges[ndx] = round(surge_val, 2)
+                future_tides[ndx] = round(surge_val + hilo_pred, 2)
+
+    # A plot with no data at all is left out, along with the plots that go with it.
+    for key, related in _related_plots:
+        if all(x is None for x in plots[key]):
+            for name in related:
+                plots[name] = None
+    return plots
+
+
+# Each plot that decides whether there is data, and the plots which are left out with it.
+_related_plots = (
+    ("hist-tides", ("hist-tides", "hist-tides-labels")),
+    ("wind-speeds", ("wind-speeds", "wind-gusts", "wind-dir")),
+    ("astro-tides", ("astro-tides", "astro-tides-labels")),
+    ("past-surge", ("past-surge",)),
+    ("forecast-wind-speeds", ("forecast-wind-speeds", "forecast-wind-dir")),
+    ("future-surge", ("future-surge", "future-tide")),
+)
+
+
+def _wind_minutes(timeline: GraphTimeline) -> tuple:
+    # If not in hilo mode, for readability, thin out the data points, as it gets pretty dense and hard to read.
+    if not isinstance(timeline, HiloTimeline):
+        days = (timeline.end_dt.date() - timeline.start_dt.date()).days
+        if days == 2:
+            return (0, 30)  # show 2 per hour
+        elif days > 2:
+            return (0,)  # only show 1 point per hour
+    return (0, 15, 30, 45)  # show all
 
-    forecast_speed_plot, forecast_wind_dir_plot = timeline.build_plots(callback)
 
-    if all(x is None for x in forecast_speed_plot):
+def _surge_and_hilo_prediction(
+    dt: datetime, future_surges_dict: dict, reg_preds_dict: dict, astro_hilo_dict: dict
+) -> tuple:
+    # If a dt doesn't have a surge value, we will use one up to 45 minutes older, since surge values
+    # are on the hour.
+    surge_val = None
+    surge_dt = dt
+    min_dt = dt - _surge_lookback
+    while surge_val is None and surge_dt >= min_dt:
+        surge_val = future_surges_dict.get(surge_dt, None)
+        surge_dt -= _surge_step
+    if surge_val is None:
         return None, None
-
-    return forecast_speed_plot, forecast_wind_dir_plot
+    astro_hilo = astro_hilo_dict.get(dt)
+    hilo_pred = (
+        astro_hilo.value if astro_hilo is not None else reg_preds_dict.get(dt, None)
+    )
+    if hilo_pred is None:
+        msg = f"Missing future prediction for {dt}"
+        logger.error(msg)
+        raise util.InternalError(msg)
+    return surge_val, hilo_pred
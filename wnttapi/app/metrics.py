@@ -0,0 +1,31 @@
+import logging
+import threading
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+"""
+Simple in-process counters, e.g. cache hits and misses. Each gunicorn worker has its own set, so
+the numbers are per process.
+"""
+
+_lock = threading.Lock()
+_counters = Counter()
+
+
+def incr(name: str, count: int = 1):
+    """Add to the named counter, creating it if necessary."""
+    with _lock:
+        _counters[name] += count
+
+
+def get(name: str) -> int:
+    """Return the current value of the named counter, 0 if never incremented."""
+    with _lock:
+        return _counters[name]
+
+
+def snapshot() -> dict:
+    """Return a copy of all counters, sorted by name."""
+    with _lock:
+        return dict(sorted(_counters.items()))
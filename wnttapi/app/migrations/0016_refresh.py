@@ -0,0 +1,28 @@
+# Generated by Django 6.0.9 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_remove_surge_uniq_station_time_delete_surge_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Refresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('station', models.CharField(choices=[('WE', 'welinwq'), ('NC', 'nocrcwq')], max_length=2)),
+                ('type', models.CharField(choices=[('T', 'Water'), ('W', 'Wind'), ('A', 'Astro')], max_length=1)),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('when', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'refresh',
+                'indexes': [models.Index(fields=['station', 'when'], name='refresh_ix1')],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Converts the time columns of the observed and predicted data tables from ISO strings in UTC, e.g.
+# "2024-01-01T05:30:00+00:00", to integer epoch seconds. Each unique constraint is rebuilt on the new
+# column, which gives the (station, time) index used by the range queries.
+
+from datetime import datetime
+
+from django.db import migrations, models
+
+_batch_size = 2000
+
+# model name: (station field, unique constraint name, time fields)
+_tables = {
+    "water": ("station", "water_uk1", ["time"]),
+    "wind": ("station", "wind_uk1", ["time"]),
+    "astrotide15": ("noaa_id", "astrotide15_uk1", ["time"]),
+    "astrotidehilo": ("noaa_id", "astrotideHilo_uk1", ["time", "real_time"]),
+}
+
+
+def to_epoch(iso: str) -> int:
+    return int(datetime.fromisoformat(iso).timestamp())
+
+
+def backfill(apps, schema_editor):
+    for model_name, (_, _, fields) in _tables.items():
+        model = apps.get_model("app", model_name)
+        epoch_fields = [f"{field}_epoch" for field in fields]
+        batch = []
+        for rec in model.objects.only("id", *fields).iterator(chunk_size=_batch_size):
+            for field, epoch_field in zip(fields, epoch_fields):
+                setattr(rec, epoch_field, to_epoch(getattr(rec, field)))
+            batch.append(rec)
+            if len(batch) == _batch_size:
+                model.objects.bulk_update(batch, epoch_fields)
+                batch = []
+        model.objects.bulk_update(batch, epoch_fields)
+
+
+def remove_constraints():
+    return [
+        migrations.RemoveConstraint(model_name=model_name, name=constraint)
+        for model_name, (_, constraint, _) in _tables.items()
+    ]
+
+
+def add_epoch_fields():
+    return [
+        migrations.AddField(
+            model_name=model_name,
+            name=f"{field}_epoch",
+            field=models.IntegerField(null=True),
+        )
+        for model_name, (_, _, fields) in _tables.items()
+        for field in fields
+    ]
+
+
+def replace_string_fields():
+    operations = []
+    for model_name, (_, _, fields) in _tables.items():
+        for field in fields:
+            operations += [
+                migrations.RemoveField(model_name=model_name, name=field),
+                migrations.RenameField(
+                    model_name=model_name, old_name=f"{field}_epoch", new_name=field
+                ),
+                migrations.AlterField(
+                    model_name=model_name,
+                    name=field,
+                    field=models.IntegerField(),
+                ),
+            ]
+    return operations
+
+
+def add_constraints():
+    return [
+        migrations.AddConstraint(
+            model_name=model_name,
+            constraint=models.UniqueConstraint(
+                fields=(station_field, "time"), name=constraint
+            ),
+        )
+        for model_name, (station_field, constraint, _) in _tables.items()
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app", "0016_refresh"),
+    ]
+
+    operations = (
+        remove_constraints()
+        + add_epoch_fields()
+        + [migrations.RunPython(backfill)]
+        + replace_string_fields()
+        + add_constraints()
+    )
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.9 on 2026-10-16 23:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_epoch_times'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='request',
+            name='when',
+            field=models.DateTimeField(),
+        ),
+    ]
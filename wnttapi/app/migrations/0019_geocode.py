@@ -0,0 +1,26 @@
+# Generated by Django 6.0.9 on 2026-10-16 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_request_when'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Geocode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200, unique=True)),
+                ('lat', models.CharField(max_length=20, null=True)),
+                ('lng', models.CharField(max_length=20, null=True)),
+                ('when', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'geocode',
+            },
+        ),
+    ]
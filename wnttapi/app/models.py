@@ -32,7 +32,8 @@ class Request(models.Model):
         GRAPH = "G", "Graph"
 
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    when = models.DateTimeField(auto_now=True)
+    # Set to the time of the request, since it may be written some time later.
+    when = models.DateTimeField()
     type = models.CharField(
         max_length=1,
         choices=Type.choices,
@@ -51,9 +52,9 @@ class Request(models.Model):
 
 class Water(models.Model):
     station = models.CharField(max_length=2, choices=Station.choices, null=False)
-    time = models.CharField(
-        max_length=25, null=False
-    )  # store as ISO string in UTC, e.g. "2024-01-01T05:30:00+00:00"
+    time = models.IntegerField(
+        null=False
+    )  # store as UTC epoch seconds, e.g. 1704087000 for 2024-01-01T05:30:00+00:00
     temp_f = models.FloatField(null=True)
     clevel_nf = models.FloatField(null=True)  #  Corrected NAVD88 feet
 
@@ -66,9 +67,9 @@ class Water(models.Model):
 
 class Wind(models.Model):
     station = models.CharField(max_length=2, choices=Station.choices, null=False)
-    time = models.CharField(
-        max_length=25, null=False
-    )  # store as ISO string in UTC, e.g. "2024-01-01T05:30:00+00:00"
+    time = models.IntegerField(
+        null=False
+    )  # store as UTC epoch seconds, e.g. 1704087000 for 2024-01-01T05:30:00+00:00
     speed = models.FloatField(null=False)
     gust = models.FloatField(null=False)
     dir_deg = models.SmallIntegerField(null=False)
@@ -82,9 +83,9 @@ class Wind(models.Model):
 
 class AstroTide15(models.Model):
     noaa_id = models.CharField(max_length=7, null=False)
-    time = models.CharField(
-        max_length=25, null=False
-    )  # store as ISO string in UTC, e.g. "2024-01-01T05:30:00+00:00"
+    time = models.IntegerField(
+        null=False
+    )  # store as UTC epoch seconds, e.g. 1704087000 for 2024-01-01T05:30:00+00:00
     nav_level = models.FloatField(null=False)  # This is NAVD88 tide level, not MLLW
 
     class Meta:
@@ -100,12 +101,12 @@ class AstroTideHilo(models.Model):
         LOW = "L", "Low"
 
     noaa_id = models.CharField(max_length=7, null=False)
-    time = models.CharField(
-        max_length=25, null=False
-    )  # store as ISO string in UTC, e.g. "2024-01-01T05:30:00+00:00"
-    real_time = models.CharField(
-        max_length=25, null=False
-    )  # store as ISO string in UTC, e.g. "2024-01-01T05:30:00+00:00"
+    time = models.IntegerField(
+        null=False
+    )  # store as UTC epoch seconds, e.g. 1704087000 for 2024-01-01T05:30:00+00:00
+    real_time = models.IntegerField(
+        null=False
+    )  # store as UTC epoch seconds, e.g. 1704087000 for 2024-01-01T05:30:00+00:00
     nav_level = models.FloatField(null=False)  # This is NAVD88 tide level, not MLLW
     hilo = models.CharField(max_length=2, null=False, choices=Type.choices)
 
@@ -116,3 +117,35 @@ class AstroTideHilo(models.Model):
                 fields=["noaa_id", "time"], name="astrotideHilo_uk1"
             ),
         )
+
+
+class Refresh(models.Model):
+    """A record of observed or predicted data being written for a station and time range. Cached graphs
+    which cover that range are stale if they were cached before the refresh."""
+
+    class Type(models.TextChoices):
+        WATER = "T", "Water"
+        WIND = "W", "Wind"
+        ASTRO = "A", "Astro"
+
+    station = models.CharField(max_length=2, choices=Station.choices, null=False)
+    type = models.CharField(max_length=1, choices=Type.choices, null=False)
+    start = models.DateTimeField(null=False)
+    end = models.DateTimeField(null=False)
+    when = models.DateTimeField(null=False)
+
+    class Meta:
+        db_table = "refresh"
+        indexes = (models.Index(fields=["station", "when"], name="refresh_ix1"),)
+
+
+class Geocode(models.Model):
+    """A cached geocode lookup, by normalized search string. A search that wasn't found has no lat and lng."""
+
+    query = models.CharField(max_length=200, unique=True)
+    lat = models.CharField(max_length=20, null=True)
+    lng = models.CharField(max_length=20, null=True)
+    when = models.DateTimeField(null=False)
+
+    class Meta:
+        db_table = "geocode"
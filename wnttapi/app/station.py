@@ -1,7 +1,9 @@
 import json
 import logging
 import os
+import threading
 from datetime import date
+from types import MappingProxyType
 from zoneinfo import ZoneInfo
 
 from django.core.cache import cache
@@ -18,6 +20,16 @@ backend processing are included here.
 
 
 class Station:
+    __slots__ = (
+        "id",
+        "weather_station_id",
+        "noaa_station_id",
+        "mllw_conversion",
+        "time_zone",
+        "weather_station_latitude",
+        "weather_station_longitude",
+    )
+
     # Builder method
     @staticmethod
     def from_dict(station_id: str, data: dict) -> "Station":
@@ -84,21 +96,84 @@ def get_supported_years() -> list:
     return [y for y in range(year - 2, year + 3)]
 
 
+class _Registry:
+    """All the stations in stations.json, built once and indexed by each kind of id. Never modified, a
+    change to the file builds a new one."""
+
+    __slots__ = ("filepath", "mtime_ns", "data", "by_id", "by_noaa_id", "by_weather_id")
+
+    def __init__(self, filepath: str, mtime_ns: int, data: dict):
+        self.filepath = filepath
+        self.mtime_ns = mtime_ns
+        self.data = data
+        self.by_id = MappingProxyType(
+            {id: Station.from_dict(id, obj) for id, obj in data.items()}
+        )
+        by_noaa_id, by_weather_id = {}, {}
+        # More than one station could share a gauge, in which case the first one wins.
+        for station in self.by_id.values():
+            by_noaa_id.setdefault(station.noaa_station_id, station)
+            by_weather_id.setdefault(station.weather_station_id, station)
+        self.by_noaa_id = MappingProxyType(by_noaa_id)
+        self.by_weather_id = MappingProxyType(by_weather_id)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(data_dir: str = _default_file_dir) -> _Registry:
+    """Get the station registry for this process, loading it first if stations.json is new or changed."""
+    global _registry
+    filepath = os.path.join(data_dir, "stations.json")
+    mtime_ns = os.stat(filepath).st_mtime_ns
+    registry = _registry
+    if (
+        registry is not None
+        and registry.filepath == filepath
+        and registry.mtime_ns == mtime_ns
+    ):
+        return registry
+
+    with _registry_lock:
+        registry = _registry
+        if (
+            registry is None
+            or registry.filepath != filepath
+            or registry.mtime_ns != mtime_ns
+        ):
+            data = json.loads(util.read_file(filepath))
+            registry = _registry = _Registry(filepath, mtime_ns, data)
+            logger.debug(f"Loaded {len(data)} stations from {filepath}")
+        return registry
+
+
 # Get a Station object for a given station id.  The station id is actually the water quality station id,
 # such as 'welinwq' for Wells.
 def get_station(station_id: str, data_dir=_default_file_dir) -> Station:
-    obj = get_station_data(station_id, data_dir=data_dir)
-    return Station.from_dict(station_id, obj)
+    station = get_registry(data_dir).by_id.get(station_id)
+    if station is None:
+        raise util.InternalError(f"Station ID {station_id} not found")
+    return station
 
 
 def get_station_with_noaa_id(noaa_station_id: str, nocontainer: bool) -> Station:
-    stations = (
-        get_all_stations("../datamount/stations") if nocontainer else get_all_stations()
-    )
-    for id, data in stations.items():
-        if data["noaaStationId"] == noaa_station_id:
-            return Station.from_dict(id, data)
-    raise util.InternalError(f"Station with NOAA id {noaa_station_id} not found!")
+    registry = get_registry("../datamount/stations") if nocontainer else get_registry()
+    station = registry.by_noaa_id.get(noaa_station_id)
+    if station is None:
+        raise util.InternalError(f"Station with NOAA id {noaa_station_id} not found!")
+    return station
+
+
+def get_station_with_weather_id(
+    weather_station_id: str, data_dir=_default_file_dir
+) -> Station:
+    station = get_registry(data_dir).by_weather_id.get(weather_station_id)
+    if station is None:
+        raise util.InternalError(
+            f"Station with weather station id {weather_station_id} not found!"
+        )
+    return station
 
 
 def get_station_data(station_id: str, data_dir=_default_file_dir) -> dict:
@@ -158,20 +233,8 @@ def get_astro_high_tide_mllw(
 
 
 def get_or_load_stations(data_dir: str = _default_file_dir) -> dict:
-    """Get the cached stations, or load them from the json file if not cached yet."""
-    cache_key = "stations_data"
-    data = cache.get(cache_key)
-    if data is not None:
-        return data
-
-    filepath = os.path.join(data_dir, "stations.json")
-    contents = util.read_file(filepath)
-    data = json.loads(contents)
-    cache.set(cache_key, data, timeout=None)  # Cache forever
-    logger.debug(
-        f"Loaded {len(data)} stations from disk and cached with key {cache_key}"
-    )
-    return data
+    """Get the contents of stations.json, loading it if not loaded yet or changed. Don't modify it."""
+    return get_registry(data_dir).data
 
 
 def get_or_load_annual_highs(
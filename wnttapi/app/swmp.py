@@ -4,6 +4,7 @@ from zoneinfo import ZoneInfo
 
 from app import util
 from app.datasource import astrotide, cdmo, surge, syzygy
+from app.datasource.apiutil import APICall, run_parallel
 from app.hilo import Hilo
 from app.station import Station
 from app.timeline import Timeline
@@ -12,47 +13,105 @@ from . import tzutil as tz
 
 logger = logging.getLogger(__name__)
 
+# This is polled often, so we don't let it wait on any one slow source. Total seconds for all calls.
+_deadline_seconds = 10
+# How far back to look for the latest CDMO readings. Any older are not current enough to display.
+recent_window = timedelta(hours=4)
+
+# All the fields returned for the latest conditions display.
+_fields = [
+    "phase",
+    "phase_dt",
+    "next_phase",
+    "next_phase_dt",
+    "wind_speed",
+    "wind_gust",
+    "wind_dir_deg",
+    "wind_time",
+    "tide",
+    "tide_time",
+    "temp",
+    "tide_dir",
+    "next_tide_dt",
+    "next_high_tide",
+    "next_tide_surge",
+    "surge_time",
+]
+
 
 def get_latest_conditions(station: Station) -> dict:
     """
     Pull the most recent wind, tide & temp readings from CDMO, some tide predictions and moon phase data.
-    These API calls are done in parallel.
+    These calls are done in parallel, and all must finish within a fixed total deadline. Any that fail or
+    are too slow are left out, and their part of the display will be null.
     Args:
         station (Station): the station
     Returns:
         a dict with all the data needed for the latest conditions display.
     """
+    return build_latest_conditions(station)[0]
+
+
+def build_latest_conditions(station: Station) -> tuple[dict, bool]:
+    """Same as get_latest_conditions, but also returns whether all the calls finished in time.
+
+    Returns:
+        tuple[dict, bool]: the latest conditions, and False if any of them was left out.
+    """
 
     # Find recent cdmo data. If it's not in this time window, it's not current enough to display.
     cdmo_end_dt = util.round_to_quarter(tz.now(station.time_zone))
-    cdmo_timeline = Timeline(cdmo_end_dt - timedelta(hours=4), cdmo_end_dt)
-    obs_tides = cdmo.get_water_data(station, cdmo_timeline)
-    winds = cdmo.get_wind_data(station, cdmo_timeline)
+    cdmo_timeline = Timeline(cdmo_end_dt - recent_window, cdmo_end_dt)
 
     # For future tides, we start at 1 minute in future and go far enough out to cover diurnal and semidiurnal.
     future_start_dt = tz.now(station.time_zone)
     future_end_dt = future_start_dt + timedelta(days=1)
-    astro_dict = astrotide.get_hilo_astro_tides(
-        station.noaa_station_id,
-        Timeline(future_start_dt, future_end_dt),
-        station.navd88_feet_to_mllw_feet,
-        True,
-    )
-    moon_dict = syzygy.get_current_moon_phases(station.time_zone)
     surge_timeline = Timeline(
         tz.now(station.time_zone), tz.now(station.time_zone) + timedelta(days=1)
     )
-    surge_dict = surge.get_future_surge_data(
-        surge_timeline, station.noaa_station_id, None
-    )
 
-    return extract_data(
-        winds,
-        obs_tides,
-        astro_dict,
-        surge_dict,
-        moon_dict,
-        station.time_zone,
+    def optional_call(name, func, *args):
+        return APICall(
+            name,
+            func,
+            *args,
+            timeout=_deadline_seconds,
+            required=False,
+            default={},
+        )
+
+    calls = [
+        optional_call("obs_tides", cdmo.get_water_data, station, cdmo_timeline),
+        optional_call("winds", cdmo.get_wind_data, station, cdmo_timeline),
+        optional_call(
+            "astro",
+            astrotide.get_hilo_astro_tides,
+            station.noaa_station_id,
+            Timeline(future_start_dt, future_end_dt),
+            station.navd88_feet_to_mllw_feet,
+            True,
+        ),
+        optional_call("moon", syzygy.get_current_moon_phases, station.time_zone),
+        optional_call(
+            "surge",
+            surge.get_future_surge_data,
+            surge_timeline,
+            station.noaa_station_id,
+            None,
+        ),
+    ]
+    data = run_parallel(calls)
+
+    return (
+        extract_data(
+            data["winds"],
+            data["obs_tides"],
+            data["astro"],
+            data["surge"],
+            data["moon"],
+            station.time_zone,
+        ),
+        not any(call.failed for call in calls),
     )
 
 
@@ -65,7 +124,8 @@ def extract_data(
     tzone: ZoneInfo,
 ) -> dict:
 
-    data = {
+    # Every field is always present, and is null if its data is missing.
+    data = dict.fromkeys(_fields) | {
         "phase": moon_dict.get("current", None),
         "phase_dt": moon_dict.get("currentdt", None),
         "next_phase": moon_dict.get("nextphase", None),
@@ -0,0 +1,343 @@
+import atexit
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from datetime import date
+
+import sentry_sdk
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+
+from app import metrics
+
+from . import tzutil as tz
+from .models import Request, User, get_station
+
+logger = logging.getLogger(__name__)
+
+"""
+Write-behind logging of users and their requests, so the request path never waits on a database write.
+
+Views call record_request, which only puts an event on a bounded in-process queue. A background thread in
+each process takes events off the queue and writes them in batches, each batch in one transaction. If the
+queue is full, the event is dropped.
+
+The cron jobs write to the same sqlite database, so a batch may find it locked for longer than the sqlite
+timeout. Then the batch is appended to a spill file next to the database, as one json event per line, and
+the spill file is written to the database after the next batch that succeeds, by whichever process gets
+to it first. If the spill file is full, the batch is dropped. If a batch fails for any other reason, its
+events are written one at a time, and only those that fail are dropped.
+
+Counters, all per process, see metrics:
+    telemetry.queued, telemetry.written, telemetry.spilled, telemetry.replayed
+    telemetry.dropped: events lost because the queue or spill file was full, or they couldn't be written
+"""
+
+_max_queued = 10000
+_batch_size = 200
+_flush_seconds = 5  # longest an event waits to be written, when the queue isn't busy
+_stop_seconds = 5  # longest to wait at exit for the last events to be written
+_max_spill_bytes = 10 * 1024 * 1024
+_max_cached_users = 10000
+_spill_name = "telemetry-spill.jsonl"
+
+_queue = None
+_writer = None
+_writer_pid = None
+_writer_lock = threading.Lock()
+_stopping = threading.Event()
+_user_ids = {}  # {uuid: User.id}, only used by the writer thread
+
+
+def record_request(
+    request_type: Request.Type,
+    uid: str,
+    version: str,
+    screen_width: int,
+    station_id: str = None,
+    start_date: date = None,
+    end_date: date = None,
+    hilo_mode: bool = None,
+    custom_nav: float = None,
+):
+    """Queue a request to be logged, along with its user if new. Never raises.
+
+    Args:
+        request_type (Request.Type): STATION or GRAPH
+        uid (str): the user's uid. If None, nothing is logged.
+        version (str): the app version
+        screen_width (int): the app's screen width
+        station_id, start_date, end_date, hilo_mode, custom_nav: the graph requested, for GRAPH only
+    """
+    if uid is None:
+        logger.error("No uid in parameters!")
+        return
+    try:
+        event = build_event(
+            request_type,
+            uid,
+            version,
+            screen_width,
+            station_id,
+            start_date,
+            end_date,
+            hilo_mode,
+            custom_nav,
+        )
+        get_queue().put_nowait(event)
+        metrics.incr("telemetry.queued")
+    except queue.Full:
+        metrics.incr("telemetry.dropped")
+    except Exception as exc:
+        # Log but do not raise
+        logger.error(str(exc), stack_info=False)
+        sentry_sdk.capture_exception(exc)
+        metrics.incr("telemetry.dropped")
+
+
+def build_event(
+    request_type: Request.Type,
+    uid: str,
+    version: str,
+    screen_width: int,
+    station_id: str,
+    start_date: date,
+    end_date: date,
+    hilo_mode: bool,
+    custom_nav: float,
+) -> dict:
+    """Return the event for a request, as a dict that can be written to the spill file as json."""
+    event = {
+        "uid": uid,
+        "when": tz.to_epoch(tz.now(tz.utc)),
+        "type": str(request_type),
+        "version": version,
+        "screenWidth": to_number(screen_width, int),
+    }
+    if request_type == Request.Type.GRAPH:
+        event |= {
+            "station": str(get_station(station_id)),
+            "start": start_date.isoformat(),
+            "days": (end_date - start_date).days + 1,
+            "hilo": hilo_mode,
+            "customNav": to_number(custom_nav, float),
+        }
+    return event
+
+
+def to_number(value, kind: type):
+    """Return the value as an int or float, or None if it isn't one, such as the "undefined" some clients
+    send, so it can't fail the write of a whole batch."""
+    if value is None:
+        return None
+    try:
+        number = kind(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def get_queue() -> queue.Queue:
+    """Get the queue for this process, starting its writer thread if it isn't running yet."""
+    global _queue, _writer, _writer_pid
+    pid = os.getpid()
+    if _writer_pid == pid and _writer.is_alive():
+        return _queue
+    with _writer_lock:
+        # A forked process gets a copy of the queue, but not the thread that empties it.
+        if _writer_pid != pid:
+            _queue = queue.Queue(maxsize=_max_queued)
+        if _writer_pid != pid or not _writer.is_alive():
+            _writer = threading.Thread(
+                target=run_writer, args=(_queue,), name="telemetry", daemon=True
+            )
+            _writer.start()
+            _writer_pid = pid
+        return _queue
+
+
+def run_writer(events: queue.Queue):
+    """Write the queued events in batches until the process exits."""
+    while True:
+        batch = next_batch(events)
+        if len(batch) > 0 and write_or_spill(batch):
+            replay_spill()
+        if _stopping.is_set() and events.empty():
+            return
+
+
+def next_batch(events: queue.Queue) -> list:
+    """Wait for an event, then take more until the batch is full or it's time to write it."""
+    batch = []
+    deadline = time.monotonic() + _flush_seconds
+    while len(batch) < _batch_size:
+        try:
+            if _stopping.is_set():
+                batch.append(events.get_nowait())
+            else:
+                batch.append(events.get(timeout=max(0, deadline - time.monotonic())))
+        except queue.Empty:
+            break
+    return batch
+
+
+def write_or_spill(batch: list) -> bool:
+    """Write a batch of events, or spill them if the database is locked. Returns whether they were written."""
+    try:
+        write_events(batch)
+        metrics.incr("telemetry.written", len(batch))
+        return True
+    except OperationalError as exc:
+        # Most likely "database is locked" by a cron job.
+        logger.warning(f"Spilling {len(batch)} events: {exc}")
+        forget_transaction()
+        spill(batch, get_spill_path())
+    except Exception as exc:
+        # Something in the batch can't be written. Write the events one at a time, so only it is lost.
+        logger.warning(f"Writing {len(batch)} events one at a time: {exc}")
+        forget_transaction()
+        return write_each(batch)
+    return False
+
+
+def write_each(events: list) -> bool:
+    """Write events one at a time, dropping any that can't be written. Returns whether all the rest were,
+    that is, the database wasn't locked."""
+    for ndx, event in enumerate(events):
+        try:
+            write_events([event])
+            metrics.incr("telemetry.written")
+        except OperationalError as exc:
+            logger.warning(f"Spilling {len(events) - ndx} events: {exc}")
+            forget_transaction()
+            spill(events[ndx:], get_spill_path())
+            return False
+        except Exception as exc:
+            logger.exception("Dropping event %s", event)
+            sentry_sdk.capture_exception(exc)
+            forget_transaction()
+            metrics.incr("telemetry.dropped")
+    return True
+
+
+def forget_transaction():
+    # The transaction was rolled back, so any users it created are gone. Start over with a new connection.
+    _user_ids.clear()
+    connection.close()
+
+
+def write_events(events: list):
+    """Write events to the database in one transaction, creating any users not already there."""
+    with transaction.atomic():
+        user_ids = get_user_ids(events)
+        Request.objects.bulk_create(
+            [
+                Request(
+                    user_id=user_ids[event["uid"]],
+                    when=tz.from_epoch(event["when"], tz.utc),
+                    type=event["type"],
+                    station=event.get("station"),
+                    version=event["version"],
+                    start=(
+                        date.fromisoformat(event["start"]) if "start" in event else None
+                    ),
+                    days=event.get("days"),
+                    hilo=event.get("hilo"),
+                    customNav=event.get("customNav"),
+                    screenWidth=event["screenWidth"],
+                )
+                for event in events
+            ]
+        )
+
+
+def get_user_ids(events: list) -> dict:
+    """Return {uuid: User.id} for the users of all the events, creating any that don't exist. A new user is
+    created at the time of its first event."""
+    if len(_user_ids) >= _max_cached_users:
+        _user_ids.clear()
+    first_seen = {}
+    for event in events:
+        if event["uid"] not in _user_ids:
+            first_seen.setdefault(event["uid"], event["when"])
+    if len(first_seen) > 0:
+        found = dict(User.objects.filter(uuid__in=first_seen).values_list("uuid", "id"))
+        missing = first_seen.keys() - found.keys()
+        if len(missing) > 0:
+            User.objects.bulk_create(
+                [
+                    User(uuid=uid, created_at=tz.from_epoch(first_seen[uid], tz.utc))
+                    for uid in missing
+                ],
+                # Another process may have just created the same user.
+                ignore_conflicts=True,
+            )
+            found = dict(
+                User.objects.filter(uuid__in=first_seen).values_list("uuid", "id")
+            )
+        _user_ids.update(found)
+    return {uid: _user_ids[uid] for uid in {event["uid"] for event in events}}
+
+
+def get_spill_path() -> str:
+    return os.path.join(
+        os.path.dirname(settings.DATABASES["default"]["NAME"]), _spill_name
+    )
+
+
+def spill(events: list, path: str):
+    """Append events to the spill file, or drop them if it's full."""
+    try:
+        if os.path.exists(path) and os.path.getsize(path) >= _max_spill_bytes:
+            logger.error(f"Spill file {path} is full, dropping {len(events)} events")
+            metrics.incr("telemetry.dropped", len(events))
+            return
+        with open(path, "a") as f:
+            f.write("".join(json.dumps(event) + "\n" for event in events))
+        metrics.incr("telemetry.spilled", len(events))
+    except OSError as exc:
+        logger.error(f"Can't spill {len(events)} events to {path}: {exc}")
+        metrics.incr("telemetry.dropped", len(events))
+
+
+def read_spill(path: str) -> list:
+    """Return the events in a spill file, skipping any line that isn't a whole event."""
+    events = []
+    with open(path) as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"Skipping bad line in {path}: {line!r}")
+    return events
+
+
+def replay_spill():
+    """Write the events in the spill file, if there is one. The file is first moved aside, so no other
+    process replays it too, and events that still can't be written go to a new one."""
+    path = get_spill_path()
+    replay_path = f"{path}.{os.getpid()}"
+    try:
+        os.rename(path, replay_path)
+    except FileNotFoundError:
+        return
+    events = read_spill(replay_path)
+    logger.info(f"Replaying {len(events)} spilled events")
+    for ndx in range(0, len(events), _batch_size):
+        batch = events[ndx : ndx + _batch_size]
+        if write_or_spill(batch):
+            metrics.incr("telemetry.replayed", len(batch))
+    os.remove(replay_path)
+
+
+@atexit.register
+def stop():
+    """Write whatever is left in the queue before the process exits."""
+    _stopping.set()
+    writer = _writer
+    if writer is not None and _writer_pid == os.getpid():
+        writer.join(timeout=_stop_seconds)
@@ -1,5 +1,8 @@
 import logging
+import math
+from bisect import bisect_left, bisect_right
 from datetime import date, datetime, time, timedelta
+from functools import cached_property, lru_cache
 from zoneinfo import ZoneInfo
 
 from app import util
@@ -27,6 +30,8 @@ class Timeline:
         01:45 standard time
         02:00 standard time (etc)
 
+    Internally the times are slots: the i'th time is start + i * 15 minutes, in epoch seconds. The datetimes
+    are only built when a list of them is asked for, and the requested list is built once.
     """
 
     _padding_points = 8  # How many 15-min intervals to go beyond the start/end times.
@@ -35,7 +40,6 @@ class Timeline:
     def __init__(self, start_dt: datetime, end_dt: datetime, now: datetime = None):
         if start_dt.tzinfo is None or end_dt.tzinfo is None:
             raise util.InternalError("datetimes cannot be naive")
-        self.requested_times = []
         self.start_dt = start_dt
         self.end_dt = end_dt
         self.start_date = start_dt.date()
@@ -52,35 +56,34 @@ class Timeline:
         if self.end_dt <= self.start_dt:
             raise util.InternalError("end must be greater than start")
 
-        # timedelta is broken when crossing DST boundaries in tz's which honor DST, so
-        # we'll do all datetime arithmetic in UTC in modern Python.
-        utc_end = self.end_dt.astimezone(tz.utc)
-        utc_cur = self.start_dt.astimezone(tz.utc)
-        while utc_cur <= utc_end:
-            self.requested_times.append(utc_cur.astimezone(self.time_zone))
-            utc_cur += timedelta(minutes=15)
+        # Slot arithmetic is in UTC, since timedelta is broken when crossing DST boundaries in tz's which
+        # honor DST.
+        self._start_epoch = tz.to_epoch(self.start_dt)
+        self._end_epoch = tz.to_epoch(self.end_dt)
+        self._now_epoch = self.now.timestamp()
+        self._count = (self._end_epoch - self._start_epoch) // _slot_seconds + 1
 
         # For determining highs and lows for observed tide Level data, which is by definition only in the
         # past (before "self.now"), we need to look a bit beyond the requested timeline in case
         # there is a high or low near or on the first or last displayed time. Here we define
-        # the timeline extensions used for that purpose.
-        self._start_padding = []
-        self._end_padding = []
+        # the timeline extensions used for that purpose, as counts of 15-min steps before the start
+        # and after the end.
+        self._start_padding = 0
+        self._end_padding = 0
         # Pad the start if any part of the timeline is in the past.
         if self.start_dt < self.now:
-            utc_cur = self.start_dt.astimezone(tz.utc)
-            for _ in range(self._padding_points):
-                utc_cur -= timedelta(minutes=15)
-                self._start_padding.insert(0, utc_cur.astimezone(self.time_zone))
-
+            self._start_padding = self._padding_points
         # Pad the end, limiting to the past.
         if self.end_dt < self.now:
-            utc_cur = self.end_dt.astimezone(tz.utc)
-            for _ in range(self._padding_points):
-                utc_cur += timedelta(minutes=15)
-                dt = utc_cur.astimezone(self.time_zone)
-                if dt <= self.now:
-                    self._end_padding.append(dt)
+            self._end_padding = min(
+                self._padding_points,
+                _steps_until(self._end_epoch, self._now_epoch, inclusive=True) - 1,
+            )
+        self._past_indexes = {}  # {padded: TimeIndex}
+
+    @cached_property
+    def requested_times(self) -> list:
+        return _local_times(self.time_zone, self._start_epoch, 0, self._count)
 
     def is_future(self, dt):
         return dt > self.now
@@ -98,7 +101,7 @@ class Timeline:
 
     def length_requested(self):
         """Return the number of times in the requested timeline."""
-        return len(self.requested_times)
+        return self._count
 
     def contains(self, dt: datetime) -> bool:
         """Returns whether the given datetime is within the boundries of the requested timeline."""
@@ -110,32 +113,187 @@ class Timeline:
     def get_all_past(self, padded: bool) -> list:
         # Return all requested times, plus any padding if requested, that are in the past.
         # Padding is only needed for water level in GraphTimeline and its subclasses.
+        runs = self._past_runs(padded)
+        if not padded and runs and runs[0][2] == self._count:
+            return list(self.requested_times)
+        times = []
+        for base_epoch, first, end in runs:
+            times += _local_times(self.time_zone, base_epoch, first, end)
+        return times
+
+    def get_past_index(self, padded: bool) -> "TimeIndex":
+        """Same times as get_all_past, as a TimeIndex for fast membership and range lookups. Built once."""
+        if padded not in self._past_indexes:
+            self._past_indexes[padded] = TimeIndex(
+                [
+                    base_epoch + step * _slot_seconds
+                    for base_epoch, first, end in self._past_runs(padded)
+                    for step in range(first, end)
+                ],
+                self.time_zone,
+            )
+        return self._past_indexes[padded]
+
+    def _past_runs(self, padded: bool) -> list:
+        """The past times as a list of (base epoch, first step, end step), in order."""
         if self.start_dt >= self.now:
             return []
-        if padded:
-            all = self._start_padding + self.requested_times + self._end_padding
-            return list(filter(lambda dt: dt < self.now, all))
-        return list(filter(lambda dt: dt < self.now, self.requested_times))
+        past_count = _steps_until(self._start_epoch, self._now_epoch, inclusive=False)
+        runs = [(self._start_epoch, 0, min(past_count, self._count))]
+        if not padded:
+            return runs
+        # Start padding is all in the past. End padding is at or before now, so drop any at now.
+        end_padding = min(
+            self._end_padding,
+            _steps_until(self._end_epoch, self._now_epoch, inclusive=False) - 1,
+        )
+        return (
+            [(self._start_epoch, -self._start_padding, 0)]
+            + runs
+            + [(self._end_epoch, 1, end_padding + 1)]
+        )
 
     def get_min(self, padded: bool) -> datetime:
         # Return the earliest time, maybe including padding.
         # Padding is only needed for water level in GraphTimeline and its subclasses.
-        return (
-            min(self._start_padding + self.requested_times)
-            if padded
-            else min(self.requested_times)
-        )
+        steps = -self._start_padding if padded else 0
+        return _local_time(self.time_zone, self._start_epoch + steps * _slot_seconds)
 
     def get_max(self, padded: bool) -> datetime:
         # Return the latest time, maybe including padding.
         # Padding is only needed for water level in GraphTimeline and its subclasses.
-        return (
-            max(self.requested_times + self._end_padding)
-            if padded
-            else max(self.requested_times)
+        if padded and self._end_padding > 0:
+            return _local_time(
+                self.time_zone, self._end_epoch + self._end_padding * _slot_seconds
+            )
+        return _local_time(
+            self.time_zone, self._start_epoch + (self._count - 1) * _slot_seconds
         )
 
 
+class TimeIndex:
+    """A sorted list of times kept as epoch seconds, with a set of them for O(1) membership tests and
+    bisection for ranges. Datetimes are only built for the times returned by between().
+    """
+
+    def __init__(self, epochs: list, time_zone: ZoneInfo):
+        self._epochs = epochs
+        self._epoch_set = frozenset(epochs)
+        self._time_zone = time_zone
+
+    def __len__(self):
+        return len(self._epochs)
+
+    def __contains__(self, dt: datetime) -> bool:
+        return dt.timestamp() in self._epoch_set
+
+    def first(self) -> datetime:
+        return _local_time(self._time_zone, self._epochs[0])
+
+    def last(self) -> datetime:
+        return _local_time(self._time_zone, self._epochs[-1])
+
+    def between(self, start_epoch: float, end_epoch: float) -> list:
+        """Return the times from start to end inclusive, as datetimes in order."""
+        lo = bisect_left(self._epochs, start_epoch)
+        hi = bisect_right(self._epochs, end_epoch)
+        return [_local_time(self._time_zone, epoch) for epoch in self._epochs[lo:hi]]
+
+
+_slot_seconds = 15 * 60
+_slot_delta = timedelta(seconds=_slot_seconds)
+# Sampling interval when looking for UTC offset changes. Zones don't change offset twice this close together.
+_offset_sample_seconds = 6 * 60 * 60
+
+
+def _steps_until(base_epoch: int, now_epoch: float, inclusive: bool) -> int:
+    """Return how many 15-min steps from base, counting base itself, are before now, or at or before now
+    if inclusive."""
+    elapsed = now_epoch - base_epoch
+    if inclusive:
+        return max(0, math.floor(elapsed / _slot_seconds) + 1)
+    return max(0, math.ceil(elapsed / _slot_seconds))
+
+
+def _local_time(time_zone, epoch: int) -> datetime:
+    return datetime.fromtimestamp(epoch, time_zone)
+
+
+def _local_times(time_zone, base_epoch: int, first: int, end: int) -> list:
+    """Return the local datetimes for base + step * 15 minutes, for steps first up to but not including end."""
+    times = []
+    if end <= first:
+        return times
+    changes = _offset_changes(
+        time_zone,
+        base_epoch + first * _slot_seconds,
+        base_epoch + (end - 1) * _slot_seconds,
+    )
+    step = first
+    while step < end:
+        # Between changes of UTC offset, wall clock arithmetic is right, and much cheaper than
+        # converting each time from UTC.
+        dt = _local_time(time_zone, base_epoch + step * _slot_seconds)
+        fold = dt.fold
+        segment_end = end
+        while changes and changes[0] <= base_epoch + step * _slot_seconds:
+            changes.pop(0)
+        if changes:
+            segment_end = min(end, -(-(changes[0] - base_epoch) // _slot_seconds))
+        times.append(dt)
+        for _ in range(step + 1, segment_end):
+            dt = dt + _slot_delta
+            if fold:
+                # Arithmetic resets fold, so restore it for the second pass through the repeated hour.
+                dt = dt.replace(fold=1)
+            times.append(dt)
+        step = segment_end
+    return times
+
+
+def _offset_changes(time_zone, first_epoch: int, last_epoch: int) -> list:
+    """Return the epochs in (first_epoch, last_epoch] at which the time zone's UTC offset or fold changes."""
+    first_year = datetime.fromtimestamp(first_epoch, tz.utc).year
+    last_year = datetime.fromtimestamp(last_epoch, tz.utc).year
+    return [
+        epoch
+        for year in range(first_year, last_year + 1)
+        for epoch in _offset_table(time_zone, year)
+        if first_epoch < epoch <= last_epoch
+    ]
+
+
+@lru_cache(maxsize=64)
+def _offset_table(time_zone, year: int) -> tuple:
+    """The epochs in a UTC year at which the time zone's UTC offset or fold changes. For zones that honor
+    DST, a fall back gives two: the change of offset, and the end of the repeated hour.
+    """
+
+    def key(epoch):
+        dt = datetime.fromtimestamp(epoch, time_zone)
+        return dt.utcoffset(), dt.fold
+
+    epoch = tz.to_epoch(datetime(year, 1, 1, tzinfo=tz.utc))
+    year_end = tz.to_epoch(datetime(year + 1, 1, 1, tzinfo=tz.utc))
+    changes = []
+    while epoch < year_end:
+        sample = min(epoch + _offset_sample_seconds, year_end)
+        if key(epoch) == key(sample):
+            epoch = sample
+            continue
+        # Find the first second with a different key, then carry on from there.
+        lo, hi = epoch, sample
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if key(mid) == key(epoch):
+                lo = mid
+            else:
+                hi = mid
+        changes.append(hi)
+        epoch = hi
+    return tuple(changes)
+
+
 class GraphTimeline(Timeline):
     """A subclass of Timeline suitable for building Plotly scatter plots with full days shown.
     This timeline will always include an extra element for 00:00 on the day following the end_date.
@@ -184,7 +342,7 @@ class GraphTimeline(Timeline):
         Returns:
             list | tuple[list, ...]: A single list of values, or a tuple of N lists.
         """
-        results = [callback(dt) for dt in self.requested_times]
+        results = [callback(dt) for dt in self.get_plot_times()]
 
         if results and isinstance(results[0], tuple):
             n = len(results[0])
@@ -192,6 +350,10 @@ class GraphTimeline(Timeline):
 
         return results
 
+    def get_plot_times(self) -> list:
+        """Get the times the plots are built for, i.e. one per element of each plot list."""
+        return self.requested_times
+
     def get_final_times(self, corrections: dict):
         """Get a corrected timeline consisting of start + times with data + end, without repeating start or end
 
@@ -258,18 +420,15 @@ class HiloTimeline(GraphTimeline):
         )
         self._hilo_timeline.sort()
 
-    def build_plots(self, callback) -> list:
-        """Same as parent class function, but uses the registered high/low times, plus start and end times."""
+    def get_plot_times(self) -> list:
+        """Same as parent class function, but returns the registered high/low times, plus start and end times.
+
+        Raises:
+            InternalError: If register_hilo_times has not been called.
+        """
         if self._hilo_timeline is None:
             raise util.InternalError("register_hilo_times must be called first")
-
-        results = [callback(dt) for dt in self._hilo_timeline]
-
-        if results and isinstance(results[0], tuple):
-            n = len(results[0])
-            return tuple([row[i] for row in results] for i in range(n))
-
-        return results
+        return self._hilo_timeline
 
     def get_final_times(self, corrections) -> list:
         """Get a corrected timeline consisting of start + times with data + end, without repeating start or end
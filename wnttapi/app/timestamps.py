@@ -0,0 +1,167 @@
+import logging
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from . import tzutil as tz
+
+"""
+Fast decoding of the fixed-layout timestamps in the data we ingest, e.g. "12/30/2025 04:45" from CDMO.
+
+Parsing every row with datetime.strptime and then converting it with astimezone is a big part of the cost of
+reading a payload. Here, get a parser for a layout and time zone once, then call it for every row. Within a
+payload, most rows share their hour with others, so each parser keeps a small cache of the aware datetime for
+the start of each hour it has seen, with the time zone offset and DST fold already worked out. A row is then
+just that datetime with its minutes replaced.
+
+An hour is only cached if the offset is the same for the whole hour, and a whole number of hours, so the
+minutes are the same before and after conversion. Anything else, including strings that don't fit the layout,
+goes through strptime, so the results and errors are always the same as strptime's.
+"""
+
+logger = logging.getLogger(__name__)
+_max_cached_hours = 10000  # more than a year of hours, per parser
+_missing = object()
+_hour = timedelta(hours=1)
+_rest_of_hour = timedelta(minutes=59)
+
+
+class Layout(NamedTuple):
+    format: str  # the strptime equivalent
+    length: int
+    separators: tuple  # ((index, character), ...)
+    year: slice
+    month: slice
+    day: slice
+    hour: slice
+    minute: slice
+
+
+# CDMO utcStamp, e.g. "12/30/2025 04:45"
+CDMO = Layout(
+    "%m/%d/%Y %H:%M",
+    16,
+    ((2, "/"), (5, "/"), (10, " "), (13, ":")),
+    slice(6, 10),
+    slice(0, 2),
+    slice(3, 5),
+    slice(11, 13),
+    slice(14, 16),
+)
+# NOAA predictions and the syzygy files, e.g. "2025-12-30 04:45"
+NOAA = Layout(
+    "%Y-%m-%d %H:%M",
+    16,
+    ((4, "-"), (7, "-"), (10, " "), (13, ":")),
+    slice(0, 4),
+    slice(5, 7),
+    slice(8, 10),
+    slice(11, 13),
+    slice(14, 16),
+)
+# Open-Meteo forecasts, e.g. "2025-12-30T04:45"
+OPEN_METEO = NOAA._replace(
+    format="%Y-%m-%dT%H:%M", separators=((4, "-"), (7, "-"), (10, "T"), (13, ":"))
+)
+# Surge csv files, e.g. "202512300445"
+SURGE = Layout(
+    "%Y%m%d%H%M",
+    12,
+    (),
+    slice(0, 4),
+    slice(4, 6),
+    slice(6, 8),
+    slice(8, 10),
+    slice(10, 12),
+)
+
+
+def utc_parser(layout: Layout, time_zone: ZoneInfo) -> callable:
+    """Get a parser for timestamps in UTC, which returns them as aware datetimes in a time zone.
+
+    Args:
+        layout (Layout): layout of the timestamps, e.g. CDMO
+        time_zone (ZoneInfo): time zone of the returned datetimes
+
+    Returns:
+        callable: parse(str) -> datetime. Raises ValueError if the string is not a valid time in the layout.
+    """
+    return _parser(layout, time_zone, True)
+
+
+def local_parser(layout: Layout, time_zone: ZoneInfo) -> callable:
+    """Get a parser for timestamps that are already local to a time zone, which returns them as aware
+    datetimes in that time zone. Same as strptime followed by replace(tzinfo=time_zone).
+
+    Args:
+        layout (Layout): layout of the timestamps, e.g. NOAA
+        time_zone (ZoneInfo): time zone of the timestamps
+
+    Returns:
+        callable: parse(str) -> datetime. Raises ValueError if the string is not a valid time in the layout.
+    """
+    return _parser(layout, time_zone, False)
+
+
+@lru_cache(maxsize=None)
+def _parser(layout: Layout, time_zone: ZoneInfo, from_utc: bool) -> callable:
+    # {start of string up to the minutes: aware start of that hour, or None if it can't be used}
+    hours = {}
+    key_end = layout.minute.start
+    length = layout.length
+    minute = layout.minute
+
+    def parse(s: str) -> datetime:
+        if len(s) == length:
+            key = s[:key_end]
+            start = hours.get(key, _missing)
+            if start is _missing:
+                if len(hours) >= _max_cached_hours:
+                    hours.clear()
+                start = hours[key] = _hour_start(s, layout, time_zone, from_utc)
+            minutes = s[minute]
+            if start is not None and minutes.isdigit():
+                try:
+                    return start.replace(minute=int(minutes))
+                except ValueError:
+                    pass
+        return _strptime(s, layout, time_zone, from_utc)
+
+    return parse
+
+
+def _hour_start(s: str, layout: Layout, time_zone: ZoneInfo, from_utc: bool):
+    """Return the aware datetime for the start of the timestamp's hour, or None if the string doesn't fit the
+    layout or the hour can't be cached."""
+    try:
+        if any(s[ndx] != char for ndx, char in layout.separators):
+            return None
+        fields = [
+            s[part] for part in (layout.year, layout.month, layout.day, layout.hour)
+        ]
+        if not all(field.isdigit() for field in fields):
+            return None
+        year, month, day, hour = (int(field) for field in fields)
+        if not from_utc:
+            return datetime(year, month, day, hour, tzinfo=time_zone)
+
+        start_utc = datetime(year, month, day, hour, tzinfo=tz.utc)
+        start = start_utc.astimezone(time_zone)
+        end = (start_utc + _rest_of_hour).astimezone(time_zone)
+        offset = start.utcoffset()
+        if offset != end.utcoffset() or start.fold != end.fold or offset % _hour:
+            return None
+        return start
+    except ValueError:
+        return None
+
+
+def _strptime(s: str, layout: Layout, time_zone: ZoneInfo, from_utc: bool):
+    if from_utc:
+        return (
+            datetime.strptime(s, layout.format)
+            .replace(tzinfo=tz.utc)
+            .astimezone(time_zone)
+        )
+    return datetime.strptime(s, layout.format).replace(tzinfo=time_zone)
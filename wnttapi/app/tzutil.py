@@ -66,3 +66,14 @@ def datetime_first(in_date: date, time_zone: ZoneInfo):
 def datetime_last(in_date, time_zone: ZoneInfo):
     dt = datetime_first(in_date, time_zone)
     return dt + timedelta(days=1) - timedelta(minutes=1)
+
+
+def to_epoch(dt: datetime) -> int:
+    """Return an aware datetime as whole seconds since the epoch, which is how times are stored in the db."""
+    return int(dt.timestamp())
+
+
+def from_epoch(seconds: int, time_zone: ZoneInfo) -> datetime:
+    """Return the aware datetime in a time zone for seconds since the epoch. Ambiguous times at the end of
+    DST get the right fold."""
+    return datetime.fromtimestamp(seconds, time_zone)
@@ -3,6 +3,7 @@ from app.views import (
     CreateGraphView,
     LatestInfoView,
     StationsView,
+    StatsView,
 )
 from django.urls import path
 
@@ -11,4 +12,5 @@ urlpatterns = [
     path("graph/", CreateGraphView.as_view()),
     path("latest/", LatestInfoView.as_view()),
     path("address/", AddressView.as_view()),
+    path("stats/", StatsView.as_view()),
 ]
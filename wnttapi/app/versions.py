@@ -0,0 +1,136 @@
+import hashlib
+import logging
+from datetime import date
+
+from django.db.models import Max
+
+from app import graph_cache, swmp
+from app.datasource import surge as sg
+from app.models import Refresh, get_station
+
+from . import station as stn
+from . import tzutil as tz
+
+logger = logging.getLogger(__name__)
+
+"""
+ETags for the GET endpoints, built from version stamps of the data each response is built from, so a caller
+that already has the current response can be told so without building it again.
+
+The stamps are:
+- stations: the modification time of stations.json.
+- graph version: graph_cache.version, which changes when a change to how graphs are built changes them.
+- ingest: the latest time observed or predicted data was written for the station and time range, from the
+  Refresh table that cdmo_refresh and astro_pull add to whenever they write any. cdmo_refresh deletes
+  refreshes more than a week old, after which a range's stamp goes back to None.
+- surge: the date and cycle of the latest surge file for the station.
+- quarter: the current quarter hour. Anything that covers the present moves its past/future split then, and
+  the graph cache rebuilds those graphs, with the latest wind forecast in the forecast cache, no more often
+  than that. So it also stands in for the forecast fetch time.
+The request parameters that select the response, and the api version, are part of every ETag.
+"""
+
+_quarter_hour_seconds = 15 * 60
+
+
+def stations_etag(api_version: str) -> str:
+    return make_etag(api_version, "stations", stations_stamp())
+
+
+def graph_etag(
+    api_version: str,
+    start_date: date,
+    end_date: date,
+    hilo_mode: bool,
+    station: stn.Station,
+    special: bool,
+    graph_format: str,
+) -> str:
+    """Return the ETag for a graph, which is the same as long as the graph data would be.
+
+    Args:
+        api_version (str): version of the api
+        start_date, end_date, hilo_mode, station, special: Same as graph.get_graph_data
+        graph_format (str): format of the graph data, see graph_format
+
+    Returns:
+        str: the quoted ETag
+    """
+    now = tz.now(tz.utc)
+    range_start, range_end, all_past = graph_cache.get_data_range(
+        start_date, end_date, station, now
+    )
+    stamps = [
+        graph_cache.version,
+        stations_stamp(),
+        ingest_stamp(station, range_start, range_end),
+    ]
+    # As in the graph cache, a graph entirely in the past only changes if its data is refreshed.
+    if not all_past:
+        stamps += [surge_stamp(station), quarter_stamp(now)]
+    return make_etag(
+        api_version,
+        "graph",
+        station.id,
+        start_date,
+        end_date,
+        bool(hilo_mode),
+        bool(special),
+        graph_format,
+        *stamps,
+    )
+
+
+def latest_etag(api_version: str, station: stn.Station) -> str:
+    """Return the ETag for the latest conditions, which is the same as long as they would be.
+
+    Args:
+        api_version (str): version of the api
+        station (Station): the station
+
+    Returns:
+        str: the quoted ETag
+    """
+    now = tz.now(tz.utc)
+    return make_etag(
+        api_version,
+        "latest",
+        station.id,
+        stations_stamp(),
+        ingest_stamp(station, now - swmp.recent_window, now),
+        surge_stamp(station),
+        quarter_stamp(now),
+    )
+
+
+def stations_stamp() -> int:
+    return stn.get_registry().mtime_ns
+
+
+def ingest_stamp(station: stn.Station, range_start, range_end) -> int:
+    """Return the latest time data was written for any part of a time range, in epoch seconds, or None if
+    it never was."""
+    when = Refresh.objects.filter(
+        station=get_station(station.id),
+        start__lte=range_end,
+        end__gte=range_start,
+    ).aggregate(Max("when"))["when__max"]
+    return None if when is None else tz.to_epoch(when)
+
+
+def surge_stamp(station: stn.Station) -> tuple:
+    try:
+        _, filedate, cycle, _ = sg.get_latest_file_info(station.noaa_station_id)
+    except OSError:
+        return None
+    return filedate, cycle
+
+
+def quarter_stamp(now) -> int:
+    return int(now.timestamp()) // _quarter_hour_seconds
+
+
+def make_etag(*parts) -> str:
+    """Return a strong ETag for a list of values, each of which has a repr that identifies it."""
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
@@ -4,17 +4,22 @@ import os
 from datetime import datetime
 
 import sentry_sdk
+from django.utils.http import parse_etags
 from requests.exceptions import RequestException
+from rest_framework import status
 from rest_framework.exceptions import APIException, NotAcceptable
 from rest_framework.views import APIView, Response
 
 from app.datasource import address
 
-from . import graph as gr
+from . import graph_cache
+from . import graph_format as gf
+from . import metrics
 from . import station as stn
-from . import swmp
+from . import swmp, telemetry
 from . import tzutil as tz
-from .models import Request, User, get_station
+from . import versions
+from .models import Request
 
 logger = logging.getLogger(__name__)
 api_version = os.getenv("APP_VERSION", "set-me")
@@ -56,66 +61,119 @@ def endpoint_logger(func):
 class StationsView(APIView):
     @endpoint_logger
     def post(self, request, format=None):
-        params = clean_params(request.data)
+        return self.respond(request, request.data)
+
+    # The same, with the parameters in the query string, and an ETag for conditional requests.
+    @endpoint_logger
+    def get(self, request, format=None):
+        return self.respond(request, request.query_params)
+
+    def respond(self, request, data):
+        params = clean_params(data)
         logger.info("%s: %s", self.__class__.__name__, params)
-        verify_version(request.data)
+        verify_version(data)
 
-        user_id = log_user(request.data.get("uid"))
-        log_request(
+        telemetry.record_request(
             Request.Type.STATION,
-            user_id,
-            request.data.get("version"),
-            request.data.get("screenWidth"),
+            data.get("uid"),
+            data.get("version"),
+            data.get("screenWidth"),
         )
-        return Response(data=stn.get_all_stations())
+        etag = versions.stations_etag(api_version) if is_get(request) else None
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        return tagged(Response(data=stn.get_all_stations()), etag)
 
 
 class LatestInfoView(APIView):
     @endpoint_logger
     def post(self, request, format=None):
-        params = clean_params(request.data)
+        return self.respond(request, request.data)
+
+    # The same, with the parameters in the query string, and an ETag for conditional requests.
+    @endpoint_logger
+    def get(self, request, format=None):
+        return self.respond(request, request.query_params)
+
+    def respond(self, request, data):
+        params = clean_params(data)
         logger.info("%s: %s", self.__class__.__name__, params)
-        verify_version(request.data)
-        swmp_station_id = get_required(request.data, "station_id")
+        verify_version(data)
+        swmp_station_id = get_required(data, "station_id")
         station = stn.get_station(swmp_station_id)
-        return Response(data=swmp.get_latest_conditions(station))
+        etag = versions.latest_etag(api_version, station) if is_get(request) else None
+        if is_not_modified(request, etag):
+            return not_modified(etag)
+        latest, complete = swmp.build_latest_conditions(station)
+        # Don't let the caller hold on to conditions that are missing some data.
+        return tagged(Response(data=latest), etag if complete else None)
 
 
 class CreateGraphView(APIView):
     @endpoint_logger
     def post(self, request, format=None):
-        params = clean_params(request.data)
+        return self.respond(request, request.data)
+
+    # The same, with the parameters in the query string, and an ETag for conditional requests.
+    @endpoint_logger
+    def get(self, request, format=None):
+        return self.respond(request, request.query_params)
+
+    def respond(self, request, data):
+        params = clean_params(data)
         logger.info("%s: %s", self.__class__.__name__, params)
-        verify_version(request.data)
-        start_date = datetime.strptime(
-            get_required(request.data, "start"), "%m/%d/%Y"
-        ).date()
-        end_date = datetime.strptime(
-            get_required(request.data, "end"), "%m/%d/%Y"
-        ).date()
-        hilo_mode = get_required(request.data, "hilo")
-        station_id = get_required(request.data, "station_id")
+        verify_version(data)
+        start_date = datetime.strptime(get_required(data, "start"), "%m/%d/%Y").date()
+        end_date = datetime.strptime(get_required(data, "end"), "%m/%d/%Y").date()
+        hilo_mode = as_bool(get_required(data, "hilo"))
+        station_id = get_required(data, "station_id")
         station = stn.get_station(station_id)
-        is_special = request.data.get("special", False)
-
-        user_id = log_user(request.data.get("uid"))
-        log_request(
+        is_special = as_bool(data.get("special", False))
+        # Older versions of the app don't ask for a format, and get the one they've always had.
+        graph_format = data.get("graphFormat", gf.ROWS)
+        if graph_format not in (gf.ROWS, gf.COMPACT):
+            logger.warning("Unknown graph format %s", graph_format)
+            raise NotAcceptable()
+
+        telemetry.record_request(
             Request.Type.GRAPH,
-            user_id,
-            request.data.get("version"),
-            request.data.get("screenWidth"),
+            data.get("uid"),
+            data.get("version"),
+            data.get("screenWidth"),
             station_id=station_id,
             start_date=start_date,
             end_date=end_date,
             hilo_mode=hilo_mode,
-            customNav=request.data.get("customNav"),
+            custom_nav=data.get("customNav"),
         )
 
+        etag = None
+        if is_get(request):
+            etag = versions.graph_etag(
+                api_version,
+                start_date,
+                end_date,
+                hilo_mode,
+                station,
+                is_special,
+                graph_format,
+            )
+            if is_not_modified(request, etag):
+                return not_modified(etag)
+
         # Gather all data needed for the graph and pass it back here
-        graph_data = gr.get_graph_data(
+        graph_data, complete = graph_cache.build_graph(
             start_date, end_date, hilo_mode, station, is_special
         )
-        return Response(data=graph_data)
+        response = Response(
+            data=gf.encode(
+                graph_data,
+                graph_format,
+                tz.datetime_first(start_date, station.time_zone),
+            )
+        )
+        # Don't let the caller hold on to a graph that's missing data from a source that failed.
+        return tagged(response, etag if complete else None)
 
 
 class AddressView(APIView):
@@ -129,68 +187,11 @@ class AddressView(APIView):
         return Response(data=latlng)
 
 
-def log_user(uid: str) -> int:
-    if uid is None:
-        logger.error("No uid in parameters!")
-        return None
-    try:
-        id, created = User.objects.get_or_create(
-            uuid=uid,
-            # Use UTC since sqlite converts all times to UTC anyway.
-            defaults={"uuid": uid, "created_at": tz.now(tz.utc)},
-        )
-        logger.debug(f"user created? {created} id: {id}")
-        return id
-    except Exception as exc:
-        # Log but do not raise
-        logger.exception(str(exc))
-        sentry_sdk.capture_exception(exc)
-        return None
-
-
-def log_request(
-    request_type: Request.Type,
-    user_id: int,
-    version: str,
-    screenWidth: int,
-    **kwargs,
-):
-    if user_id is None:
-        return
-    try:
-        # Use UTC since sqlite converts all times to UTC anyway.
-        now = tz.now(tz.utc)
-        if request_type == Request.Type.STATION:
-            Request.objects.create(
-                user=user_id,
-                when=now,
-                type=request_type,
-                version=version,
-                screenWidth=screenWidth,
-            )
-        else:
-            start_date = kwargs["start_date"]
-            end_date = kwargs["end_date"]
-            days = (end_date - start_date).days + 1
-            db_station = get_station(kwargs["station_id"])
-
-            Request.objects.create(
-                user=user_id,
-                when=now,
-                type=request_type,
-                station=db_station,
-                version=version,
-                start=start_date,
-                days=days,
-                hilo=kwargs["hilo_mode"],
-                customNav=kwargs["customNav"],
-                screenWidth=screenWidth,
-            )
-
-    except Exception as exc:
-        # Log but do not raise
-        logger.error(str(exc), stack_info=False)
-        sentry_sdk.capture_exception(exc)
+class StatsView(APIView):
+    @endpoint_logger
+    def get(self, request, format=None):
+        # Counters are kept per worker process, so include which one answered.
+        return Response(data={"pid": os.getpid(), "counters": metrics.snapshot()})
 
 
 def clean_params(data):
@@ -207,6 +208,43 @@ def get_required(data, param):
     raise NotAcceptable()
 
 
+def as_bool(value) -> bool:
+    # Flags are booleans in a json body, but strings in a query string.
+    if isinstance(value, str):
+        return value.lower() in ("true", "1")
+    return bool(value)
+
+
+def is_get(request) -> bool:
+    return request.method == "GET"
+
+
+def is_not_modified(request, etag: str) -> bool:
+    """Returns whether the caller already has the response with this ETag, per its If-None-Match header."""
+    if etag is None:
+        return False
+    header = request.headers.get("If-None-Match")
+    if header is None:
+        return False
+    # A GET only needs a weak match, so ignore any W/ prefix.
+    return any(
+        tag == "*" or tag.removeprefix("W/") == etag for tag in parse_etags(header)
+    )
+
+
+def not_modified(etag: str) -> Response:
+    metrics.incr("etag.not_modified")
+    return tagged(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def tagged(response: Response, etag: str) -> Response:
+    # Have the caller check back with its ETag every time, rather than reuse the response on its own.
+    if etag is not None:
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 # Verify that caller's release version matches ours.  If not, raise NotAcceptable
 # which app should interpret as version out of date.
 def verify_version(data):
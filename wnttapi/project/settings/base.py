@@ -2,6 +2,8 @@ import os
 
 import logging
 
+from corsheaders.defaults import default_headers
+
 SECRET_KEY = os.environ.get("SECRET_KEY")
 
 # Application definition
@@ -32,6 +34,9 @@ MIDDLEWARE = [
 
 # Bek's version of this:
 CORS_ALLOW_ALL_ORIGINS = True
+# For conditional GETs from the app, which is served from another origin.
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match")
+CORS_EXPOSE_HEADERS = ["ETag"]
 
 ROOT_URLCONF = "project.urls"
 
@@ -100,9 +105,11 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        # FileBasedCache shared by all workers, with a per-process LRU in front of it.
+        "BACKEND": "app.cache_backend.TieredFileCache",
         "LOCATION": "/var/tmp/django_cache",
         "TIMEOUT": None,
+        "OPTIONS": {"LOCAL_MAX_ENTRIES": 100},
     }
 }
 
@@ -0,0 +1,73 @@
+import os
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import patch
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+import app.tzutil as tz
+from app import metrics
+from app.datasource import address
+
+wells = {"lat": "43.3220", "lng": "-70.5803"}
+
+
+@patch.object(address, "write_db")
+@patch.object(address, "read_db", return_value=(None, None))
+@patch.object(address, "pull_location")
+class TestAddress(TestCase):
+    def setUp(self):
+        address._local.clear()
+
+    def test_normalize(self, *mocks):
+        for search in ["Wells, ME", "  wells ,me.", "Wells%2C%20ME", "WELLS+,+ME"]:
+            self.assertEqual(address.normalize(search), "wells, me", search)
+
+    def test_local_hit(self, pull_location, read_db, write_db):
+        pull_location.return_value = wells
+        self.assertEqual(address.get_location("Wells, ME"), wells)
+        write_db.assert_called_once()
+        hits = metrics.get("geocode.local_hit")
+        self.assertEqual(address.get_location("wells,  me"), wells)
+        self.assertEqual(pull_location.call_count, 1)
+        self.assertEqual(metrics.get("geocode.local_hit"), hits + 1)
+
+    def test_db_hit(self, pull_location, read_db, write_db):
+        read_db.return_value = (wells, tz.now(tz.utc) + timedelta(days=1))
+        self.assertEqual(address.get_location("Wells, ME"), wells)
+        pull_location.assert_not_called()
+        # Now it's in the local cache too.
+        read_db.return_value = (None, None)
+        self.assertEqual(address.get_location("Wells, ME"), wells)
+        self.assertEqual(read_db.call_count, 1)
+
+    def test_not_found(self, pull_location, read_db, write_db):
+        pull_location.return_value = {}
+        self.assertEqual(address.get_location("Nowhere, ME"), {})
+        self.assertEqual(address.get_location("nowhere, me"), {})
+        self.assertEqual(pull_location.call_count, 1)
+        query, expires = "nowhere, me", address._local["nowhere, me"][1]
+        self.assertLessEqual(
+            expires, tz.to_epoch(tz.now(tz.utc) + address._not_found_ttl)
+        )
+        # Once it expires, it's looked up again.
+        address._local[query] = ({}, expires - address._not_found_ttl.total_seconds())
+        address.get_location("Nowhere, ME")
+        self.assertEqual(pull_location.call_count, 2)
+
+    def test_error_not_cached(self, pull_location, read_db, write_db):
+        pull_location.side_effect = OSError("timeout")
+        with self.assertRaises(OSError):
+            address.get_location("Wells, ME")
+        write_db.assert_not_called()
+        self.assertEqual(len(address._local), 0)
+
+    def test_lru(self, pull_location, read_db, write_db):
+        pull_location.return_value = wells
+        with patch.object(address, "_max_local_entries", 2):
+            for search in ["a", "b", "a", "c"]:
+                address.get_location(search)
+        self.assertEqual(list(address._local), ["a", "c"])
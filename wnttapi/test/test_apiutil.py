@@ -0,0 +1,50 @@
+import os
+import time
+from unittest import TestCase
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+from django import setup
+
+setup()
+
+from app.datasource.apiutil import APICall, run_parallel
+
+
+def slow(secs, value):
+    time.sleep(secs)
+    return value
+
+
+def broken():
+    raise ValueError("bad data")
+
+
+class TestApiUtil(TestCase):
+    def test_runs_in_parallel(self):
+        """Total time is set by the slowest call, not the sum."""
+        calls = [APICall(f"call{i}", slow, 0.2, i) for i in range(5)]
+        start = time.monotonic()
+        data = run_parallel(calls)
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(data, {f"call{i}": i for i in range(5)})
+        self.assertEqual([c.data for c in calls], [0, 1, 2, 3, 4])
+
+    def test_optional_call_uses_default(self):
+        """An optional call that fails or misses its deadline gets its default value."""
+        calls = [
+            APICall("fast", slow, 0, "ok", timeout=1),
+            APICall("late", slow, 2, "late", timeout=0.1, required=False, default={}),
+            APICall("broken", broken, required=False, default={}),
+        ]
+        start = time.monotonic()
+        data = run_parallel(calls)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(data, {"fast": "ok", "late": {}, "broken": {}})
+        self.assertEqual([c.failed for c in calls], [False, True, True])
+
+    def test_required_call_raises(self):
+        with self.assertRaisesRegex(ValueError, "bad data"):
+            run_parallel([APICall("fast", slow, 0, "ok"), APICall("broken", broken)])
+
+        with self.assertRaisesRegex(TimeoutError, "late"):
+            run_parallel([APICall("late", slow, 2, "late", timeout=0.1)])
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+from django import setup
+
+setup()
+
+from app import metrics
+from app.cache_backend import TieredFileCache
+
+
+class TestTieredFileCache(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        # Two caches on the same directory stand in for two worker processes.
+        self.cache = TieredFileCache(self.tmpdir.name, {})
+        self.other = TieredFileCache(self.tmpdir.name, {})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_local_hit(self):
+        self.cache.set("stations", {"a": [1, 2]})
+        first = self.cache.get("stations")
+        hits = metrics.get("cache.local_hit")
+        self.assertEqual(first, {"a": [1, 2]})
+        # The second get doesn't unpickle, it returns the same object.
+        self.assertIs(self.cache.get("stations"), first)
+        self.assertEqual(metrics.get("cache.local_hit"), hits + 1)
+
+    def test_sees_changes_from_other_process(self):
+        self.cache.set("key", "old")
+        self.assertEqual(self.cache.get("key"), "old")
+        self.other.set("key", "new")
+        self.assertEqual(self.cache.get("key"), "new")
+        self.other.delete("key")
+        self.assertIsNone(self.cache.get("key"))
+        self.assertEqual(self.cache.get("key", "default"), "default")
+
+        self.cache.set("key", "again")
+        self.assertEqual(self.cache.get("key"), "again")
+        self.other.clear()
+        self.assertIsNone(self.cache.get("key"))
+
+    def test_expiry(self):
+        self.cache.set("key", "value", timeout=1)
+        self.assertEqual(self.cache.get("key"), "value")
+        time.sleep(1.1)
+        self.assertIsNone(self.cache.get("key"))
+        self.assertFalse(self.cache.has_key("key"))
+
+    def test_lru_eviction(self):
+        cache = TieredFileCache(self.tmpdir.name, {"OPTIONS": {"LOCAL_MAX_ENTRIES": 2}})
+        for key in ["a", "b", "c"]:
+            cache.set(key, key)
+            cache.get(key)
+        self.assertEqual(len(cache._local), 2)
+        # Evicted entries are still in the shared store.
+        self.assertEqual(cache.get("a"), "a")
@@ -0,0 +1,132 @@
+import os
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+from django.core.cache.backends.locmem import LocMemCache
+
+import app.station as stn
+import app.tzutil as tz
+from app import graph, graph_cache, metrics
+
+cur_path = os.path.dirname(os.path.abspath(__file__))
+station = stn.get_station("welinwq", f"{cur_path}/../../datamount/stations")
+past_start, past_end = date(2025, 6, 1), date(2025, 6, 2)
+
+
+@patch.object(graph_cache.sg, "get_latest_file_info")
+@patch.object(graph_cache, "Refresh")
+@patch.object(graph, "build_graph")
+class TestGraphCache(TestCase):
+    def setUp(self):
+        self.cache = LocMemCache("graph_cache", {})
+        self.cache.clear()
+        patcher = patch.object(graph_cache, "cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, start_date: date, end_date: date):
+        return graph_cache.build_graph(start_date, end_date, False, station, False)
+
+    def set_refreshed(self, refresh, refreshed: bool):
+        refresh.objects.filter.return_value.exists.return_value = refreshed
+
+    def test_key(self, build_graph, refresh, file_info):
+        file_info.return_value = (None, "20260101", "12", None)
+        key = f"graph:{graph_cache.version}:welinwq:2025-06-01:2025-06-02"
+        stamp = stn.get_registry().mtime_ns
+        self.assertEqual(
+            graph_cache.build_key(past_start, past_end, True, station, True),
+            f"{key}:1:{stamp}",
+        )
+        # Graphs that reach the present depend on the latest surge file.
+        self.assertEqual(
+            graph_cache.build_key(past_start, past_end, False, station, False),
+            f"{key}:0:{stamp}:20260101:12",
+        )
+        file_info.side_effect = OSError("no surge file")
+        self.assertEqual(
+            graph_cache.build_key(past_start, past_end, False, station, False),
+            f"{key}:0:{stamp}:None:None",
+        )
+
+    def test_stations_changed(self, build_graph, refresh, file_info):
+        build_graph.return_value = ({"blob": 1}, True)
+        self.set_refreshed(refresh, False)
+        self.get(past_start, past_end)
+        # A change to stations.json, such as to the MLLW conversion, means building the graph again.
+        changed = SimpleNamespace(mtime_ns=stn.get_registry().mtime_ns + 1)
+        with patch.object(graph_cache.stn, "get_registry", return_value=changed):
+            self.get(past_start, past_end)
+        self.assertEqual(build_graph.call_count, 2)
+
+    def test_past_timeout(self, build_graph, refresh, file_info):
+        build_graph.return_value = ({"blob": 1}, True)
+        self.set_refreshed(refresh, False)
+        with patch.object(self.cache, "set", wraps=self.cache.set) as cache_set:
+            self.assertEqual(self.get(past_start, past_end), ({"blob": 1}, True))
+        self.assertEqual(
+            cache_set.call_args.kwargs["timeout"], graph_cache._past_timeout_seconds
+        )
+        hits = metrics.get("graph_cache.hit")
+        self.assertEqual(self.get(past_start, past_end), ({"blob": 1}, True))
+        self.assertEqual(build_graph.call_count, 1)
+        self.assertEqual(metrics.get("graph_cache.hit"), hits + 1)
+
+    def test_current_timeout(self, build_graph, refresh, file_info):
+        file_info.return_value = (None, "20260101", "12", None)
+        build_graph.return_value = ({"blob": 1}, True)
+        now = datetime(2026, 1, 1, 10, 7, 30, tzinfo=tz.utc)
+        with (
+            patch.object(graph_cache.tz, "now", return_value=now),
+            patch.object(self.cache, "set", wraps=self.cache.set) as cache_set,
+        ):
+            self.get(date(2026, 1, 1), date(2026, 1, 2))
+        # Cached only until 10:15.
+        self.assertEqual(cache_set.call_args.kwargs["timeout"], 450)
+        self.assertEqual(graph_cache.seconds_to_next_quarter(now), 450)
+        # Refreshes don't matter for a graph that isn't all in the past.
+        refresh.objects.filter.assert_not_called()
+
+    def test_incomplete_not_cached(self, build_graph, refresh, file_info):
+        build_graph.return_value = ({"blob": 1}, False)
+        self.assertEqual(self.get(past_start, past_end), ({"blob": 1}, False))
+        self.get(past_start, past_end)
+        self.assertEqual(build_graph.call_count, 2)
+
+    def test_refresh(self, build_graph, refresh, file_info):
+        build_graph.return_value = ({"blob": 1}, True)
+        self.set_refreshed(refresh, False)
+        self.get(past_start, past_end)
+        self.get(past_start, past_end)
+        self.assertEqual(build_graph.call_count, 1)
+
+        key = graph_cache.build_key(past_start, past_end, False, station, True)
+        cached_at = self.cache.get(key)["cached_at"]
+
+        # cdmo_refresh stored new data for the range, so the graph is built again.
+        build_graph.return_value = ({"blob": 2}, True)
+        self.set_refreshed(refresh, True)
+        stale = metrics.get("graph_cache.stale")
+        self.assertEqual(self.get(past_start, past_end), ({"blob": 2}, True))
+        self.assertEqual(build_graph.call_count, 2)
+        self.assertEqual(metrics.get("graph_cache.stale"), stale + 1)
+
+        # The refreshes looked for are those since the entry was cached that overlap the padded range.
+        kwargs = refresh.objects.filter.call_args.kwargs
+        self.assertEqual(kwargs["when__gte"], cached_at)
+        self.assertEqual(
+            kwargs["start__lte"],
+            tz.datetime_first(date(2025, 6, 3), station.time_zone)
+            + graph_cache._padding,
+        )
+        self.assertEqual(
+            kwargs["end__gte"],
+            tz.datetime_first(past_start, station.time_zone) - graph_cache._padding,
+        )
@@ -0,0 +1,93 @@
+import json
+import os
+from datetime import date, datetime, timedelta
+from unittest import TestCase
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+from rest_framework.utils.encoders import JSONEncoder
+
+import app.tzutil as tz
+from app import graph_format as gf
+from app.timeline import GraphTimeline, HiloTimeline
+
+tzone = tz.eastern
+dimensions = ["dt", "hist-tides", "wind-dir", "future-surge", "astro-tides-labels"]
+
+
+def graph_data(times: list) -> dict:
+    blob = []
+    for ndx, dt in enumerate(times):
+        blob.append(
+            [
+                dt,
+                round(ndx / 10, 2) if ndx < len(times) // 2 else None,
+                ndx % 360 if ndx % 4 == 0 else None,
+                0.25 if ndx > len(times) // 2 else None,
+                (("(HIGH)",) if ndx % 2 else ("(LOW)",)) if ndx % 25 == 0 else None,
+            ]
+        )
+    return {"dimensions": dimensions, "blob": blob, "subtitle": "x"}
+
+
+def as_json(data: dict) -> dict:
+    # The same encoding the api responses get.
+    return json.loads(json.dumps(data, cls=JSONEncoder))
+
+
+def epoch_rows(data: dict) -> list:
+    return [
+        [tz.to_epoch(datetime.fromisoformat(rec[0]))] + rec[1:]
+        for rec in as_json(data)["blob"]
+    ]
+
+
+class TestGraphFormat(TestCase):
+    def test_rows_unchanged(self):
+        timeline = GraphTimeline(date(2025, 1, 1), date(2025, 1, 1), tzone)
+        data = graph_data(timeline.requested_times)
+        self.assertIs(gf.encode(data, gf.ROWS, timeline.start_dt), data)
+        with self.assertRaises(ValueError):
+            gf.encode(data, "columns", timeline.start_dt)
+
+    def test_compact(self):
+        # Across the fall DST change, so the slots aren't all the same wall clock time apart.
+        timeline = GraphTimeline(date(2024, 11, 2), date(2024, 11, 4), tzone)
+        data = graph_data(timeline.requested_times)
+        compact = as_json(gf.encode(data, gf.COMPACT, timeline.start_dt))
+        self.assertEqual(compact["format"], gf.COMPACT)
+        self.assertEqual(compact["subtitle"], "x")
+        self.assertNotIn("blob", compact)
+        self.assertNotIn("slots", compact["times"])
+        self.assertEqual(compact["times"]["corrected"], [])
+        columns = compact["columns"]
+        self.assertEqual(
+            [col["type"] for col in columns], ["float", "int", "float", "label"]
+        )
+        self.assertIn("first", columns[0])
+        self.assertIn("rows", columns[1])
+        self.assertEqual(gf.expand(compact), epoch_rows(data))
+        self.assertLess(
+            len(json.dumps(compact)), len(json.dumps(data, cls=JSONEncoder)) / 3
+        )
+
+    def test_compact_hilo(self):
+        timeline = HiloTimeline(date(2025, 3, 8), date(2025, 3, 10), tzone)
+        hilo_times = timeline.requested_times[20:-20:50]
+        timeline.register_hilo_times(hilo_times)
+        corrections = {hilo_times[1]: hilo_times[1] + timedelta(minutes=7)}
+        times = timeline.get_final_times(corrections)
+        data = graph_data(times)
+        compact = as_json(gf.encode(data, gf.COMPACT, timeline.start_dt))
+        self.assertEqual(len(compact["times"]["slots"]), len(times))
+        self.assertEqual(len(compact["times"]["corrected"]), 1)
+        self.assertEqual(gf.expand(compact), epoch_rows(data))
+
+    def test_empty_column(self):
+        self.assertEqual(
+            gf.encode_column([None, None]),
+            {"type": "label", "labels": [], "rows": [], "values": []},
+        )
@@ -0,0 +1,221 @@
+import json
+import math
+import os
+import tempfile
+from datetime import date, datetime
+from unittest import TestCase
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+import numpy as np
+
+import app.tzutil as tz
+from app.datasource import harmonic
+from app.hilo import Hilo
+from app.timeline import Timeline
+
+cur_path = os.path.dirname(os.path.abspath(__file__))
+
+# NOAA's speeds for its 37 constituents, in degrees per hour.
+noaa_speeds = {
+    "M2": 28.9841042, "S2": 30.0, "N2": 28.4397295, "K1": 15.0410686, "M4": 57.9682084,
+    "O1": 13.9430356, "M6": 86.9523127, "MK3": 44.0251729, "S4": 60.0, "MN4": 57.4238337,
+    "NU2": 28.5125831, "S6": 90.0, "MU2": 27.9682084, "2N2": 27.8953548, "OO1": 16.1391017,
+    "LAM2": 29.4556253, "S1": 15.0, "M1": 14.4966939, "J1": 15.5854433, "MM": 0.5443747,
+    "SSA": 0.0821373, "SA": 0.0410686, "MSF": 1.0158958, "MF": 1.0980331, "RHO": 13.4715145,
+    "Q1": 13.3986609, "T2": 29.9589333, "R2": 30.0410667, "2Q1": 12.8542862, "P1": 14.9589314,
+    "2SM2": 31.0158958, "M3": 43.4761563, "L2": 29.5284789, "2MK3": 42.9271398, "K2": 30.0821373,
+    "M8": 115.9364166, "MS4": 58.9841042,
+}  # fmt: skip
+
+
+def unity(navd88_level):
+    return navd88_level
+
+
+def write_station(data_dir: str, noaa_id: str, constituents: list):
+    with open(harmonic.get_file_path(noaa_id, data_dir), "w") as f:
+        json.dump(
+            {
+                "noaaStationId": noaa_id,
+                "units": "feet",
+                "mslNavd88": 0.5,
+                "constituents": constituents,
+            },
+            f,
+        )
+
+
+def reference_level(constituents: list, epoch: int, node_epoch: int) -> float:
+    """The level from M2, K1 and O1, worked out separately from harmonic.py: T+h is Greenwich mean sidereal
+    time and s the moon's mean longitude, per Meeus, and f and u are Doodson's series in N at node_epoch.
+    """
+    days = (epoch - 946728000) / 86400  # since J2000
+    t = days / 36525
+    gmst = 280.46061837 + 360.98564736629 * days + 0.000387933 * t**2
+    s = 218.3164477 + 481267.88123421 * t
+    N = math.radians(125.04452 - 1934.136261 * (node_epoch - 946728000) / 86400 / 36525)
+    cos = [math.cos(k * N) for k in (1, 2, 3)]
+    sin = [math.sin(k * N) for k in (1, 2, 3)]
+    # {name: (V, f, u)}
+    terms = {
+        "M2": (
+            2 * gmst - 2 * s,
+            1.0004 - 0.0373 * cos[0] + 0.0002 * cos[1],
+            -2.14 * sin[0],
+        ),
+        "K1": (
+            gmst - 90,
+            1.0060 + 0.1150 * cos[0] - 0.0088 * cos[1] + 0.0006 * cos[2],
+            -8.86 * sin[0] + 0.68 * sin[1] - 0.07 * sin[2],
+        ),
+        "O1": (
+            gmst - 2 * s + 90,
+            1.0089 + 0.1871 * cos[0] - 0.0147 * cos[1] + 0.0014 * cos[2],
+            10.80 * sin[0] - 1.34 * sin[1] + 0.19 * sin[2],
+        ),
+    }
+    level = 0.5
+    for c in constituents:
+        v, f, u = terms[c["name"]]
+        level += f * c["amplitude"] * math.cos(math.radians(v + u - c["phase"]))
+    return level
+
+
+class TestHarmonic(TestCase):
+    def setUp(self):
+        # A made-up station with only M2, so its highs and lows are easy to find.
+        self.data_dir = tempfile.mkdtemp()
+        write_station(
+            self.data_dir,
+            "0000001",
+            [
+                {"name": "M2", "amplitude": 4.0, "phase": 100.0},
+                {"name": "S2", "amplitude": 0.0, "phase": 0.0},
+            ],
+        )
+        self.harmonics = harmonic.load_harmonics("0000001", self.data_dir)
+
+    def tearDown(self):
+        for name in os.listdir(self.data_dir):
+            os.remove(os.path.join(self.data_dir, name))
+        os.rmdir(self.data_dir)
+
+    def test_speeds(self):
+        names = tuple(noaa_speeds)
+        _, speeds, _, _ = harmonic.get_year_terms(2026, names)
+        for name, speed in zip(names, speeds):
+            self.assertAlmostEqual(speed, noaa_speeds[name], delta=1e-6, msg=name)
+
+    def test_node_factors(self):
+        # The moon's orbit was at its most inclined to the equator in 2025, and will be at its least in 2034.
+        names = ("M2", "K1", "O1", "S2")
+        _, _, _, f = harmonic.get_year_terms(2025, names)
+        np.testing.assert_allclose(f, [0.963, 1.113, 1.183, 1.0], atol=0.003)
+        _, _, _, f = harmonic.get_year_terms(2034, names)
+        np.testing.assert_allclose(f, [1.038, 0.882, 0.806, 1.0], atol=0.003)
+
+    def test_equilibrium_arguments(self):
+        # V0 + u at the start of 2026, from Schureman's formulas with T = 180 degrees at midnight UTC.
+        _, _, v0u, _ = harmonic.get_year_terms(2026, ("K1", "O1", "M2"))
+        np.testing.assert_allclose(v0u, [14.26, 50.69, 66.40], atol=0.01)
+
+    def test_diurnal(self):
+        constituents = [
+            {"name": "M2", "amplitude": 2.0, "phase": 100.0},
+            {"name": "K1", "amplitude": 1.0, "phase": 200.0},
+            {"name": "O1", "amplitude": 0.8, "phase": 180.0},
+        ]
+        write_station(self.data_dir, "0000002", constituents)
+        harmonics = harmonic.load_harmonics("0000002", self.data_dir)
+        for year in (2015, 2026):
+            start = tz.to_epoch(datetime(year, 3, 1, tzinfo=tz.utc))
+            mid_year = tz.to_epoch(datetime(year, 7, 2, 12, tzinfo=tz.utc))
+            epochs = np.arange(start, start + 2 * 86400, 3600)
+            expected = [
+                reference_level(constituents, e, mid_year) for e in epochs.tolist()
+            ]
+            np.testing.assert_allclose(
+                harmonic.predict(harmonics, epochs), expected, atol=0.01
+            )
+
+    def test_noaa(self):
+        # Seattle's constituents from NOAA's metadata API, written by harcon_pull.py, and NOAA's highs and lows
+        # for them, in meters above MLLW.
+        harmonics = harmonic.load_harmonics("9447130", f"{cur_path}/data")
+        with open(f"{cur_path}/data/astro-hilo-9447130-20150101-02.json") as f:
+            noaa = json.load(f)["predictions"]
+        mllw_navd88 = 2.419 - 3.134
+        start = tz.to_epoch(datetime(2015, 1, 1, tzinfo=tz.utc))
+        hilos = harmonic.predict_hilos(harmonics, start, start + 2 * 86400)
+        self.assertEqual(len(hilos), len(noaa))
+        for (epoch, level, hilo), pred in zip(hilos, noaa):
+            noaa_dt = datetime.strptime(pred["t"], "%Y-%m-%d %H:%M")
+            noaa_epoch = tz.to_epoch(noaa_dt.replace(tzinfo=tz.utc))
+            self.assertEqual(hilo == Hilo.HIGH, pred["type"] == "H", msg=pred["t"])
+            self.assertLessEqual(abs(epoch - noaa_epoch), 3 * 60, msg=pred["t"])
+            noaa_level = (float(pred["v"]) + mllw_navd88) * 3.28084
+            self.assertLessEqual(abs(level - noaa_level), 0.05, msg=pred["t"])
+
+    def test_new_year_hilos(self):
+        # Seattle's level jumps 0.28 ft at the start of 2015 as its tide falls, which isn't a high or low.
+        harmonics = harmonic.load_harmonics("9447130", f"{cur_path}/data")
+        start = tz.to_epoch(datetime(2015, 1, 1, tzinfo=tz.utc))
+        hilos = harmonic.predict_hilos(harmonics, start - 86400, start + 86400)
+        for first, second in zip(hilos, hilos[1:]):
+            self.assertNotEqual(first[2], second[2])
+            self.assertGreater(second[0] - first[0], 3600)
+
+    def test_read(self):
+        self.assertEqual(self.harmonics.names, ("M2",))
+        self.assertEqual(self.harmonics.msl, 0.5)
+        self.assertIs(harmonic.load_harmonics("0000001", self.data_dir), self.harmonics)
+
+    def test_predict(self):
+        epochs = np.arange(1767225600, 1767225600 + 86400, 900)  # 2026-01-01 UTC
+        t0, speeds, v0u, f = harmonic.get_year_terms(2026, ("M2",))
+        angles = np.radians(speeds[0] * (epochs - t0) / 3600 + v0u[0] - 100.0)
+        expected = 0.5 + f[0] * 4.0 * np.cos(angles)
+        np.testing.assert_allclose(harmonic.predict(self.harmonics, epochs), expected)
+
+    def test_new_year(self):
+        # As in NOAA's predictions, f and u change at the new year, so the level jumps, but only a little.
+        t0 = 1767225600  # 2026-01-01 UTC
+        old_t0, speeds, v0u, f = harmonic.get_year_terms(2025, ("M2",))
+        angle = np.radians(speeds[0] * (t0 - old_t0) / 3600 + v0u[0] - 100.0)
+        old_level = 0.5 + f[0] * 4.0 * np.cos(angle)
+        new_level = harmonic.predict(self.harmonics, [t0])[0]
+        self.assertLess(abs(new_level - old_level), 0.05)
+
+    def test_hilos(self):
+        start = 1767225600
+        end = start + 7 * 86400
+        hilos = harmonic.predict_hilos(self.harmonics, start, end)
+        # M2 has two highs and two lows a lunar day, alternating.
+        self.assertIn(len(hilos), (26, 27, 28))
+        for first, second in zip(hilos, hilos[1:]):
+            self.assertNotEqual(first[2], second[2])
+            half_period = 180 / noaa_speeds["M2"] * 3600
+            self.assertAlmostEqual(second[0] - first[0], half_period, delta=90)
+        _, _, _, f = harmonic.get_year_terms(2026, ("M2",))
+        for _, level, hilo in hilos:
+            expected = 0.5 + (f[0] if hilo == Hilo.HIGH else -f[0]) * 4.0
+            self.assertAlmostEqual(level, expected, delta=0.001)
+
+    def test_timelines(self):
+        timeline = Timeline(
+            tz.datetime_first(date(2026, 3, 8), tz.eastern),
+            tz.datetime_last(date(2026, 3, 8), tz.eastern),
+        )
+        preds = harmonic.get_15m_tides("0000001", timeline, unity, self.data_dir)
+        hilos = harmonic.get_hilo_tides("0000001", timeline, unity, self.data_dir)
+        # The spring forward day is 23 hours long.
+        self.assertEqual(len(preds), 23 * 4)
+        self.assertEqual(sorted(preds), timeline.get_requested())
+        self.assertIn(len(hilos), (3, 4))
+        for dt, hilo in hilos.items():
+            self.assertEqual(dt.minute % 15, 0)
+            self.assertLessEqual(abs((hilo.real_dt - dt).total_seconds()), 450)
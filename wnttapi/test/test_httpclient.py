@@ -0,0 +1,102 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import patch
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+import requests
+
+from app import metrics
+from app.datasource import httpclient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    statuses = []  # status of each response, then 200
+    connections = set()
+
+    def do_GET(self):
+        Handler.connections.add(self.client_address)
+        status = Handler.statuses.pop(0) if len(Handler.statuses) > 0 else 200
+        body = b"[]"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@patch.object(httpclient, "_backoff_seconds", 0.01)
+@patch.object(httpclient, "_backoff_jitter_seconds", 0.01)
+class TestHttpClient(TestCase):
+    def setUp(self):
+        Handler.statuses = []
+        Handler.connections = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/data"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        httpclient._sessions.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def counts(self) -> dict:
+        return {
+            name: metrics.get(f"http.127.0.0.1.{name}")
+            for name in ["requests", "retries", "errors"]
+        }
+
+    def test_keep_alive(self):
+        before = self.counts()
+        for _ in range(3):
+            response = httpclient.get(self.url, params={"q": "x"}, timeout=5)
+            self.assertEqual(response.json(), [])
+        self.assertEqual(len(Handler.connections), 1)
+        after = self.counts()
+        self.assertEqual(after["requests"], before["requests"] + 3)
+        self.assertEqual(after["retries"], before["retries"])
+        self.assertEqual(after["errors"], before["errors"])
+
+    def test_retry(self):
+        Handler.statuses = [503, 502]
+        before = self.counts()
+        response = httpclient.get(self.url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        after = self.counts()
+        self.assertEqual(after["retries"], before["retries"] + 2)
+        self.assertEqual(after["errors"], before["errors"])
+
+    def test_retries_run_out(self):
+        Handler.statuses = [500] * (httpclient._max_retries + 1)
+        before = self.counts()
+        response = httpclient.get(self.url, timeout=5)
+        # As with requests.get, the caller raises the error.
+        with self.assertRaises(requests.HTTPError):
+            response.raise_for_status()
+        self.assertEqual(self.counts()["errors"], before["errors"] + 1)
+
+    def test_no_retry_on_4xx(self):
+        Handler.statuses = [404]
+        before = self.counts()
+        response = httpclient.get(self.url, timeout=5)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.counts()["retries"], before["retries"])
+        self.assertEqual(self.counts()["errors"], before["errors"] + 1)
+
+    def test_connection_error(self):
+        # Nothing is listening on a port that was just closed.
+        closed = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        closed.server_close()
+        before = self.counts()
+        with self.assertRaises(requests.ConnectionError):
+            httpclient.get(f"http://127.0.0.1:{closed.server_port}/data", timeout=5)
+        self.assertEqual(self.counts()["errors"], before["errors"] + 1)
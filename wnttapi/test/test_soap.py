@@ -0,0 +1,113 @@
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+from app import metrics
+from app.datasource import soap
+
+_wsdl = """<?xml version="1.0" encoding="UTF-8"?>
+<definitions name="Echo" targetNamespace="urn:echo" xmlns:tns="urn:echo"
+    xmlns:soap="http://schemas.xmlsoap.org/wsdl/soap/" xmlns:xsd="http://www.w3.org/2001/XMLSchema"
+    xmlns="http://schemas.xmlsoap.org/wsdl/">
+  <message name="echoRequest"><part name="text" type="xsd:string"/></message>
+  <message name="echoResponse"><part name="result" type="xsd:string"/></message>
+  <portType name="EchoPort">
+    <operation name="echo"><input message="tns:echoRequest"/><output message="tns:echoResponse"/></operation>
+  </portType>
+  <binding name="EchoBinding" type="tns:EchoPort">
+    <soap:binding style="rpc" transport="http://schemas.xmlsoap.org/soap/http"/>
+    <operation name="echo">
+      <soap:operation soapAction="echo"/>
+      <input><soap:body use="literal" namespace="urn:echo"/></input>
+      <output><soap:body use="literal" namespace="urn:echo"/></output>
+    </operation>
+  </binding>
+  <service name="EchoService">
+    <port name="EchoPort" binding="tns:EchoBinding"><soap:address location="URL/soap"/></port>
+  </service>
+</definitions>
+"""
+
+_reply = b"""<?xml version="1.0" encoding="UTF-8"?>
+<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">
+<soap:Body><echoResponse xmlns="urn:echo"><result>ok</result></echoResponse></soap:Body>
+</soap:Envelope>"""
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    requests = []
+
+    def do_GET(self):
+        Handler.requests.append(("GET", self.headers.get("Authorization")))
+        self.respond(_wsdl.replace("URL", self.server.url).encode())
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        Handler.requests.append(("POST", self.headers.get("Authorization")))
+        self.respond(_reply)
+
+    def respond(self, body: bytes):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSoap(TestCase):
+    def setUp(self):
+        Handler.requests = []
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir)
+
+    def test_wsdl_cache(self):
+        url = f"{self.server.url}/wsdl"
+        cache = soap.make_wsdl_cache(self.cache_dir)
+        client = soap.build_client(url, "user", "pw", cache)
+        self.assertEqual(Handler.requests, [("GET", "Basic dXNlcjpwdw==")])
+        self.assertEqual(client.options.timeout, soap.TIMEOUT_SEC)
+        # The next one from the same cache shares the WSDL.
+        other = soap.build_client(url, "user", "pw", cache)
+        self.assertIs(other.wsdl, client.wsdl)
+        self.assertIsNot(other.options.transport, client.options.transport)
+        # The next one in a new process loads the WSDL from the cache directory.
+        client = soap.build_client(
+            url, "user", "pw", soap.make_wsdl_cache(self.cache_dir)
+        )
+        self.assertEqual(len(Handler.requests), 1)
+        self.assertEqual(client.service.echo("hi"), _reply)
+        # The credentials aren't saved in the cache.
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), "rb") as f:
+                self.assertNotIn(b"pw", f.read())
+
+    def test_keep_alive(self):
+        requests = metrics.get("soap.requests")
+        connections = metrics.get("soap.connections")
+        cache = soap.make_wsdl_cache(self.cache_dir)
+        client = soap.build_client(f"{self.server.url}/wsdl", None, None, cache)
+        for _ in range(3):
+            self.assertEqual(client.service.echo("hi"), _reply)
+        self.assertEqual(Handler.requests[1:], [("POST", None)] * 3)
+        # The calls go over the connection that fetched the WSDL.
+        self.assertEqual(metrics.get("soap.requests"), requests + 4)
+        self.assertEqual(metrics.get("soap.connections"), connections + 1)
@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import app.station as stn
+import app.tzutil as tz
+from app import util
+
+
+def station_json(time_zone: str) -> dict:
+    return {
+        "welinwq": {
+            "weatherStationId": "wellfmet",
+            "noaaStationId": "8419317",
+            "navd88ToMllwConversion": 5.14,
+            "timeZone": time_zone,
+            "weatherLocation": {"lat": 43.32, "lng": -70.56},
+        }
+    }
+
+
+class TestStation(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmpdir.name, "stations.json")
+        self.write(station_json("US/Eastern"), mtime_ns=1_000_000_000)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write(self, data: dict, mtime_ns: int):
+        with open(self.filepath, "w") as f:
+            json.dump(data, f)
+        os.utime(self.filepath, ns=(mtime_ns, mtime_ns))
+
+    def test_registry(self):
+        station = stn.get_station("welinwq", self.tmpdir.name)
+        self.assertEqual(station.time_zone, tz.eastern)
+        self.assertEqual(station.mllw_conversion, 5.14)
+        # Stations are built once, not per call.
+        self.assertIs(stn.get_station("welinwq", self.tmpdir.name), station)
+        self.assertIs(
+            stn.get_station_with_weather_id("wellfmet", self.tmpdir.name), station
+        )
+        with self.assertRaises(util.InternalError):
+            stn.get_station("nosuchwq", self.tmpdir.name)
+        with self.assertRaises(AttributeError):
+            station.extra = 1
+
+    def test_reload_on_change(self):
+        station = stn.get_station("welinwq", self.tmpdir.name)
+        self.write(station_json("US/Pacific"), mtime_ns=2_000_000_000)
+        reloaded = stn.get_station("welinwq", self.tmpdir.name)
+        self.assertIsNot(reloaded, station)
+        self.assertEqual(reloaded.time_zone, tz.pacific)
@@ -1,4 +1,6 @@
 import os.path
+import shutil
+import tempfile
 from datetime import date, datetime, timedelta
 from unittest import TestCase
 
@@ -53,3 +55,87 @@ class TestSurge(TestCase):
         next_tide_dt = datetime(2026, 6, 30, 13, 31, tzinfo=tzone)
         surge_feet = swmp.find_nearest_surge_value(data, next_tide_dt)
         self.assertEqual(surge_feet, 0.4)
+
+    def test_snapshot(self):
+        # The snapshot gives the same values as the csv, for the hours around the timeline.
+        now = datetime(2026, 7, 3, 5, 10, tzinfo=tzone)
+        timeline = Timeline(now - timedelta(hours=30), now + timedelta(hours=48), now)
+        with tempfile.TemporaryDirectory() as dir_path:
+            filepath = shutil.copy(
+                f"{test_dir_path}/data/8419317-20260703-00.csv", dir_path
+            )
+            expected = {
+                dt: val
+                for dt, val in surge.parse_surge_file(timeline, filepath).items()
+                if dt <= timeline.end_dt + timedelta(hours=1)
+            }
+            self.assertIsNone(
+                surge.read_snapshot(surge.snapshot_path(filepath), timeline)
+            )
+
+            surge.write_snapshot(filepath)
+            self.assertEqual(
+                surge.read_snapshot(surge.snapshot_path(filepath), timeline), expected
+            )
+            data = surge.get_future_surge_data(
+                timeline, wells.noaa_station_id, None, dir_path
+            )
+            self.assertEqual(data["surges"], expected)
+            self.assertEqual((data["filedate"], data["cycle"]), ("20260703", 0))
+
+    def test_bad_snapshot(self):
+        # A snapshot that is empty or cut short, say by a full disk, is ignored and the csv is read instead.
+        now = datetime(2026, 7, 3, 5, 10, tzinfo=tzone)
+        timeline = Timeline(now - timedelta(hours=30), now + timedelta(hours=48), now)
+        # Reading the csv caches the station's surges for this timeline, so don't leave them for other tests.
+        surge.cache.delete(wells.noaa_station_id)
+        self.addCleanup(surge.cache.delete, wells.noaa_station_id)
+        with tempfile.TemporaryDirectory() as dir_path:
+            filepath = shutil.copy(
+                f"{test_dir_path}/data/8419317-20260703-00.csv", dir_path
+            )
+            path = surge.write_snapshot(filepath)
+            with open(path, "rb") as f:
+                contents = f.read()
+            for size in [0, 10, len(contents) - 1]:
+                with open(path, "wb") as f:
+                    f.write(contents[:size])
+                self.assertIsNone(surge.read_snapshot(path, timeline), size)
+                data = surge.get_future_surge_data(
+                    timeline, wells.noaa_station_id, None, dir_path
+                )
+                self.assertGreater(len(data["surges"]), 0)
+
+    def test_manifest(self):
+        with tempfile.TemporaryDirectory() as dir_path:
+            for name in ["8419317-20260702-12.csv", "8419317-20260703-00.csv"]:
+                shutil.copy(f"{test_dir_path}/data/{name}", dir_path)
+            scanned = surge.get_latest_file_info(wells.noaa_station_id, dir_path)
+            self.assertEqual(surge.get_manifest(dir_path), {})
+
+            surge.write_manifest(dir_path)
+            self.assertEqual(
+                surge.get_latest_file_info(wells.noaa_station_id, dir_path), scanned
+            )
+
+            # A new file isn't seen until the manifest is written again.
+            shutil.copy(
+                f"{dir_path}/8419317-20260703-00.csv",
+                f"{dir_path}/8419317-20260703-06.csv",
+            )
+            _, filedate, cycle, _ = surge.get_latest_file_info(
+                wells.noaa_station_id, dir_path
+            )
+            self.assertEqual((filedate, cycle), ("20260703", 0))
+            surge.write_manifest(dir_path)
+            _, filedate, cycle, _ = surge.get_latest_file_info(
+                wells.noaa_station_id, dir_path
+            )
+            self.assertEqual((filedate, cycle), ("20260703", 6))
+
+            # If the manifest's file is gone, the directory is searched.
+            os.remove(f"{dir_path}/8419317-20260703-06.csv")
+            _, filedate, cycle, _ = surge.get_latest_file_info(
+                wells.noaa_station_id, dir_path
+            )
+            self.assertEqual((filedate, cycle), ("20260703", 0))
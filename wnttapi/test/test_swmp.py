@@ -0,0 +1,86 @@
+import os
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+from django import setup
+
+setup()
+
+import app.station as stn
+from app import swmp
+from app.hilo import Hilo, PredictedHighOrLow
+
+cur_path = os.path.dirname(os.path.abspath(__file__))
+station = stn.get_station("welinwq", f"{cur_path}/../../datamount/stations")
+wind_fields = ["wind_speed", "wind_gust", "wind_dir_deg", "wind_time"]
+tide_fields = ["tide", "tide_time", "temp", "tide_dir"]
+
+
+def get_winds(station, timeline):
+    return {timeline.end_dt: SimpleNamespace(speed_mph=5, gust_mph=9, direction_deg=90)}
+
+
+def slow_winds(station, timeline):
+    time.sleep(1)
+    return get_winds(station, timeline)
+
+
+def get_water(station, timeline):
+    return {
+        timeline.end_dt
+        - timedelta(minutes=15): SimpleNamespace(corrected_mllw_feet=3.0, temp_f=50),
+        timeline.end_dt: SimpleNamespace(corrected_mllw_feet=3.5, temp_f=51),
+    }
+
+
+def broken_water(station, timeline):
+    raise ValueError("bad data")
+
+
+def get_astro(noaa_id, timeline, navd88_func, ignore_cache):
+    real_dt = timeline.start_dt + timedelta(hours=3)
+    return {real_dt: PredictedHighOrLow(9.5, Hilo.HIGH, real_dt)}
+
+
+def get_moon(time_zone):
+    return {"current": "Full", "currentdt": None, "nextphase": "New", "nextdt": None}
+
+
+def get_surge(timeline, noaa_id, navd88_func):
+    return {"surges": {}, "file_creation_dt": None}
+
+
+@patch.object(swmp, "_deadline_seconds", 0.3)
+@patch.object(swmp.surge, "get_future_surge_data", get_surge)
+@patch.object(swmp.syzygy, "get_current_moon_phases", get_moon)
+@patch.object(swmp.astrotide, "get_hilo_astro_tides", get_astro)
+class TestSwmp(TestCase):
+    @patch.object(swmp.cdmo, "get_wind_data", get_winds)
+    @patch.object(swmp.cdmo, "get_water_data", get_water)
+    def test_complete(self):
+        data, complete = swmp.build_latest_conditions(station)
+        self.assertTrue(complete)
+        self.assertEqual(list(data), swmp._fields)
+        self.assertEqual(data["wind_speed"], 5)
+        self.assertEqual(data["tide"], 3.5)
+        self.assertEqual(data["tide_dir"], "rising")
+        self.assertEqual(data["next_high_tide"], 9.5)
+        self.assertEqual(data["phase"], "Full")
+
+    @patch.object(swmp.cdmo, "get_wind_data", slow_winds)
+    @patch.object(swmp.cdmo, "get_water_data", broken_water)
+    def test_slow_and_failed(self):
+        """A source that's too slow or fails leaves its fields null, and the rest are still there."""
+        start = time.monotonic()
+        data, complete = swmp.build_latest_conditions(station)
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertFalse(complete)
+        self.assertEqual(list(data), swmp._fields)
+        for name in wind_fields + tide_fields:
+            self.assertIsNone(data[name], name)
+        self.assertEqual(data["next_high_tide"], 9.5)
+        self.assertEqual(data["phase"], "Full")
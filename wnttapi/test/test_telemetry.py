@@ -0,0 +1,162 @@
+import os
+import queue
+import tempfile
+import time
+from datetime import date
+from unittest import TestCase
+from unittest.mock import patch
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+from django.db import OperationalError, connection
+
+from app import metrics, telemetry
+from app.models import Request, User
+
+
+def make_event(uid: str, **fields) -> dict:
+    return {"uid": uid, "when": 1767225600, "type": "S", "version": "1.2.3"} | fields
+
+
+class TestTelemetry(TestCase):
+    def test_build_event(self):
+        event = telemetry.build_event(
+            Request.Type.GRAPH, "abc", "1.2.3", 800, "welinwq",
+            date(2026, 1, 3), date(2026, 1, 9), True, 3.5,
+        )  # fmt: skip
+        self.assertEqual(event["type"], "G")
+        self.assertEqual(event["station"], "WE")
+        self.assertEqual(event["start"], "2026-01-03")
+        self.assertEqual(event["days"], 7)
+        self.assertIsInstance(event["when"], int)
+
+        event = telemetry.build_event(
+            Request.Type.STATION, "abc", "1.2.3", 800, None, None, None, None, None
+        )
+        self.assertEqual(event["type"], "S")
+        self.assertNotIn("station", event)
+
+    def test_build_event_bad_numbers(self):
+        # Query string values come through as they were sent.
+        event = telemetry.build_event(
+            Request.Type.GRAPH, "abc", "1.2.3", "undefined", "welinwq",
+            date(2026, 1, 3), date(2026, 1, 9), True, "nan",
+        )  # fmt: skip
+        self.assertIsNone(event["screenWidth"])
+        self.assertIsNone(event["customNav"])
+        event = telemetry.build_event(
+            Request.Type.GRAPH, "abc", "1.2.3", "800", "welinwq",
+            date(2026, 1, 3), date(2026, 1, 9), True, "3.5",
+        )  # fmt: skip
+        self.assertEqual(event["screenWidth"], 800)
+        self.assertEqual(event["customNav"], 3.5)
+
+    def test_spill(self):
+        events = [{"uid": "abc", "when": n} for n in range(3)]
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, "spill.jsonl")
+            telemetry.spill(events[:2], path)
+            # A partly written line is skipped.
+            with open(path, "a") as f:
+                f.write('{"uid": "ab\n')
+            telemetry.spill(events[2:], path)
+            self.assertEqual(telemetry.read_spill(path), events)
+
+    def test_spill_full(self):
+        dropped = metrics.get("telemetry.dropped")
+        with tempfile.TemporaryDirectory() as dir:
+            path = os.path.join(dir, "spill.jsonl")
+            with open(path, "w") as f:
+                f.write("x" * telemetry._max_spill_bytes)
+            telemetry.spill([{"uid": "abc"}] * 2, path)
+            self.assertEqual(os.path.getsize(path), telemetry._max_spill_bytes)
+        self.assertEqual(metrics.get("telemetry.dropped"), dropped + 2)
+
+    @patch.object(telemetry, "_flush_seconds", 0.05)
+    def test_next_batch(self):
+        events = queue.Queue()
+        for n in range(telemetry._batch_size + 5):
+            events.put(n)
+        self.assertEqual(
+            telemetry.next_batch(events), list(range(telemetry._batch_size))
+        )
+        self.assertEqual(len(telemetry.next_batch(events)), 5)
+
+
+class TestTelemetryWrites(TestCase):
+    """Writes to a new database, with the migrations applied, rather than the dev one."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        connection.creation.destroy_test_db(cls.old_name, verbosity=0)
+
+    def setUp(self):
+        Request.objects.all().delete()
+        User.objects.all().delete()
+        telemetry._user_ids.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.spill_path = os.path.join(self.dir.name, "spill.jsonl")
+        patcher = patch.object(
+            telemetry, "get_spill_path", return_value=self.spill_path
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.dir.cleanup)
+
+    def test_write(self):
+        batch = [make_event(f"u{n % 2}", screenWidth=800) for n in range(5)]
+        written = metrics.get("telemetry.written")
+        self.assertTrue(telemetry.write_or_spill(batch))
+        self.assertEqual(Request.objects.count(), 5)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(metrics.get("telemetry.written"), written + 5)
+
+    def test_bad_event(self):
+        # An event spilled by an older version may still have a value that can't be written.
+        batch = [make_event("abc", screenWidth=800) for _ in range(5)]
+        batch.insert(2, make_event("abc", screenWidth="undefined"))
+        dropped = metrics.get("telemetry.dropped")
+        self.assertTrue(telemetry.write_or_spill(batch))
+        self.assertEqual(Request.objects.count(), 5)
+        self.assertEqual(metrics.get("telemetry.dropped"), dropped + 1)
+
+    def test_locked(self):
+        batch = [make_event("abc", screenWidth=800) for _ in range(3)]
+        with patch.object(
+            telemetry, "write_events", side_effect=OperationalError("locked")
+        ):
+            self.assertFalse(telemetry.write_or_spill(batch))
+        self.assertEqual(telemetry.read_spill(self.spill_path), batch)
+        self.assertEqual(Request.objects.count(), 0)
+
+    def test_replay_spill(self):
+        batch = [make_event("abc", screenWidth=800) for _ in range(3)]
+        telemetry.spill(batch, self.spill_path)
+        replayed = metrics.get("telemetry.replayed")
+        telemetry.replay_spill()
+        self.assertEqual(Request.objects.count(), 3)
+        self.assertFalse(os.path.exists(self.spill_path))
+        self.assertEqual(metrics.get("telemetry.replayed"), replayed + 3)
+        # There's nothing to replay now.
+        telemetry.replay_spill()
+        self.assertEqual(Request.objects.count(), 3)
+
+    @patch.object(telemetry, "_flush_seconds", 0.05)
+    def test_writer(self):
+        for _ in range(3):
+            telemetry.record_request(Request.Type.STATION, "abc", "1.2.3", "800")
+        # The writer thread writes them once no more come for _flush_seconds.
+        deadline = time.monotonic() + 5
+        while Request.objects.count() < 3 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(Request.objects.count(), 3)
+        self.assertEqual(
+            list(Request.objects.values_list("screenWidth", flat=True)), [800] * 3
+        )
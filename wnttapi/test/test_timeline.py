@@ -1,4 +1,4 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from unittest import TestCase
 
 import app.graph_plot as gp
@@ -72,6 +72,59 @@ class TestGraphTimeline(TestCase):
                 bad_time_count += 1
         self.assertEqual(bad_time_count, 0)
 
+    def test_matches_utc_steps(self):
+        # Every time is 15 minutes after the previous one in real time, including the repeated hour at the
+        # end of DST, where the second pass must have fold=1.
+        for zone in (tz.eastern, tz.pacific, tz.hawaii):
+            timeline = GraphTimeline(date(2024, 3, 1), date(2024, 12, 31), zone)
+            times = timeline.requested_times
+            start_utc = times[0].astimezone(tz.utc)
+            for i, dt in enumerate(times):
+                self.assertEqual(
+                    dt.astimezone(tz.utc), start_utc + timedelta(minutes=15 * i)
+                )
+                self.assertEqual(dt, dt.astimezone(tz.utc).astimezone(zone))
+            folds = [dt for dt in times if dt.fold == 1]
+            self.assertEqual(len(folds), 0 if zone == tz.hawaii else 4)
+
+    def test_padding(self):
+        # End padding steps from the end time, which needn't be a whole number of steps from the start.
+        zone = tz.eastern
+        start_dt = datetime(2024, 11, 2, 20, 0, tzinfo=zone)
+        end_dt = datetime(2024, 11, 3, 0, 59, tzinfo=zone)
+        timeline = Timeline(start_dt, end_dt, now=datetime(2024, 11, 4, tzinfo=zone))
+        self.assertEqual(timeline.get_min(True), start_dt - timedelta(hours=2))
+        padded_max = timeline.get_max(True)
+        self.assertEqual((padded_max.hour, padded_max.minute), (1, 59))
+        self.assertEqual(padded_max.fold, 1)  # 2 hours after 00:59 EDT
+        past = timeline.get_all_past(True)
+        self.assertEqual(len(past), timeline.length_requested() + 16)
+        self.assertEqual(past[-1], padded_max)
+
+    def test_past_index(self):
+        zone = tz.eastern
+        timeline = GraphTimeline(
+            date(2024, 11, 2),
+            date(2024, 11, 3),
+            zone,
+            now=datetime(2024, 11, 3, 12, 5, tzinfo=zone),
+        )
+        for padded in (True, False):
+            past = timeline.get_all_past(padded)
+            index = timeline.get_past_index(padded)
+            self.assertEqual(len(index), len(past))
+            self.assertEqual(index.first(), past[0])
+            self.assertEqual(index.last(), past[-1])
+            self.assertTrue(all(dt in index for dt in past))
+        self.assertFalse(datetime(2024, 11, 3, 12, 15, tzinfo=zone) in index)
+        self.assertFalse(datetime(2024, 11, 2, 5, 10, tzinfo=zone) in index)
+
+        # Both passes through the repeated hour, in order.
+        start = datetime(2024, 11, 3, 0, 30, tzinfo=zone)
+        times = index.between(start.timestamp(), start.timestamp() + 3 * 3600)
+        self.assertEqual(len(times), 13)
+        self.assertEqual([dt.fold for dt in times].count(1), 4)
+
     def test_identifies_past_dts(self):
         zone = tz.eastern
         start_date = date(2025, 7, 15)
@@ -187,12 +240,10 @@ class TestHiloTimeline(TestCase):
             [past_hilo_time_1, past_hilo_time_2, later_hilo_time_1, later_hilo_time_2]
         )
 
-        wind_speed_plot, wind_gust_plot, wind_dir_plot = gp.build_wind_plots(
-            timeline, winds, hilo_dict
-        )
-        self.assertEqual(wind_speed_plot, [None, 12, None, None, None, None])
-        self.assertEqual(wind_gust_plot, [None, 15.5, None, None, None, None])
-        self.assertEqual(wind_dir_plot, [None, 325, None, None, None, None])
+        plots = gp.build_plots(timeline, hilo_dict, winds=winds)
+        self.assertEqual(plots["wind-speeds"], [None, 12, None, None, None, None])
+        self.assertEqual(plots["wind-gusts"], [None, 15.5, None, None, None, None])
+        self.assertEqual(plots["wind-dir"], [None, 325, None, None, None, None])
 
     def test_hilo_plot_with_boundary_data(self):
         zone = tz.hawaii
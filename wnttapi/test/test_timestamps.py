@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+from unittest import TestCase
+from zoneinfo import ZoneInfo
+
+import app.tzutil as tz
+from app import timestamps
+
+
+def as_tuple(dt: datetime) -> tuple:
+    # Aware datetimes in the same zone compare by wall clock, so check the offset and fold too.
+    return dt, dt.utcoffset(), dt.fold, dt.tzinfo
+
+
+class TestTimestamps(TestCase):
+    def test_same_as_strptime(self):
+        # Every 15 minutes across both DST changes of 2024, in zones with and without DST, and one with a
+        # half hour offset.
+        zones = [tz.eastern, tz.pacific, tz.hawaii, ZoneInfo("America/St_Johns")]
+        layouts = [
+            timestamps.CDMO,
+            timestamps.NOAA,
+            timestamps.OPEN_METEO,
+            timestamps.SURGE,
+        ]
+        for start in [datetime(2024, 3, 9), datetime(2024, 11, 2)]:
+            naive_times = [start + timedelta(minutes=15 * i) for i in range(4 * 48)]
+            for layout in layouts:
+                strings = [dt.strftime(layout.format) for dt in naive_times]
+                for zone in zones:
+                    utc_parse = timestamps.utc_parser(layout, zone)
+                    local_parse = timestamps.local_parser(layout, zone)
+                    for s in strings:
+                        expected = datetime.strptime(s, layout.format)
+                        self.assertEqual(
+                            as_tuple(utc_parse(s)),
+                            as_tuple(expected.replace(tzinfo=tz.utc).astimezone(zone)),
+                        )
+                        self.assertEqual(
+                            as_tuple(local_parse(s)),
+                            as_tuple(expected.replace(tzinfo=zone)),
+                        )
+
+    def test_repeated_hour(self):
+        parse = timestamps.utc_parser(timestamps.CDMO, tz.eastern)
+        first = parse("11/03/2024 05:30")
+        second = parse("11/03/2024 06:30")
+        self.assertEqual((first.hour, first.fold), (1, 0))
+        self.assertEqual((second.hour, second.fold), (1, 1))
+        self.assertEqual(tz.to_epoch(second) - tz.to_epoch(first), 3600)
+
+    def test_not_in_layout(self):
+        parse = timestamps.utc_parser(timestamps.CDMO, tz.eastern)
+        # Not zero padded, which strptime allows.
+        self.assertEqual(
+            parse("1/2/2025 3:04"), datetime(2025, 1, 1, 22, 4, tzinfo=tz.eastern)
+        )
+        for bad in ["", "13/01/2025 00:00", "01/01/2025 00:60", "2025-01-01 00:00"]:
+            with self.assertRaises(ValueError):
+                parse(bad)
+        with self.assertRaises(TypeError):
+            parse(None)
@@ -20,3 +20,16 @@ class TestTzUtil(TestCase):
         self.assertTrue(
             tz.isDst(datetime.combine(fall_date, time(), tzinfo=tz.central))
         )
+
+    def test_epoch(self):
+        dt = datetime(2024, 1, 1, 5, 30, tzinfo=tz.utc)
+        self.assertEqual(tz.to_epoch(dt), 1704087000)
+        self.assertEqual(tz.from_epoch(1704087000, tz.eastern), dt)
+        self.assertEqual(tz.from_epoch(1704087000, tz.eastern).hour, 0)
+
+        # The repeated hour when DST ends.
+        first = datetime(2024, 11, 3, 1, 30, tzinfo=tz.eastern)
+        second = first.replace(fold=1)
+        self.assertEqual(tz.to_epoch(second) - tz.to_epoch(first), 3600)
+        self.assertEqual(tz.from_epoch(tz.to_epoch(first), tz.eastern).fold, 0)
+        self.assertEqual(tz.from_epoch(tz.to_epoch(second), tz.eastern).fold, 1)
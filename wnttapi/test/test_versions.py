@@ -0,0 +1,60 @@
+import os
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+from rest_framework.test import APIRequestFactory
+
+import app.tzutil as tz
+from app import versions, views
+
+factory = APIRequestFactory()
+
+
+class TestVersions(TestCase):
+    def test_make_etag(self):
+        etag = versions.make_etag("v1", "graph", 123, (20260213, 6))
+        self.assertRegex(etag, r'^"[0-9a-f]{32}"$')
+        self.assertEqual(etag, versions.make_etag("v1", "graph", 123, (20260213, 6)))
+        self.assertNotEqual(
+            etag, versions.make_etag("v1", "graph", 123, (20260213, 12))
+        )
+        self.assertNotEqual(
+            etag, versions.make_etag("v1", "graph", 123, (20260213, 6), None)
+        )
+
+    def test_quarter_stamp(self):
+        start = datetime(2026, 2, 13, 10, 0, tzinfo=tz.utc)
+        stamp = versions.quarter_stamp(start)
+        self.assertEqual(stamp, versions.quarter_stamp(start + timedelta(minutes=14)))
+        self.assertEqual(
+            stamp + 1, versions.quarter_stamp(start + timedelta(minutes=15))
+        )
+
+    def test_is_not_modified(self):
+        etag = versions.make_etag("x")
+        cases = [
+            (None, False),
+            (etag, True),
+            (f"W/{etag}", True),
+            (f'"other", {etag}', True),
+            ('"other"', False),
+            ("*", True),
+        ]
+        for header, expected in cases:
+            headers = {} if header is None else {"HTTP_IF_NONE_MATCH": header}
+            request = factory.get("/graph/", **headers)
+            self.assertEqual(views.is_not_modified(request, etag), expected, header)
+        # No ETag means the response can't be skipped.
+        request = factory.get("/graph/", HTTP_IF_NONE_MATCH="*")
+        self.assertFalse(views.is_not_modified(request, None))
+
+    def test_as_bool(self):
+        for value in [True, "true", "True", "1"]:
+            self.assertTrue(views.as_bool(value))
+        for value in [False, None, "false", "0", ""]:
+            self.assertFalse(views.as_bool(value))
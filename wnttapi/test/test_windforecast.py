@@ -1,11 +1,20 @@
 import json
 import os.path
 from datetime import date, datetime
+from types import SimpleNamespace
 from unittest import TestCase
+from unittest.mock import patch
+
+from django import setup
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings.dev")
+setup()
+
+from django.core.cache import cache
 
 import app.datasource.windforecast as wind
 import app.tzutil as tz
-from app import util
+from app import metrics, util
 from app.timeline import GraphTimeline
 
 cur_path = os.path.dirname(os.path.abspath(__file__))
@@ -43,3 +52,82 @@ class TestWindForecast(TestCase):
                 "dir": 302,
             },
         )
+
+    def test_to_hourly(self):
+        pred_json = {
+            "time": ["2026-02-02T00:00", "2026-02-02T00:15", "2026-02-02T00:30",
+                     "2026-02-02T00:45", "2026-02-02T01:00"],
+            "wind_speed_10m": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "wind_direction_10m": [10, 20, 30, 40, 50],
+        }  # fmt: skip
+        self.assertEqual(
+            wind.to_hourly(pred_json),
+            {
+                "time": ["2026-02-02T00:00", "2026-02-02T01:00"],
+                "wind_speed_10m": [1.0, 5.0],
+                "wind_direction_10m": [10, 50],
+            },
+        )
+
+
+class TestForecastCache(TestCase):
+    station = SimpleNamespace(id="test_forecast_cache")
+    old = {
+        "time": ["2026-02-02T00:00"],
+        "wind_speed_10m": [1.0],
+        "wind_direction_10m": [10],
+    }
+    new = {
+        "time": ["2026-02-02T00:00"],
+        "wind_speed_10m": [2.0],
+        "wind_direction_10m": [20],
+    }
+
+    def setUp(self):
+        cache.delete(wind.build_key(self.station))
+
+    def tearDown(self):
+        cache.delete(wind.build_key(self.station))
+
+    def cache_forecast(self, age: int):
+        fetched = tz.to_epoch(tz.now(tz.utc)) - age
+        cache.set(
+            wind.build_key(self.station), {"fetched": fetched, "forecast": self.old}
+        )
+
+    @patch.object(wind, "pull_data")
+    def test_miss_then_hit(self, pull_data):
+        pull_data.return_value = self.new
+        self.assertEqual(wind.get_forecast(self.station), self.new)
+        hits = metrics.get("wind_forecast.hit")
+        self.assertEqual(wind.get_forecast(self.station), self.new)
+        self.assertEqual(pull_data.call_count, 1)
+        self.assertEqual(metrics.get("wind_forecast.hit"), hits + 1)
+
+    @patch.object(wind, "pull_data")
+    def test_stale(self, pull_data):
+        pull_data.return_value = self.new
+        self.cache_forecast(wind._fresh_seconds + 60)
+        with patch.object(wind, "refresh_in_background") as refresh_in_background:
+            self.assertEqual(wind.get_forecast(self.station), self.old)
+            refresh_in_background.assert_called_once_with(self.station)
+        pull_data.assert_not_called()
+        # The background refresh replaces it.
+        wind.refresh_in_background(self.station).join()
+        self.assertEqual(wind.get_forecast(self.station), self.new)
+        self.assertEqual(pull_data.call_count, 1)
+
+    @patch.object(wind, "pull_data")
+    def test_too_old(self, pull_data):
+        pull_data.return_value = self.new
+        self.cache_forecast(wind._max_stale_seconds + 60)
+        self.assertEqual(wind.get_forecast(self.station), self.new)
+        self.assertEqual(pull_data.call_count, 1)
+
+    @patch.object(wind, "pull_data")
+    def test_failed_refresh(self, pull_data):
+        # pull_data returns {} when the request fails.
+        pull_data.return_value = {}
+        self.cache_forecast(wind._fresh_seconds + 60)
+        wind.refresh_in_background(self.station).join()
+        self.assertEqual(wind.get_forecast(self.station), self.old)
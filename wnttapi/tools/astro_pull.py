@@ -5,7 +5,7 @@ import argparse
 import logging
 import sys
 import os
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 # In the container, this is run from /wnttapi
 sys.path.append(".")
@@ -15,12 +15,15 @@ from django import setup
 
 setup()
 
+import app.station as stn
 import app.tzutil as tz
 from app.datasource import astrotide as astro
+from app.datasource.apiutil import APICall, run_parallel
 from app.hilo import Hilo
-from app.models import AstroTide15, AstroTideHilo
+from app.models import AstroTide15, AstroTideHilo, Refresh, get_station
 from app.station import get_station_with_noaa_id
 from app.timeline import Timeline
+from tools.tool_util import bulk_upsert, get_noaa_ids
 
 logger = logging.getLogger(__name__)
 
@@ -30,79 +33,177 @@ Inputs:
 --noaa_id <noaa_station_id> : e.g. "8419317" for Wells
 --start : start date YYYY-mm-dd
 --end: end date YYYY-mm-dd
---debug: if true, compares with database values only
+--all: instead of the above, pull all supported years for all stations
+--chunk-days: number of days per NOAA request
+--workers: number of NOAA requests to run at once
+--batch-size: number of records per database insert
 
 """
 
 # TODO: Add debug mode, to compare
 
+args = None
+
 
 def main():
+    global args
     nocontainer = os.environ.get("IN_CONTAINER", "-") != "1"
     parser = argparse.ArgumentParser(
         description="Pull predicted tides from NOAA tides&currents service and upserts them in the database"
     )
-    parser.add_argument("-n", "--noaa-id", help="NOAA station id", required=True)
-    parser.add_argument("-S", "--start", help="start date, YYY-YM-MDD", required=True)
-    parser.add_argument("-E", "--end", help="end date, YYYY-MM-DD", required=True)
+    parser.add_argument("-n", "--noaa-id", help="NOAA station id")
+    parser.add_argument("-S", "--start", help="start date, YYY-YM-MDD")
+    parser.add_argument("-E", "--end", help="end date, YYYY-MM-DD")
+    parser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Pull all supported years for all stations, instead of -n, -S and -E",
+    )
     parser.add_argument(
         "-t",
         "--type",
         choices=["15", "HL"],
         help="data type: 15=15-min, HL=Hi/low. Default=both",
     )
+    parser.add_argument(
+        "-c",
+        "--chunk-days",
+        type=int,
+        default=31,
+        help="Number of days per NOAA request. Default=31",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of NOAA requests to run at once. Default=4",
+    )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Number of records per database insert. Default=500",
+    )
 
     args = parser.parse_args()
 
-    swmp_station = get_station_with_noaa_id(args.noaa_id, nocontainer)
+    if args.all:
+        data_dir = "../datamount/stations" if nocontainer else "/data/stations"
+        years = stn.get_supported_years()
+        start_date, end_date = date(years[0], 1, 1), date(years[-1], 12, 31)
+        for noaa_id in get_noaa_ids(data_dir):
+            pull(noaa_id, start_date, end_date, nocontainer)
+    elif args.noaa_id and args.start and args.end:
+        pull(
+            args.noaa_id,
+            datetime.strptime(args.start, "%Y-%m-%d").date(),
+            datetime.strptime(args.end, "%Y-%m-%d").date(),
+            nocontainer,
+        )
+    else:
+        parser.error(
+            "either --all, or all of --noaa-id, --start and --end, is required"
+        )
+
+
+def pull(noaa_id: str, start_date: date, end_date: date, nocontainer: bool):
+    swmp_station = get_station_with_noaa_id(noaa_id, nocontainer)
 
     # We are pulling a specific date range, not just getting latest data.
-    start_dt = tz.datetime_first(
-        datetime.strptime(args.start, "%Y-%m-%d").date(), swmp_station.time_zone
-    )
-    end_dt = tz.datetime_last(
-        datetime.strptime(args.end, "%Y-%m-%d").date(), swmp_station.time_zone
-    )
-    print(f"Processing {start_dt} to {end_dt} ...", file=sys.stderr)
-    timeline = Timeline(start_dt, end_dt)
+    start_dt = tz.datetime_first(start_date, swmp_station.time_zone)
+    end_dt = tz.datetime_last(end_date, swmp_station.time_zone)
+    print(f"Processing {noaa_id} {start_dt} to {end_dt} ...", file=sys.stderr)
+    timelines = build_chunks(start_date, end_date, swmp_station.time_zone)
 
     if args.type is None or args.type == "15":
-        upsert("15", args.noaa_id, timeline)
+        upsert("15", noaa_id, timelines)
     if args.type is None or args.type == "HL":
-        upsert("HL", args.noaa_id, timeline)
+        upsert("HL", noaa_id, timelines)
+
+    # Let the API know that any graphs it cached for this time range are out of date.
+    Refresh.objects.create(
+        station=get_station(swmp_station.id),
+        type=Refresh.Type.ASTRO,
+        start=start_dt,
+        end=end_dt,
+        when=tz.now(tz.utc),
+    )
+
+
+def build_chunks(start_date: date, end_date: date, time_zone) -> list:
+    """Split the date range into timelines of at most chunk_days days, one per NOAA request."""
+    timelines = []
+    chunk_start = start_date
+    while chunk_start <= end_date:
+        chunk_end = min(chunk_start + timedelta(days=args.chunk_days - 1), end_date)
+        timelines.append(
+            Timeline(
+                tz.datetime_first(chunk_start, time_zone),
+                tz.datetime_last(chunk_end, time_zone),
+            )
+        )
+        chunk_start = chunk_end + timedelta(days=1)
+    return timelines
 
 
 def unity(navd88_level):
     return navd88_level
 
 
-def upsert(type, noaa_id, timeline):
+def fetch(type: str, noaa_id: str, timelines: list) -> dict:
+    # Call NOAA for all the chunks, several at a time, and merge the results.
+    func = astro.get_15m_astro_tides if type == "15" else astro.get_hilo_astro_tides
+    calls = [
+        APICall(f"{type} {tl.start_date}", func, noaa_id, tl, unity, False)
+        for tl in timelines
+    ]
+    data = {}
+    for chunk in run_parallel(calls, max_workers=args.workers).values():
+        data.update(chunk)
+    return data
 
-    if type == "15":
-        data15 = astro.get_15m_astro_tides(noaa_id, timeline, unity, False)
 
-        for dt, level in data15.items():
-            utc_dt = dt.astimezone(tz.utc)
-            AstroTide15.objects.update_or_create(
-                noaa_id=noaa_id, time=utc_dt.isoformat(), nav_level=level
+def upsert(type, noaa_id, timelines):
+
+    if type == "15":
+        data15 = fetch("15", noaa_id, timelines)
+        rows = [
+            AstroTide15(
+                noaa_id=noaa_id,
+                time=tz.to_epoch(dt),
+                nav_level=level,
             )
-        print(f"Upserted {len(data15)} records")
+            for dt, level in data15.items()
+        ]
+        created, updated = bulk_upsert(
+            AstroTide15, rows, "noaa_id", noaa_id, ["nav_level"], args.batch_size
+        )
     elif type == "HL":
-        dataHilo = astro.get_hilo_astro_tides(noaa_id, timeline, unity, False)
-
-        for dt, pred_hilo in dataHilo.items():
-            utc_dt = dt.astimezone(tz.utc)
-            utc_real_dt = pred_hilo.real_dt.astimezone(tz.utc)
-            AstroTideHilo.objects.update_or_create(
+        dataHilo = fetch("HL", noaa_id, timelines)
+        rows = [
+            AstroTideHilo(
                 noaa_id=noaa_id,
-                time=utc_dt.isoformat(),
-                real_time=utc_real_dt.isoformat(),
+                time=tz.to_epoch(dt),
+                real_time=tz.to_epoch(pred_hilo.real_dt),
                 hilo="H" if pred_hilo.hilo == Hilo.HIGH else "L",
                 nav_level=pred_hilo.value,
             )
-        print(f"Upserted {len(dataHilo)} records")
+            for dt, pred_hilo in dataHilo.items()
+        ]
+        created, updated = bulk_upsert(
+            AstroTideHilo,
+            rows,
+            "noaa_id",
+            noaa_id,
+            ["real_time", "hilo", "nav_level"],
+            args.batch_size,
+        )
     else:
         raise Exception(f"bad type: {type}")
+    print(f"Upserted {len(rows)} records: {created} created, {updated} updated")
 
 
 if __name__ == "__main__":
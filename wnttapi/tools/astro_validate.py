@@ -0,0 +1,151 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+import numpy as np
+
+import app.tzutil as tz
+from app.datasource import harmonic
+from app.hilo import Hilo
+from app.models import AstroTide15, AstroTideHilo
+from app.station import get_station_with_noaa_id
+
+"""
+Compare the local tide predictions from a station's harmonic constituents with NOAA's predictions stored by
+astro_pull.py, and time how long they take. Exits with status 1 if any prediction is off by more than the
+tolerance, so it can gate turning on LOCAL_ASTRO for the station.
+
+The default tolerances are 0.05 ft for every 15-minute level and high or low, and 3 minutes for the time of
+every high or low. NOAA computes its predictions from the same constituents, so the differences come from
+rounding, from how the node factors are computed, and from NOAA having predicted past years with the
+constituents it had then. For Seattle's 2015 highs and lows (test/data), the worst is 0.05 ft and 2 minutes.
+
+Inputs:
+--noaa_id <noaa_station_id> : e.g. "8419317" for Wells
+--start : start date YYYY-mm-dd
+--end: end date YYYY-mm-dd
+--feet: tolerance for levels, in feet
+--minutes: tolerance for the times of highs and lows, in minutes
+"""
+
+
+def main():
+    nocontainer = os.environ.get("IN_CONTAINER", "-") != "1"
+    parser = argparse.ArgumentParser(
+        description="Compare local tide predictions with NOAA's stored predictions"
+    )
+    parser.add_argument("-n", "--noaa-id", required=True, help="NOAA station id")
+    parser.add_argument("-S", "--start", required=True, help="start date, YYYY-MM-DD")
+    parser.add_argument("-E", "--end", required=True, help="end date, YYYY-MM-DD")
+    parser.add_argument(
+        "-f", "--feet", type=float, default=0.05, help="Level tolerance. Default=0.05"
+    )
+    parser.add_argument(
+        "-m", "--minutes", type=float, default=3, help="Time tolerance. Default=3"
+    )
+    args = parser.parse_args()
+
+    station = get_station_with_noaa_id(args.noaa_id, nocontainer)
+    start = tz.to_epoch(
+        tz.datetime_first(
+            datetime.strptime(args.start, "%Y-%m-%d").date(), station.time_zone
+        )
+    )
+    end = tz.to_epoch(
+        tz.datetime_last(
+            datetime.strptime(args.end, "%Y-%m-%d").date(), station.time_zone
+        )
+    )
+    data_dir = "../datamount/stations" if nocontainer else "/data/stations"
+    harmonics = harmonic.load_harmonics(args.noaa_id, data_dir)
+
+    ok = compare_15m(harmonics, start, end, args.feet)
+    ok = compare_hilos(harmonics, start, end, args.feet, args.minutes) and ok
+    print("PASS" if ok else "FAIL")
+    sys.exit(0 if ok else 1)
+
+
+def compare_15m(
+    harmonics: harmonic.Harmonics, start: int, end: int, feet: float
+) -> bool:
+    rows = list(
+        AstroTide15.objects.filter(noaa_id=harmonics.noaa_id, time__range=(start, end))
+        .order_by("time")
+        .values_list("time", "nav_level")
+    )
+    if len(rows) == 0:
+        print("No stored 15-minute predictions")
+        return False
+    epochs = np.array([row[0] for row in rows])
+    stored = np.array([row[1] for row in rows])
+    begin = time.perf_counter()
+    predicted = harmonic.predict(harmonics, epochs)
+    elapsed = time.perf_counter() - begin
+    errors = np.abs(predicted - stored)
+    worst = int(np.argmax(errors))
+    print(
+        f"15-minute: {len(rows)} levels in {elapsed * 1000:.2f} ms, "
+        f"max error {errors[worst]:.3f} ft at {tz.from_epoch(int(epochs[worst]), tz.utc)}, "
+        f"RMS {np.sqrt(np.mean(errors**2)):.3f} ft, "
+        f"{np.count_nonzero(errors > feet)} over {feet} ft"
+    )
+    return bool(errors[worst] <= feet)
+
+
+def compare_hilos(
+    harmonics: harmonic.Harmonics, start: int, end: int, feet: float, minutes: float
+) -> bool:
+    rows = list(
+        AstroTideHilo.objects.filter(
+            noaa_id=harmonics.noaa_id, real_time__range=(start, end)
+        )
+        .order_by("real_time")
+        .values_list("real_time", "nav_level", "hilo")
+    )
+    if len(rows) == 0:
+        print("No stored highs and lows")
+        return False
+    begin = time.perf_counter()
+    predicted = harmonic.predict_hilos(harmonics, start, end)
+    elapsed = time.perf_counter() - begin
+    print(
+        f"Highs and lows: {len(predicted)} predicted in {elapsed * 1000:.2f} ms, "
+        f"{len(rows)} stored"
+    )
+    ok = len(predicted) == len(rows)
+    max_minutes, max_feet = 0, 0
+    for real_time, nav_level, hilo in rows:
+        same_kind = [p for p in predicted if (p[2] == Hilo.HIGH) == (hilo == "H")]
+        if len(same_kind) == 0:
+            print(f"No predicted {hilo} for {tz.from_epoch(real_time, tz.utc)}")
+            ok = False
+            continue
+        epoch, level, _ = min(same_kind, key=lambda p: abs(p[0] - real_time))
+        off_minutes = abs(epoch - real_time) / 60
+        off_feet = abs(level - nav_level)
+        max_minutes, max_feet = max(max_minutes, off_minutes), max(max_feet, off_feet)
+        if off_minutes > minutes or off_feet > feet:
+            print(
+                f"{hilo} at {tz.from_epoch(real_time, tz.utc)} {nav_level:.3f} ft: "
+                f"predicted {tz.from_epoch(epoch, tz.utc)} {level:.3f} ft"
+            )
+            ok = False
+    print(f"Highs and lows: max error {max_minutes:.0f} min, {max_feet:.3f} ft")
+    return ok
+
+
+if __name__ == "__main__":
+    main()
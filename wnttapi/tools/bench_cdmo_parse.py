@@ -0,0 +1,142 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ElTree
+from datetime import date, datetime, timedelta
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+import app.tzutil as tz
+from app.datasource import cdmo
+from app.station import Station
+from app.timeline import GraphTimeline
+
+"""
+Micro-benchmark of parsing CDMO water level xml, to show that the cost per reading and the memory used to
+scan the xml don't grow with the size of the payload. For each number of days, builds a payload of made-up
+readings every 15 minutes and times cdmo.parse_cdmo_tides_xml on it. For comparison, also times the timeline
+membership test as it used to be done, against a list, and shows the peak memory of scanning the readings
+against building the whole tree, as it used to be done. No network or database access.
+
+Inputs:
+--days: comma-separated numbers of days of readings
+--repeat: number of times to run each parse
+"""
+
+_end_date = date(2025, 12, 6)
+_station = Station(
+    id="welinwq",
+    weather_station_id="wellfmet",
+    noaa_station_id="8419317",
+    navd88_to_mllw=5.14,
+    time_zone=tz.eastern,
+    weather_location_latitude=43.32,
+    weather_location_longitude=-70.56,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time CDMO xml parsing for payloads of increasing size"
+    )
+    parser.add_argument(
+        "-d",
+        "--days",
+        default="1,2,5,10,20,40",
+        help="Comma-separated days of readings. Default=1,2,5,10,20,40",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Runs of each parse. Default=5"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'days':>5}{'readings':>10}{'parse ms':>10}{'us/reading':>12}{'list in us/reading':>20}"
+        + f"{'scan peak KB':>14}{'tree peak KB':>14}"
+    )
+    for days in [int(d) for d in args.days.split(",")]:
+        timeline = GraphTimeline(
+            _end_date - timedelta(days=days - 1),
+            _end_date,
+            tz.eastern,
+            now=tz.datetime_first(_end_date + timedelta(days=2), tz.eastern),
+        )
+        # Like the suds retxml payload.
+        xml = build_xml(timeline).encode()
+        parse_secs = best_of(
+            args.repeat, lambda: cdmo.parse_cdmo_tides_xml(timeline, _station, xml)
+        )
+        readings = len(cdmo.parse_cdmo_tides_xml(timeline, _station, xml))
+
+        # The old way: a linear scan of the timeline list for every reading.
+        past_list = timeline.get_all_past(padded=True)
+        list_secs = best_of(
+            args.repeat, lambda: [dt in past_list for dt in reversed(past_list)]
+        )
+        scan_peak = peak_memory(
+            lambda: sum(1 for _ in cdmo.iter_cdmo_readings(xml, ("Level",)))
+        )
+        tree_peak = peak_memory(lambda: ElTree.fromstring(xml).findall(".//data"))
+        print(
+            f"{days:>5}{readings:>10}{parse_secs * 1e3:>10.2f}{parse_secs / readings * 1e6:>12.2f}"
+            + f"{list_secs / readings * 1e6:>20.2f}{scan_peak / 1024:>14.0f}{tree_peak / 1024:>14.0f}"
+        )
+
+
+def best_of(repeat: int, func: callable) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(func: callable) -> int:
+    """Peak bytes allocated while running func, not counting what was allocated before."""
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def build_xml(timeline: GraphTimeline) -> str:
+    """Build a payload like CDMO's, most recent reading first, covering the padded timeline."""
+    readings = []
+    utc_dt = timeline.get_max(True).astimezone(tz.utc)
+    first_utc_dt = timeline.get_min(True).astimezone(tz.utc)
+    count = 0
+    while utc_dt >= first_utc_dt:
+        count += 1
+        level = 1.5 * (count % 50) / 50
+        readings.append(
+            f'<data count="{count}"><DateTimeStamp>{stamp(utc_dt - timedelta(hours=5))}</DateTimeStamp>'
+            + f"<Level>{level:.2f}</Level><cLevel>{level + 0.03:.2f}</cLevel><Temp>6.0</Temp>"
+            + f"<utcStamp>{stamp(utc_dt)}</utcStamp></data>"
+        )
+        utc_dt -= timedelta(minutes=15)
+    return (
+        '<?xml version="1.0" encoding="utf-8"?><returnData>'
+        + "\n".join(readings)
+        + "</returnData>"
+    )
+
+
+def stamp(dt: datetime) -> str:
+    return dt.strftime("%m/%d/%Y %H:%M")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+import app.station as stn
+import app.tzutil as tz
+from app.datasource import astrotide as astro
+from app.datasource import cdmo
+from app.datasource.tides import Tide
+from app.datasource.winds import Wind
+from app.hilo import Hilo, PredictedHighOrLow
+from app.models import AstroTide15, AstroTideHilo, Water, get_station
+from app.models import Wind as WindDb
+from app.timeline import Timeline
+
+"""
+Micro-benchmark of the database read paths for water, wind and astro tides. For each one, times the current
+code against the way it used to read: iterating model instances, with an extra COUNT query. Reads only.
+
+Inputs:
+--swmp_station_id <swmp_station_id> : e.g. "welinwq"
+--start : start date YYYY-mm-dd
+--end: end date YYYY-mm-dd
+--repeat: number of times to run each read
+"""
+
+
+def main():
+    nocontainer = os.environ.get("IN_CONTAINER", "-") != "1"
+    parser = argparse.ArgumentParser(
+        description="Time the database read paths for graph data"
+    )
+    parser.add_argument(
+        "-s", "--swmp_station_id", required=True, help="SWMP station id"
+    )
+    parser.add_argument("-S", "--start", required=True, help="start date, YYYY-MM-DD")
+    parser.add_argument("-E", "--end", required=True, help="end date, YYYY-MM-DD")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Runs of each read. Default=5"
+    )
+    args = parser.parse_args()
+
+    station = (
+        stn.get_station(args.swmp_station_id, "../datamount/stations")
+        if nocontainer
+        else stn.get_station(args.swmp_station_id)
+    )
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date()
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date()
+    timeline = Timeline(
+        tz.datetime_first(start_date, station.time_zone),
+        tz.datetime_last(end_date, station.time_zone),
+    )
+    noaa_id = station.noaa_station_id
+
+    print(
+        f"{'read':<8}{'rows':>8}{'before us/row':>16}{'after us/row':>16}{'speedup':>10}"
+    )
+    compare(
+        "water",
+        args.repeat,
+        lambda: legacy_water(station, timeline),
+        lambda: cdmo.get_water_data(station, timeline),
+    )
+    compare(
+        "wind",
+        args.repeat,
+        lambda: legacy_wind(station, timeline),
+        lambda: cdmo.get_wind_data(station, timeline),
+    )
+    compare(
+        "astro15",
+        args.repeat,
+        lambda: legacy_astro15(noaa_id, timeline),
+        lambda: astro.get_15m_astro_tides(noaa_id, timeline, unity, True),
+    )
+    compare(
+        "hilo",
+        args.repeat,
+        lambda: legacy_hilo(noaa_id, timeline),
+        lambda: astro.get_hilo_astro_tides(noaa_id, timeline, unity, True),
+    )
+
+
+def compare(name: str, repeat: int, before: callable, after: callable):
+    before_secs, rows = best_of(repeat, before)
+    after_secs, after_rows = best_of(repeat, after)
+    if rows != after_rows:
+        print(f"{name}: row counts differ! before={rows} after={after_rows}")
+    if rows == 0:
+        print(f"{name:<8}{0:>8}  no data in range")
+        return
+    print(
+        f"{name:<8}{rows:>8}{before_secs / rows * 1e6:>16.2f}{after_secs / rows * 1e6:>16.2f}"
+        + f"{before_secs / after_secs:>9.1f}x"
+    )
+
+
+def best_of(repeat: int, func: callable) -> tuple:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(func())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def unity(navd88_level):
+    return navd88_level
+
+
+# The read loops as they were before values_list.
+
+
+def epoch_range(timeline: Timeline, use_padding: bool) -> tuple:
+    return (
+        tz.to_epoch(timeline.get_min(use_padding)),
+        tz.to_epoch(timeline.get_max(use_padding)),
+    )
+
+
+def legacy_water(station, timeline: Timeline) -> dict:
+    tides = {}
+    queryset = Water.objects.filter(
+        station=get_station(station.id), time__range=epoch_range(timeline, False)
+    ).order_by("time")
+    queryset.count()
+    for rec in queryset:
+        tides[tz.from_epoch(rec.time, timeline.time_zone)] = Tide(
+            temp_f=rec.temp_f,
+            corrected_nav_feet=rec.clevel_nf,
+            mllw_offset=station.mllw_conversion,
+        )
+    return tides
+
+
+def legacy_wind(station, timeline: Timeline) -> dict:
+    winds = {}
+    queryset = WindDb.objects.filter(
+        station=get_station(station.id), time__range=epoch_range(timeline, False)
+    ).order_by("time")
+    queryset.count()
+    for rec in queryset:
+        winds[tz.from_epoch(rec.time, timeline.time_zone)] = Wind(
+            speed_mph=rec.speed, gust_mph=rec.gust, direction_deg=rec.dir_deg
+        )
+    return winds
+
+
+def legacy_astro15(noaa_id: str, timeline: Timeline) -> dict:
+    preds = {}
+    queryset = AstroTide15.objects.filter(
+        noaa_id=noaa_id, time__range=epoch_range(timeline, False)
+    ).order_by("time")
+    queryset.count()
+    for rec in queryset:
+        dt_in_local = tz.from_epoch(rec.time, timeline.time_zone)
+        if timeline.contains(dt_in_local):
+            preds[dt_in_local] = unity(rec.nav_level)
+    return preds
+
+
+def legacy_hilo(noaa_id: str, timeline: Timeline) -> dict:
+    data = {}
+    queryset = AstroTideHilo.objects.filter(
+        noaa_id=noaa_id, time__range=epoch_range(timeline, True)
+    ).order_by("time")
+    for rec in queryset:
+        dt_in_local = tz.from_epoch(rec.time, timeline.time_zone)
+        if timeline.contains(dt_in_local):
+            data[dt_in_local] = PredictedHighOrLow(
+                unity(rec.nav_level),
+                Hilo.HIGH if rec.hilo == "H" else Hilo.LOW,
+                tz.from_epoch(rec.real_time, timeline.time_zone),
+            )
+    return data
+
+
+if __name__ == "__main__":
+    main()
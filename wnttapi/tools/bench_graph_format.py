@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import json
+import sys
+from datetime import datetime
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+from bench_graph_plot import best_of, blob, build_sources
+from rest_framework.utils.encoders import JSONEncoder
+
+from app import graph_format as gf
+
+"""
+Compare the size of the graph data in the ROWS and COMPACT formats, and the time to parse each the way a
+client would: json, then a datetime for every row of ROWS, or the rows rebuilt from COMPACT. Uses the same
+made-up data as bench_graph_plot, for graphs of increasing length. No network or database access.
+
+Inputs:
+--days: comma-separated numbers of days
+--repeat: number of times to run each parse
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the size and parse time of the graph data formats"
+    )
+    parser.add_argument(
+        "-d",
+        "--days",
+        default="1,7,14",
+        help="Comma-separated days of graph. Default=1,7,14",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=10, help="Runs of each parse. Default=10"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'days':>5}{'mode':>6}{'rows KB':>9}{'compact KB':>12}{'smaller':>9}"
+        + f"{'rows ms':>9}{'compact ms':>12}{'faster':>8}"
+    )
+    for days in [int(d) for d in args.days.split(",")]:
+        for hilo_mode in (False, True):
+            timeline, sources = build_sources(days, hilo_mode)
+            dimensions, rows = blob(timeline, sources)
+            data = {"dimensions": dimensions, "blob": rows}
+            rows_json = json.dumps(data, cls=JSONEncoder)
+            compact_json = json.dumps(
+                gf.encode(data, gf.COMPACT, timeline.start_dt), cls=JSONEncoder
+            )
+            rows_secs, _ = best_of(args.repeat, lambda: parse_rows(rows_json))
+            compact_secs, _ = best_of(
+                args.repeat, lambda: gf.expand(json.loads(compact_json))
+            )
+            print(
+                f"{days:>5}{'hilo' if hilo_mode else '15m':>6}{len(rows_json) / 1024:>9.1f}"
+                + f"{len(compact_json) / 1024:>12.1f}{len(rows_json) / len(compact_json):>8.1f}x"
+                + f"{rows_secs * 1e3:>9.2f}{compact_secs * 1e3:>12.2f}{rows_secs / compact_secs:>7.1f}x"
+            )
+
+
+def parse_rows(text: str) -> list:
+    return [
+        [datetime.fromisoformat(rec[0]).timestamp()] + rec[1:]
+        for rec in json.loads(text)["blob"]
+    ]
+
+
+if __name__ == "__main__":
+    main()
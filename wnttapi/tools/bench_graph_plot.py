@@ -0,0 +1,280 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+import app.graph_plot as gp
+import app.tzutil as tz
+from app.datasource.tides import Tide
+from app.datasource.winds import Wind
+from app.hilo import Hilo, ObservedHighOrLow, PredictedHighOrLow
+from app.timeline import GraphTimeline, HiloTimeline
+
+"""
+Micro-benchmark of building the graph plots and the blob, for graphs of increasing length. For each number of
+days, makes up dense data for every source, with "now" in the middle of the graph so there is both past and
+future data, and times gp.build_plots plus the blob against the way it used to be done: one pass over the
+timeline for each plot, then a blob row built by looking up every plot. Also checks that both give the same
+result. No network or database access.
+
+Inputs:
+--days: comma-separated numbers of days
+--repeat: number of times to run each build
+"""
+
+_start_date = date(2025, 12, 1)
+_time_zone = tz.eastern
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time building the graph plots for graphs of increasing length"
+    )
+    parser.add_argument(
+        "-d",
+        "--days",
+        default="1,7,14",
+        help="Comma-separated days of graph. Default=1,7,14",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=10, help="Runs of each build. Default=10"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'days':>5}{'mode':>6}{'rows':>7}{'before ms':>11}{'after ms':>10}{'speedup':>9}"
+    )
+    for days in [int(d) for d in args.days.split(",")]:
+        for hilo_mode in (False, True):
+            timeline, sources = build_sources(days, hilo_mode)
+            before_secs, before = best_of(
+                args.repeat, lambda: legacy_blob(timeline, sources)
+            )
+            after_secs, after = best_of(args.repeat, lambda: blob(timeline, sources))
+            if before != after:
+                print(f"{days} days, hilo={hilo_mode}: results differ!")
+            print(
+                f"{days:>5}{'hilo' if hilo_mode else '15m':>6}{len(after[1]):>7}{before_secs * 1e3:>11.2f}"
+                + f"{after_secs * 1e3:>10.2f}{before_secs / after_secs:>8.1f}x"
+            )
+
+
+def best_of(repeat: int, func: callable) -> tuple:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def build_sources(days: int, hilo_mode: bool) -> tuple:
+    """Make up data for every source over the timeline. Returns (timeline, sources)."""
+    end_date = _start_date + timedelta(days=days - 1)
+    start_dt = tz.datetime_first(_start_date, _time_zone)
+    end_dt = tz.datetime_first(end_date + timedelta(days=1), _time_zone)
+    now = start_dt + (end_dt - start_dt) / 2
+    timeline_class = HiloTimeline if hilo_mode else GraphTimeline
+    timeline = timeline_class(_start_date, end_date, _time_zone, now=now)
+
+    obs_tides, winds, preds, past_surge, forecast, future_surges = [
+        {} for _ in range(6)
+    ]
+    hilo_events, astro_hilos = {}, {}
+    for ndx, dt in enumerate(timeline.requested_times):
+        level = round(4 * ((ndx % 50) / 25 - 1), 2)
+        preds[dt] = level
+        if ndx % 25 == 12:
+            hilo = Hilo.HIGH if ndx % 50 == 12 else Hilo.LOW
+            astro_hilos[dt] = PredictedHighOrLow(level, hilo, dt + timedelta(minutes=4))
+            hilo_events[dt] = astro_hilos[dt]
+        if timeline.is_past(dt):
+            obs_tides[dt] = Tide(temp_f=40.0, corrected_nav_feet=level, mllw_offset=5.1)
+            winds[dt] = Wind(
+                speed_mph=ndx % 20, gust_mph=ndx % 30, direction_deg=ndx % 360
+            )
+            past_surge[dt] = 0.25
+            if dt in astro_hilos:
+                hilo_events[dt] = ObservedHighOrLow(level, astro_hilos[dt].hilo)
+        else:
+            if dt.minute == 0:
+                future_surges[dt] = 0.5
+                forecast[dt] = {"mph": ndx % 20, "dir": ndx % 360}
+
+    if hilo_mode:
+        timeline.register_hilo_times(list(hilo_events.keys()))
+    return timeline, (
+        obs_tides,
+        winds,
+        preds,
+        past_surge,
+        forecast,
+        future_surges,
+        hilo_events,
+        astro_hilos,
+    )
+
+
+def blob(timeline: GraphTimeline, sources: tuple) -> tuple:
+    (
+        obs_tides,
+        winds,
+        preds,
+        past_surge,
+        forecast,
+        future_surges,
+        hilo_events,
+        astro_hilos,
+    ) = sources
+    plots = gp.build_plots(
+        timeline,
+        hilo_events,
+        obs_tides=obs_tides,
+        winds=winds,
+        reg_preds_dict=preds,
+        past_surge_dict=past_surge,
+        forecast_dict=forecast,
+        future_surges_dict=future_surges,
+        astro_hilo_dict=astro_hilos,
+    )
+    columns = {k: v for k, v in plots.items() if v is not None}
+    return ["dt"] + list(columns), [
+        list(row) for row in zip(timeline.get_plot_times(), *columns.values())
+    ]
+
+
+# The plots as they were built before build_plots: one callback pass over the timeline for each. The
+# sources are all non-empty and the timeline is partly past, so the early returns for no data are left out.
+
+
+def none_if_empty(plots: tuple) -> tuple:
+    if all(x is None for x in plots[0]):
+        return (None,) * len(plots)
+    return plots
+
+
+def legacy_blob(timeline: GraphTimeline, sources: tuple) -> tuple:
+    (
+        obs_tides,
+        winds,
+        preds,
+        past_surge,
+        forecast,
+        future_surges,
+        hilo_events,
+        astro_hilos,
+    ) = sources
+    is_hilo = isinstance(timeline, HiloTimeline)
+
+    def label(event):
+        return "(HIGH)" if event.hilo == Hilo.HIGH else "(LOW)"
+
+    def obs_callback(dt):
+        tide = None
+        hilo_label = (
+            label(hilo_events[dt])
+            if dt in hilo_events and isinstance(hilo_events[dt], ObservedHighOrLow)
+            else None
+        )
+        if isinstance(timeline, HiloTimeline):
+            if hilo_label is not None:
+                return obs_tides[dt].corrected_mllw_feet, hilo_label
+        elif dt in obs_tides:
+            tide = obs_tides[dt].corrected_mllw_feet
+        return tide, hilo_label
+
+    minutes = [0, 15, 30, 45]
+    if not is_hilo:
+        days = (timeline.end_dt.date() - timeline.start_dt.date()).days
+        if days == 2:
+            minutes = [0, 30]
+        elif days > 2:
+            minutes = [0]
+
+    def wind_callback(dt):
+        if (
+            (not isinstance(timeline, HiloTimeline) or dt in hilo_events)
+            and dt.minute in minutes
+            and dt in winds
+        ):
+            rec = winds[dt]
+            return (rec.speed_mph, rec.gust_mph, rec.direction_deg)
+        return None, None, None
+
+    def astro_callback(dt):
+        if dt in hilo_events and isinstance(hilo_events[dt], PredictedHighOrLow):
+            return hilo_events[dt].value, (label(hilo_events[dt]),)
+        if isinstance(timeline, HiloTimeline) and dt not in hilo_events:
+            return None, None
+        return preds.get(dt, None), None
+
+    def past_surge_callback(dt):
+        if is_hilo and dt not in hilo_events:
+            return None
+        return past_surge.get(dt, None)
+
+    def future_callback(dt):
+        if timeline.is_past(dt) or (
+            isinstance(timeline, HiloTimeline) and dt not in astro_hilos
+        ):
+            return None, None
+        surge, surge_dt = None, dt
+        while surge is None and surge_dt >= dt - timedelta(minutes=45):
+            surge = future_surges.get(surge_dt, None)
+            surge_dt -= timedelta(minutes=15)
+        if surge is None:
+            return None, None
+        pred = astro_hilos[dt].value if dt in astro_hilos else preds.get(dt, None)
+        return round(surge, 2), round(surge + pred, 2)
+
+    def forecast_callback(dt):
+        if isinstance(timeline, HiloTimeline) and dt not in hilo_events:
+            return None, None
+        if dt in forecast:
+            return forecast[dt].get("mph"), forecast[dt].get("dir")
+        return None, None
+
+    obs, obs_labels = none_if_empty(timeline.build_plots(obs_callback))
+    speeds, gusts, dirs = none_if_empty(timeline.build_plots(wind_callback))
+    astro, astro_labels = none_if_empty(timeline.build_plots(astro_callback))
+    (surge_plot,) = none_if_empty((timeline.build_plots(past_surge_callback),))
+    future_surge, future_tide = none_if_empty(timeline.build_plots(future_callback))
+    forecast_speeds, forecast_dirs = none_if_empty(
+        timeline.build_plots(forecast_callback)
+    )
+
+    plots = {
+        "hist-tides": obs,
+        "astro-tides": astro,
+        "wind-speeds": speeds,
+        "wind-gusts": gusts,
+        "past-surge": surge_plot,
+        "forecast-wind-speeds": forecast_speeds,
+        "future-tide": future_tide,
+        "future-surge": future_surge,
+        "hist-tides-labels": obs_labels,
+        "wind-dir": dirs,
+        "astro-tides-labels": astro_labels,
+        "forecast-wind-dir": forecast_dirs,
+    }
+    dimensions = ["dt"] + [k for k in plots if plots[k] is not None]
+    rows = []
+    for ndx, dt in enumerate(timeline.get_plot_times()):
+        rows.append([dt] + [plots[k][ndx] for k in plots if plots[k] is not None])
+    return dimensions, rows
+
+
+if __name__ == "__main__":
+    main()
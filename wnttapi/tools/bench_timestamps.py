@@ -0,0 +1,93 @@
+#! /usr/bin/env python3
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+import app.tzutil as tz
+from app import timestamps
+
+"""
+Micro-benchmark of decoding the timestamps in each of the formats we ingest. For each one, makes up a string for
+every 15 minutes over a number of days, in the layout of that source, and times the timestamps parser against
+strptime plus astimezone or replace, as each datasource used to do it. Also checks that both give the same
+datetimes. No Django, network or database access.
+
+Inputs:
+--days: days of timestamps per format
+--repeat: number of times to run each decode
+"""
+
+# name: (layout, whether the source is in UTC, time zone of the results)
+_formats = {
+    "cdmo": (timestamps.CDMO, True, tz.eastern),
+    "noaa": (timestamps.NOAA, False, tz.eastern),
+    "surge": (timestamps.SURGE, True, tz.eastern),
+    "open-meteo": (timestamps.OPEN_METEO, False, tz.eastern),
+    "syzygy": (timestamps.NOAA, False, tz.utc),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time decoding timestamps for each ingested format"
+    )
+    parser.add_argument(
+        "-d", "--days", type=int, default=28, help="Days of timestamps. Default=28"
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=5, help="Runs of each decode. Default=5"
+    )
+    args = parser.parse_args()
+
+    start = datetime(2024, 10, 20)
+    naive_times = [start + timedelta(minutes=15 * i) for i in range(args.days * 96)]
+    print(f"{'format':<12}{'rows':>7}{'before us':>11}{'after us':>10}{'speedup':>9}")
+    for name, (layout, from_utc, time_zone) in _formats.items():
+        strings = [dt.strftime(layout.format) for dt in naive_times]
+        before_secs, before = best_of(
+            args.repeat, lambda: legacy_decode(strings, layout, from_utc, time_zone)
+        )
+        parse = (
+            timestamps.utc_parser(layout, time_zone)
+            if from_utc
+            else timestamps.local_parser(layout, time_zone)
+        )
+        after_secs, after = best_of(args.repeat, lambda: [parse(s) for s in strings])
+        if [(dt, dt.fold) for dt in before] != [(dt, dt.fold) for dt in after]:
+            print(f"{name}: results differ!")
+        rows = len(strings)
+        print(
+            f"{name:<12}{rows:>7}{before_secs / rows * 1e6:>11.2f}{after_secs / rows * 1e6:>10.2f}"
+            + f"{before_secs / after_secs:>8.1f}x"
+        )
+
+
+def best_of(repeat: int, func: callable) -> tuple:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def legacy_decode(strings: list, layout, from_utc: bool, time_zone) -> list:
+    if from_utc:
+        return [
+            datetime.strptime(s, layout.format)
+            .replace(tzinfo=tz.utc)
+            .astimezone(time_zone)
+            for s in strings
+        ]
+    return [
+        datetime.strptime(s, layout.format).replace(tzinfo=time_zone) for s in strings
+    ]
+
+
+if __name__ == "__main__":
+    main()
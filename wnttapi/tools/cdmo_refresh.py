@@ -6,6 +6,7 @@ import argparse
 import logging
 import os
 import sys
+from dataclasses import dataclass, field
 from datetime import date, datetime, time, timedelta
 from pathlib import Path
 
@@ -13,7 +14,6 @@ from pathlib import Path
 sys.path.append(".")
 
 from django import setup
-from django.core.exceptions import ObjectDoesNotExist
 from django.db.models import Max
 
 from tools.logging_config import force_console_logging
@@ -29,14 +29,18 @@ from app import util
 from app.datasource import cdmo
 from app.datasource.tides import Tide
 from app.datasource.winds import Wind
-from app.models import Water, get_station
+from app.models import Refresh, Water, get_station
 from app.models import Wind as WindDb
 from app.timeline import Timeline
+from tools.tool_util import bulk_upsert
 
 # Can't use the normal __main__ logger because this is run as a script, not a module.
 logger = logging.getLogger("tools.cdmo_refresh")
 
 args = None
+_max_deltas_reported = 5  # how many of the largest diffs to list in the summary
+# How long to keep refresh records. Well beyond how long the API caches a graph. See graph_cache.
+_refresh_retention = timedelta(days=7)
 nocontainer = False
 tide_diff_found = False
 wind_diff_found = False
@@ -67,6 +71,8 @@ def main():
         refresh("T", station, db_station_code, timeline)
     if args.type is None or args.type == "W":
         refresh("W", station, db_station_code, timeline)
+    if not args.debug:
+        prune_refreshes()
 
 
 def get_timeline(station) -> Timeline:
@@ -123,15 +129,13 @@ def refresh(
     if timeline is None:
         # Get the latest data, up to 7 days.
         if type == "T":
-            last_dt_str = Water.objects.aggregate(Max("time", default=None))[
-                "time__max"
-            ]
+            last_epoch = Water.objects.aggregate(Max("time", default=None))["time__max"]
         else:
-            last_dt_str = WindDb.objects.aggregate(Max("time", default=None))[
+            last_epoch = WindDb.objects.aggregate(Max("time", default=None))[
                 "time__max"
             ]
-        logger.debug(f"Last saved {name} data was for {last_dt_str}")
-        timeline = build_latest_timeline(last_dt_str, station)
+        logger.debug(f"Last saved {name} data was for epoch {last_epoch}")
+        timeline = build_latest_timeline(last_epoch, station)
 
     logger.info(
         f"Refreshing CDMO {name} data for {station.id} "
@@ -146,9 +150,10 @@ def refresh(
         diffs = None
         if tides is not None and len(tides) > 0:
             if args.debug or args.verbose:
-                diffs = diff_water(tides, db_station_code)
+                diffs = diff_water(tides, db_station_code).diff_count
             if not args.debug and (diffs is None or diffs > 0):
-                upsert_water(tides, db_station_code)
+                if upsert_water(tides, db_station_code) > 0:
+                    record_refresh(Refresh.Type.WATER, tides, db_station_code)
         else:
             logger.info("No matching water records found")
 
@@ -160,46 +165,103 @@ def refresh(
 
         if winds is not None and len(winds) > 0:
             if args.debug or args.verbose:
-                diffs = diff_wind(winds, db_station_code)
+                diffs = diff_wind(winds, db_station_code).diff_count
             if not args.debug and (diffs is None or diffs > 0):
-                upsert_wind(winds, db_station_code)
+                if upsert_wind(winds, db_station_code) > 0:
+                    record_refresh(Refresh.Type.WIND, winds, db_station_code)
         else:
             logger.info("No matching wind records found")
 
 
-def diff_water(tides: dict, db_station_code: str) -> int:
+@dataclass
+class DiffSummary:
+    """Results of comparing records from CDMO with those in the database.
+
+    Args:
+        name (str): "water" or "wind"
+        new (int): records not in the database
+        changed (int): records that differ from the database
+        unchanged (int): records that match the database
+        deltas (list): (delta, utc time, old, new) for each changed record
+    """
+
+    name: str
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    deltas: list = field(default_factory=list)
+
+    @property
+    def diff_count(self) -> int:
+        return self.new + self.changed
+
+    def largest_deltas(self, count: int = _max_deltas_reported) -> list:
+        return sorted(self.deltas, key=lambda d: d[0], reverse=True)[:count]
+
+    def report(self):
+        print(
+            f"{self.name}: {self.new} new, {self.changed} changed, {self.unchanged} unchanged"
+        )
+        for delta, when, old, new in self.largest_deltas():
+            print(f"  {when}: delta {delta}: {old} ==> {new}")
+
+
+def load_db_records(model, data: dict, db_station_code: str) -> dict:
+    """Get all the database records covering the time range of the CDMO data in one query.
+
+    Returns:
+        dict: {epoch seconds: record}
+    """
+    start = tz.to_epoch(min(data))
+    end = tz.to_epoch(max(data))
+    return {
+        rec.time: rec
+        for rec in model.objects.filter(
+            station=db_station_code, time__range=(start, end)
+        )
+    }
+
+
+def diff_water(tides: dict, db_station_code: str) -> DiffSummary:
     print(f"Diffing {len(tides)} water records")
-    diff_cnt = 0
+    db_recs = load_db_records(Water, tides, db_station_code)
+    summary = DiffSummary("water")
     for dt, cdmo_rec in tides.items():
-        qdt = dt.astimezone(tz.utc).isoformat()
-        try:
-            db_rec = Water.objects.get(station=db_station_code, time=(qdt))
-            diff_cnt += diff_water_record(db_rec, cdmo_rec)
-        except ObjectDoesNotExist:
-            diff_cnt += 1
+        db_rec = db_recs.get(tz.to_epoch(dt))
+        if db_rec is None:
+            summary.new += 1
             print(f"{dt} not in database")
+        else:
+            diff_water_record(db_rec, cdmo_rec, summary)
 
-    print(f"Found {diff_cnt} diffs out of {len(tides)} water cdmo records")
-    return diff_cnt
+    print(f"Found {summary.diff_count} diffs out of {len(tides)} water cdmo records")
+    summary.report()
+    return summary
 
 
-def diff_wind(winds: dict, db_station_code: str) -> int:
+def diff_wind(winds: dict, db_station_code: str) -> DiffSummary:
     print(f"Diffing {len(winds)} wind records")
-    diff_cnt = 0
+    db_recs = load_db_records(WindDb, winds, db_station_code)
+    summary = DiffSummary("wind")
     for dt, cdmo_rec in winds.items():
-        qdt = dt.astimezone(tz.utc).isoformat()
-        try:
-            db_rec = WindDb.objects.get(station=db_station_code, time=(qdt))
-            diff_cnt += diff_wind_record(db_rec, cdmo_rec)
-        except ObjectDoesNotExist:
-            diff_cnt += 1
+        db_rec = db_recs.get(tz.to_epoch(dt))
+        if db_rec is None:
+            summary.new += 1
             print(f"{dt} not in database")
+        else:
+            diff_wind_record(db_rec, cdmo_rec, summary)
+
+    print(f"Found {summary.diff_count} diffs out of {len(winds)} wind cdmo records")
+    summary.report()
+    return summary
+
 
-    print(f"Found {diff_cnt} diffs out of {len(winds)} wind cdmo records")
-    return diff_cnt
+def db_time(db) -> str:
+    """The time of a db record in ISO format in UTC, for printing."""
+    return tz.from_epoch(db.time, tz.utc).isoformat()
 
 
-def diff_water_record(db: Water, cdmo: Tide) -> int:
+def diff_water_record(db: Water, cdmo: Tide, summary: DiffSummary):
 
     global tide_diff_found
 
@@ -218,12 +280,17 @@ def diff_water_record(db: Water, cdmo: Tide) -> int:
             cdmo.corrected_nav_feet,
             cdmo.corrected_mllw_feet,
         )
-        print(f"{db.time}: {old} ==> {new}")
-        return 1
-    return 0
+        print(f"{db_time(db)}: {old} ==> {new}")
+        delta = round(abs(cdmo.corrected_nav_feet - (db.clevel_nf or 0)), 2)
+        summary.changed += 1
+        summary.deltas.append(
+            (delta, db_time(db), db.clevel_nf, cdmo.corrected_nav_feet)
+        )
+    else:
+        summary.unchanged += 1
 
 
-def diff_wind_record(db: WindDb, cdmo: Wind):
+def diff_wind_record(db: WindDb, cdmo: Wind, summary: DiffSummary):
     global wind_diff_found
     if (
         db.gust != cdmo.gust_mph
@@ -234,55 +301,87 @@ def diff_wind_record(db: WindDb, cdmo: Wind):
             print("DIFFS: (old speed mph, gust mph, dir) ==> new")
             wind_diff_found = True
         old = (db.speed, db.gust, db.dir_deg)
-        new = (cdmo.speed_mph, cdmo.gust_mph, db.dir_deg)
-        print(f"{db.time}: {old} ==> {new}")
-        return 1
-    return 0
+        new = (cdmo.speed_mph, cdmo.gust_mph, cdmo.direction_deg)
+        print(f"{db_time(db)}: {old} ==> {new}")
+        # Largest change in speed or gust, in mph.
+        delta = round(
+            max(abs(db.speed - cdmo.speed_mph), abs(db.gust - cdmo.gust_mph)), 1
+        )
+        summary.changed += 1
+        summary.deltas.append((delta, db_time(db), old, new))
+    else:
+        summary.unchanged += 1
 
 
-def upsert_water(tides: dict, db_station_code: str):
-    create_cnt = update_cnt = 0
-    for dt, tide in tides.items():
-        _, created = Water.objects.update_or_create(
+def upsert_water(tides: dict, db_station_code: str) -> int:
+    rows = [
+        Water(
             station=db_station_code,
-            time=dt.astimezone(tz.utc).isoformat(),
-            defaults={
-                "temp_f": tide.temp_f,
-                "clevel_nf": tide.corrected_nav_feet,
-            },
+            time=tz.to_epoch(dt),
+            temp_f=tide.temp_f,
+            clevel_nf=tide.corrected_nav_feet,
         )
-        if created:
-            create_cnt += 1
-        else:
-            update_cnt += 1
+        for dt, tide in tides.items()
+    ]
+    create_cnt, update_cnt = bulk_upsert(
+        Water,
+        rows,
+        "station",
+        db_station_code,
+        ["temp_f", "clevel_nf"],
+        args.batch_size,
+    )
     logger.info(f"Created {create_cnt}, updated {update_cnt} water records in db")
+    return create_cnt + update_cnt
 
 
-def upsert_wind(winds: dict, db_station_code: str):
-    create_cnt = update_cnt = 0
-    for dt, wind_rec in winds.items():
-        _, created = WindDb.objects.update_or_create(
+def upsert_wind(winds: dict, db_station_code: str) -> int:
+    rows = [
+        WindDb(
             station=db_station_code,
-            time=dt.astimezone(tz.utc).isoformat(),
-            defaults={
-                "speed": wind_rec.speed_mph,
-                "gust": wind_rec.gust_mph,
-                "dir_deg": wind_rec.direction_deg,
-            },
+            time=tz.to_epoch(dt),
+            speed=wind_rec.speed_mph,
+            gust=wind_rec.gust_mph,
+            dir_deg=wind_rec.direction_deg,
         )
-        if created:
-            create_cnt += 1
-        else:
-            update_cnt += 1
+        for dt, wind_rec in winds.items()
+    ]
+    create_cnt, update_cnt = bulk_upsert(
+        WindDb,
+        rows,
+        "station",
+        db_station_code,
+        ["speed", "gust", "dir_deg"],
+        args.batch_size,
+    )
     logger.info(f"Created {create_cnt}, updated {update_cnt} wind records in db")
+    return create_cnt + update_cnt
 
 
-def build_latest_timeline(last_dt_str, station) -> Timeline:
-    # Note: the db times are in UTC, stored in ISO format which is "+00:00". But when calling
-    # datetime.fromisoformat, it sets tzinfo to a 'datetime.timezone' type, not ZoneInfo. This
-    # means it only knows about tz offsets, not DST. So we convert that to a DST-aware ZoneInfo.
-    last_dt_utc = datetime.fromisoformat(last_dt_str).replace(tzinfo=tz.utc)
-    last_dt_local = last_dt_utc.astimezone(station.time_zone)
+def record_refresh(type: Refresh.Type, data: dict, db_station_code: str):
+    # Let the API know that any graphs it cached for this time range are out of date.
+    Refresh.objects.create(
+        station=db_station_code,
+        type=type,
+        start=min(data),
+        end=max(data),
+        when=tz.now(tz.utc),
+    )
+
+
+def prune_refreshes():
+    """Delete the refreshes older than any graph the API could have cached, so the table doesn't keep
+    growing. The API looks for the latest one for a station and time range on every graph request.
+    """
+    cnt, _ = Refresh.objects.filter(
+        when__lt=tz.now(tz.utc) - _refresh_retention
+    ).delete()
+    logger.debug(f"Deleted {cnt} old refresh records")
+
+
+def build_latest_timeline(last_epoch: int, station) -> Timeline:
+    # The db times are UTC epoch seconds.
+    last_dt_local = tz.from_epoch(last_epoch, station.time_zone)
     now = datetime.now(tz=station.time_zone)
     max_dt_local = min(
         now, last_dt_local + timedelta(days=7)
@@ -341,6 +440,14 @@ def build_parser():
         required=False,
         help="Week to pull (1-52), use with --year",
     )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        required=False,
+        type=int,
+        default=500,
+        help="Number of records per database insert. Default=500",
+    )
     parser.add_argument(
         "-x",
         "--xmlsave",
@@ -0,0 +1,121 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import json
+import os
+import sys
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+from app.datasource import harmonic, httpclient
+from tools.tool_util import get_noaa_ids
+
+"""
+Pull a station's harmonic constituents and datums from NOAA's metadata API, and write them to the
+harcon-<noaa id>.json file that the local tide predictor reads, next to stations.json. Check the
+predictions with astro_validate.py before turning them on with LOCAL_ASTRO.
+
+Inputs:
+--noaa_id <noaa_station_id> : e.g. "8419317" for Wells
+--all: instead of the above, pull all the stations in stations.json
+"""
+
+base_url = "https://api.tidesandcurrents.noaa.gov/mdapi/prod/webapi/stations"
+_request_timeout_seconds = 20
+_meters_to_feet = 3.28084
+
+
+def main():
+    nocontainer = os.environ.get("IN_CONTAINER", "-") != "1"
+    data_dir = "../datamount/stations" if nocontainer else "/data/stations"
+    parser = argparse.ArgumentParser(
+        description="Pull harmonic constituents from NOAA for local tide predictions"
+    )
+    parser.add_argument("-n", "--noaa-id", help="NOAA station id")
+    parser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Pull all the stations in stations.json, instead of -n",
+    )
+    args = parser.parse_args()
+
+    if args.all:
+        noaa_ids = get_noaa_ids(data_dir)
+    elif args.noaa_id:
+        noaa_ids = [args.noaa_id]
+    else:
+        parser.error("either --all or --noaa-id is required")
+
+    for noaa_id in noaa_ids:
+        try:
+            path = pull(noaa_id, data_dir)
+            print(f"Wrote {path}")
+        except Exception as e:
+            print(f"{noaa_id}: {e}")
+
+
+def pull(noaa_id: str, data_dir: str) -> str:
+    harcon = get_json(f"{base_url}/{noaa_id}/harcon.json")
+    datums = get_json(f"{base_url}/{noaa_id}/datums.json")
+    data = build_file(noaa_id, harcon, datums)
+    path = harmonic.get_file_path(noaa_id, data_dir)
+    # Write it whole, so the API never reads half a file.
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def get_json(url: str) -> dict:
+    response = httpclient.get(
+        url, params={"units": "english"}, timeout=_request_timeout_seconds
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def build_file(noaa_id: str, harcon: dict, datums: dict) -> dict:
+    """Build the contents of the constituent file from NOAA's harcon.json and datums.json.
+
+    Args:
+        noaa_id (str): NOAA station id
+        harcon (dict): harmonic constituents, each with amplitude, and phase_GMT in degrees
+        datums (dict): datums, all relative to the station datum
+
+    Returns:
+        dict: the file contents, see harmonic.read_harmonics
+    """
+    constituents = harcon.get("HarmonicConstituents") or []
+    if len(constituents) == 0:
+        raise ValueError("no harmonic constituents, it may be a subordinate station")
+    scale = _meters_to_feet if harcon.get("units", "feet").startswith("m") else 1
+    values = {d["name"]: d["value"] for d in datums.get("datums", [])}
+    if values.get("MSL") is None or values.get("NAVD88") is None:
+        raise ValueError("MSL or NAVD88 datum is missing")
+    datum_scale = _meters_to_feet if datums.get("units", "feet").startswith("m") else 1
+    return {
+        "noaaStationId": noaa_id,
+        "units": "feet",
+        "datumEpoch": datums.get("epoch"),
+        "mslNavd88": round((values["MSL"] - values["NAVD88"]) * datum_scale, 3),
+        "constituents": [
+            {
+                "name": c["name"],
+                "amplitude": round(c["amplitude"] * scale, 4),
+                "phase": c["phase_GMT"],
+            }
+            for c in constituents
+        ],
+    }
+
+
+if __name__ == "__main__":
+    main()
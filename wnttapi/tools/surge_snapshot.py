@@ -0,0 +1,67 @@
+#! /usr/bin/env python3
+# You must have this in the env.
+# DJANGO_SETTINGS_MODULE = project.settings.[dev|prod]
+import argparse
+import glob
+import os
+import sys
+
+# In the container, this is run from /wnttapi
+sys.path.append(".")
+
+# Django must be set up before importing models.
+from django import setup
+
+setup()
+
+from app.datasource import surge
+
+"""
+Write a binary snapshot of the latest surge csv file for each station, so the API can read the surge values it
+needs without parsing the csv, and the manifest of the latest files, so it doesn't have to list the directory.
+Run by pull-surge-data after it saves new files. Snapshots whose csv file has been removed are deleted.
+
+Inputs:
+--dir : directory of the surge csv files. Default is the standard one.
+--noaa_id : only write the snapshot for this NOAA station. Default is every station with a file.
+"""
+
+
+def main():
+    nocontainer = os.environ.get("IN_CONTAINER", "-") != "1"
+    parser = argparse.ArgumentParser(
+        description="Write binary snapshots of the latest surge csv files"
+    )
+    parser.add_argument(
+        "-d",
+        "--dir",
+        default="../datamount/surge/data" if nocontainer else "/data/surge/data",
+        help="Directory of the surge csv files",
+    )
+    parser.add_argument("-n", "--noaa_id", help="NOAA station id. Default: all")
+    args = parser.parse_args()
+
+    latest = surge.scan_latest_files(args.dir)
+    if args.noaa_id:
+        latest = {args.noaa_id: latest[args.noaa_id]} if args.noaa_id in latest else {}
+    if len(latest) == 0:
+        print(f"No surge files in {args.dir}")
+    for entry in latest.values():
+        try:
+            print(
+                f"Wrote {surge.write_snapshot(os.path.join(args.dir, entry['file']))}"
+            )
+        except ValueError as e:
+            print(str(e))
+
+    for path in glob.glob(f"{args.dir}/*.surge"):
+        if not os.path.exists(f"{os.path.splitext(path)[0]}.csv"):
+            os.remove(path)
+            print(f"Removed {path}")
+
+    manifest = surge.write_manifest(args.dir)
+    print(f"Wrote manifest of {len(manifest)} stations")
+
+
+if __name__ == "__main__":
+    main()
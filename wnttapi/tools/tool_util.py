@@ -0,0 +1,55 @@
+from django.db import transaction
+
+import app.station as stn
+
+# NOAA id of the stations in stations.json that have no NOAA station, such as nocrcwq.
+_placeholder_noaa_id = "9999999"
+
+
+def bulk_upsert(
+    model,
+    rows: list,
+    key_field: str,
+    key: str,
+    update_fields: list,
+    batch_size: int,
+) -> tuple[int, int]:
+    """Insert or update all the rows in batches, in a single transaction, so we hold the sqlite write lock
+    once rather than once per row. Rows are unique by key_field and time.
+
+    Args:
+        model: the model class of the rows
+        rows (list): unsaved model instances
+        key_field (str): name of the field, other than time, that rows are unique by, e.g. "station"
+        key (str): value of key_field in all the rows
+        update_fields (list): fields to update when a row for the key and time already exists
+        batch_size (int): number of rows per insert
+
+    Returns:
+        tuple[int, int]: number of rows created, number updated
+    """
+    if len(rows) == 0:
+        return 0, 0
+    times = [row.time for row in rows]
+    with transaction.atomic():
+        # bulk_create can't tell us which rows were inserted, so count the ones already there.
+        existing = model.objects.filter(
+            **{key_field: key, "time__range": (min(times), max(times))}
+        ).values_list("time", flat=True)
+        update_cnt = len(set(times).intersection(existing))
+        model.objects.bulk_create(
+            rows,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=[key_field, "time"],
+            update_fields=update_fields,
+        )
+    return len(rows) - update_cnt, update_cnt
+
+
+def get_noaa_ids(data_dir: str) -> list:
+    """Return the NOAA ids of all the stations in stations.json, sorted, skipping the placeholder id."""
+    stations = stn.get_all_stations(data_dir)
+    noaa_ids = {data["noaaStationId"] for data in stations.values()}
+    noaa_ids.discard(_placeholder_noaa_id)
+    return sorted(noaa_ids)